@@ -43,6 +43,8 @@ const nextConfig = {
   experimental: {
     optimizePackageImports: ['@tanstack/react-query', 'sonner'],
     webVitalsAttribution: ['CLS', 'LCP'],
+    // src/instrumentation.ts starts the webhook / outbound worker pools at boot
+    instrumentationHook: true,
   },
 }
 
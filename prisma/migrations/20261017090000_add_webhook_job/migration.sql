@@ -0,0 +1,21 @@
+-- CreateEnum
+CREATE TYPE "WEBHOOK_JOB_STATUS" AS ENUM ('PENDING', 'PROCESSING', 'DONE', 'DEAD');
+
+-- CreateTable
+CREATE TABLE "WebhookJob" (
+    "id" UUID NOT NULL DEFAULT gen_random_uuid(),
+    "payload" JSONB NOT NULL,
+    "status" "WEBHOOK_JOB_STATUS" NOT NULL DEFAULT 'PENDING',
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "maxAttempts" INTEGER NOT NULL DEFAULT 5,
+    "runAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "lockedUntil" TIMESTAMP(3),
+    "lastError" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "WebhookJob_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "WebhookJob_status_runAt_idx" ON "WebhookJob"("status", "runAt");
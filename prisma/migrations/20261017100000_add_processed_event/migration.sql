@@ -0,0 +1,11 @@
+-- CreateTable
+CREATE TABLE "ProcessedEvent" (
+    "key" TEXT NOT NULL,
+    "expiresAt" TIMESTAMP(3) NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "ProcessedEvent_pkey" PRIMARY KEY ("key")
+);
+
+-- CreateIndex
+CREATE INDEX "ProcessedEvent_expiresAt_idx" ON "ProcessedEvent"("expiresAt");
@@ -0,0 +1,10 @@
+-- CreateTable
+CREATE TABLE "SendBucket" (
+    "pageId" TEXT NOT NULL,
+    "tokens" DOUBLE PRECISION NOT NULL,
+    "ratePerSec" DOUBLE PRECISION NOT NULL,
+    "blockedUntil" TIMESTAMP(3),
+    "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "SendBucket_pkey" PRIMARY KEY ("pageId")
+);
@@ -0,0 +1,46 @@
+-- CreateEnum
+CREATE TYPE "OUTBOUND_KIND" AS ENUM ('DM', 'PRIVATE_REPLY', 'PUBLIC_REPLY');
+
+-- CreateEnum
+CREATE TYPE "OUTBOUND_STATUS" AS ENUM ('PENDING', 'PROCESSING');
+
+-- CreateTable
+CREATE TABLE "OutboundMessage" (
+    "id" UUID NOT NULL DEFAULT gen_random_uuid(),
+    "kind" "OUTBOUND_KIND" NOT NULL,
+    "pageId" TEXT NOT NULL,
+    "automationId" UUID,
+    "payload" JSONB NOT NULL,
+    "status" "OUTBOUND_STATUS" NOT NULL DEFAULT 'PENDING',
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "maxAttempts" INTEGER NOT NULL DEFAULT 8,
+    "runAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "lockedUntil" TIMESTAMP(3),
+    "lastError" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "OutboundMessage_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "OutboundDeadLetter" (
+    "id" UUID NOT NULL DEFAULT gen_random_uuid(),
+    "messageId" UUID NOT NULL,
+    "kind" "OUTBOUND_KIND" NOT NULL,
+    "pageId" TEXT NOT NULL,
+    "automationId" UUID,
+    "payload" JSONB NOT NULL,
+    "attempts" INTEGER NOT NULL,
+    "lastError" TEXT,
+    "failedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "replayedAt" TIMESTAMP(3),
+
+    CONSTRAINT "OutboundDeadLetter_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "OutboundMessage_status_runAt_idx" ON "OutboundMessage"("status", "runAt");
+
+-- CreateIndex
+CREATE INDEX "OutboundDeadLetter_automationId_failedAt_idx" ON "OutboundDeadLetter"("automationId", "failedAt");
@@ -0,0 +1,12 @@
+-- CreateTable
+CREATE TABLE "ListenerCounterShard" (
+    "automationId" UUID NOT NULL,
+    "slot" INTEGER NOT NULL,
+    "dmCount" INTEGER NOT NULL DEFAULT 0,
+    "commentCount" INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT "ListenerCounterShard_pkey" PRIMARY KEY ("automationId","slot")
+);
+
+-- AddForeignKey
+ALTER TABLE "ListenerCounterShard" ADD CONSTRAINT "ListenerCounterShard_automationId_fkey" FOREIGN KEY ("automationId") REFERENCES "Automation"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,12 @@
+-- CreateTable
+CREATE TABLE "ReplyCache" (
+    "key" TEXT NOT NULL,
+    "replies" TEXT[],
+    "expiresAt" TIMESTAMP(3) NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "ReplyCache_pkey" PRIMARY KEY ("key")
+);
+
+-- CreateIndex
+CREATE INDEX "ReplyCache_expiresAt_idx" ON "ReplyCache"("expiresAt");
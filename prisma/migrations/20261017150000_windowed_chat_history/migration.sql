@@ -0,0 +1,13 @@
+-- CreateIndex
+CREATE INDEX "Dms_senderId_reciever_createdAt_idx" ON "Dms"("senderId", "reciever", "createdAt");
+
+-- CreateTable
+CREATE TABLE "ConversationSummary" (
+    "pageId" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "summary" TEXT NOT NULL,
+    "summarizedUntil" TIMESTAMP(3) NOT NULL,
+    "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "ConversationSummary_pkey" PRIMARY KEY ("pageId","userId")
+);
@@ -0,0 +1,32 @@
+-- CreateTable
+CREATE TABLE "Conversation" (
+    "pageId" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "automationId" UUID NOT NULL,
+    "lastActivityAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "turns" INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT "Conversation_pkey" PRIMARY KEY ("pageId","userId")
+);
+
+-- AddForeignKey
+ALTER TABLE "Conversation" ADD CONSTRAINT "Conversation_automationId_fkey" FOREIGN KEY ("automationId") REFERENCES "Automation"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- Backfill from existing chat history. A Dms row doesn't say which side is the
+-- page, so every pair is inserted both ways; lookups are always made with
+-- (page, sender) so the reversed rows are never read.
+INSERT INTO "Conversation" ("pageId", "userId", "automationId", "lastActivityAt", "turns")
+SELECT DISTINCT ON (p."pageId", p."userId")
+    p."pageId", p."userId", p."automationId", p."createdAt", p."turns"
+FROM (
+    SELECT d."reciever" AS "pageId", d."senderId" AS "userId", d."automationId", d."createdAt",
+           (COUNT(*) OVER (PARTITION BY LEAST(d."senderId", d."reciever"), GREATEST(d."senderId", d."reciever")) / 2)::int AS "turns"
+    FROM "Dms" d
+    WHERE d."automationId" IS NOT NULL AND d."senderId" IS NOT NULL AND d."reciever" IS NOT NULL
+    UNION ALL
+    SELECT d."senderId", d."reciever", d."automationId", d."createdAt",
+           (COUNT(*) OVER (PARTITION BY LEAST(d."senderId", d."reciever"), GREATEST(d."senderId", d."reciever")) / 2)::int
+    FROM "Dms" d
+    WHERE d."automationId" IS NOT NULL AND d."senderId" IS NOT NULL AND d."reciever" IS NOT NULL
+) p
+ORDER BY p."pageId", p."userId", p."createdAt" DESC;
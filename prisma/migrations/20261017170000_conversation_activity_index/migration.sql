@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "Conversation_lastActivityAt_idx" ON "Conversation"("lastActivityAt");
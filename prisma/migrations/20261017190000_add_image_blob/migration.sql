@@ -0,0 +1,20 @@
+-- CreateTable
+CREATE TABLE "ImageBlob" (
+    "hash" TEXT NOT NULL,
+    "contentType" TEXT NOT NULL,
+    "size" INTEGER NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "ImageBlob_pkey" PRIMARY KEY ("hash")
+);
+
+-- AlterTable
+ALTER TABLE "Listener" ADD COLUMN "dmImageHash" TEXT;
+
+-- AddForeignKey
+ALTER TABLE "Listener" ADD CONSTRAINT "Listener_dmImageHash_fkey" FOREIGN KEY ("dmImageHash") REFERENCES "ImageBlob"("hash") ON DELETE SET NULL ON UPDATE CASCADE;
+
+-- Base64 images already inside "commentReply" are moved into the blob store by
+-- the app (migrateInlineDmImages in src/actions/webhook/dm-images.ts, run once
+-- with POST /api/admin/dm-images after deploying): SQL can't write to the blob
+-- store backend.
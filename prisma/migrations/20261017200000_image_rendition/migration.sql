@@ -0,0 +1,7 @@
+-- AlterTable
+ALTER TABLE "ImageBlob" ADD COLUMN "width" INTEGER,
+ADD COLUMN "height" INTEGER,
+ADD COLUMN "renditionHash" TEXT;
+
+-- AddForeignKey
+ALTER TABLE "ImageBlob" ADD CONSTRAINT "ImageBlob_renditionHash_fkey" FOREIGN KEY ("renditionHash") REFERENCES "ImageBlob"("hash") ON DELETE SET NULL ON UPDATE CASCADE;
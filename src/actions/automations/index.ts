@@ -15,6 +15,16 @@ import {
   updateAutomation,
 } from './queries'
 import { client } from '@/lib/prisma'
+import { createLogger } from '@/lib/logger'
+import { dmImagePath } from '../webhook/dm-images'
+
+const getAllAutomationsLog = createLogger('getAllAutomations')
+const getAutomationInfoLog = createLogger('getAutomationInfo')
+const updateAutomationNameLog = createLogger('updateAutomationName')
+const saveListenerLog = createLogger('saveListener')
+const saveTriggerLog = createLogger('saveTrigger')
+const saveKeywordLog = createLogger('saveKeyword')
+const getProfilePostsLog = createLogger('getProfilePosts')
 
 export const createAutomations = async (id?: string) => {
   const user = await onCurrentUser()
@@ -30,49 +40,49 @@ export const createAutomations = async (id?: string) => {
 
 export const getAllAutomations = async () => {
   try {
-    console.log('🔍 [getAllAutomations] Starting...')
+    getAllAutomationsLog.debug('Starting')
     
     let user
     try {
       user = await onCurrentUser()
-      console.log('🔍 [getAllAutomations] User:', user?.id)
+      getAllAutomationsLog.debug('User', { userId: user?.id })
     } catch (userError) {
-      console.error('❌ [getAllAutomations] User fetch error:', userError)
+      getAllAutomationsLog.error('User fetch error', { error: userError })
       return { status: 401, data: [] }
     }
     
     if (!user || !user.id) {
-      console.error('❌ [getAllAutomations] No user')
+      getAllAutomationsLog.error('No user')
       return { status: 401, data: [] }
     }
     
-    console.log('🔍 [getAllAutomations] Fetching from database...')
+    getAllAutomationsLog.debug('Fetching from database')
     let automations
     try {
       automations = await getAutomations(user.id)
-      console.log('🔍 [getAllAutomations] Database result:', {
+      getAllAutomationsLog.debug('Database result', () => ({
         hasAutomations: !!automations,
         automationsCount: automations?.automations?.length,
-      })
+      }))
     } catch (dbError) {
-      console.error('❌ [getAllAutomations] Database error:', dbError)
+      getAllAutomationsLog.error('Database error', { error: dbError })
       return { status: 500, data: [] }
     }
     
     // ✅ Handle case where user exists but has no automations
     if (automations && automations.automations) {
       const automationsList = automations.automations || []
-      console.log('🔍 [getAllAutomations] Automations list length:', automationsList.length)
+      getAllAutomationsLog.debug('Automations list length', { automationsListLength: automationsList.length })
       
       // ✅ CRITICAL FIX: Use JSON.parse(JSON.stringify()) for clean serialization
       const serializedAutomations = automationsList.map((automation: any) => {
         try {
-          console.log(`🔍 [getAllAutomations] Processing automation ${automation.id}:`, {
+          getAllAutomationsLog.debug(`Processing automation ${automation.id}`, () => ({
             name: automation.name,
             hasListener: !!automation.listener,
             dmCount: automation.listener?.dmCount,
             commentCount: automation.listener?.commentCount,
-          })
+          }))
 
           // Create plain object with only the data we need
           const plainObject = {
@@ -97,47 +107,45 @@ export const getAllAutomations = async () => {
           // ✅ Force clean serialization by converting to JSON and back
           const cleaned = JSON.parse(JSON.stringify(plainObject))
           
-          console.log(`✅ [getAllAutomations] Serialized automation ${automation.name}:`, {
+          getAllAutomationsLog.debug(`Serialized automation ${automation.name}`, () => ({
             dmCount: cleaned.listener?.dmCount,
             commentCount: cleaned.listener?.commentCount,
-          })
+          }))
           
           return cleaned
         } catch (itemError) {
-          console.error('❌ [getAllAutomations] Error serializing automation item:', itemError)
+          getAllAutomationsLog.error('Error serializing automation item', { error: itemError })
           return null
         }
       }).filter((item: any) => item !== null)
       
-      console.log('✅ [getAllAutomations] Returning', serializedAutomations.length, 'automations')
+      getAllAutomationsLog.info('Returning automations', { count: serializedAutomations.length })
       
       // Log summary of counts
       const totalDMs = serializedAutomations.reduce((sum: number, auto: any) => sum + (auto.listener?.dmCount || 0), 0)
       const totalComments = serializedAutomations.reduce((sum: number, auto: any) => sum + (auto.listener?.commentCount || 0), 0)
-      console.log('📊 [getAllAutomations] Total counts:', { totalDMs, totalComments })
+      getAllAutomationsLog.debug('Total counts', () => ({ totalDMs, totalComments }))
       
       // ✅ Return directly without extra validation
-      console.log('✅ [getAllAutomations] Returning data to client')
+      getAllAutomationsLog.debug('Returning data to client')
       return { status: 200, data: serializedAutomations }
     }
     
-    console.log('⚠️ [getAllAutomations] No automations found')
+    getAllAutomationsLog.warn('No automations found')
     return { status: 200, data: [] }
   } catch (error: any) {
-    console.error('❌ [getAllAutomations] FATAL ERROR:', error)
-    console.error('❌ [getAllAutomations] Error stack:', error?.stack)
-    console.error('❌ [getAllAutomations] Error message:', error?.message)
+    getAllAutomationsLog.error('Fatal error', { error })
     return { status: 500, data: [] }
   }
 }
 
 export const getAutomationInfo = async (id: string) => {
-  console.log('🔍 [getAutomationInfo] Starting for id:', id)
+  getAutomationInfoLog.debug('Starting for id', { id })
   
   // Validate UUID format before querying
   const uuidRegex = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i
   if (!uuidRegex.test(id)) {
-    console.error('❌ [getAutomationInfo] Invalid automation ID format:', id)
+    getAutomationInfoLog.error('Invalid automation ID format', { id })
     return {
       status: 400,
       data: null,
@@ -149,15 +157,15 @@ export const getAutomationInfo = async (id: string) => {
     await onCurrentUser()
     
     const automation = await findAutomation(id)
-    console.log('🔍 [getAutomationInfo] Database result:', {
+    getAutomationInfoLog.debug('Database result', () => ({
       hasAutomation: !!automation,
       hasKeywords: !!automation?.keywords,
       hasPosts: !!automation?.posts,
       hasListener: !!automation?.listener,
-    })
+    }))
     
     if (!automation) {
-      console.warn('⚠️ [getAutomationInfo] Automation not found')
+      getAutomationInfoLog.warn('Automation not found')
       return { status: 404, data: null }
     }
     
@@ -201,8 +209,9 @@ export const getAutomationInfo = async (id: string) => {
         dmCount: Number(automation.listener.dmCount || 0),
         commentCount: Number(automation.listener.commentCount || 0),
         automationId: String(automation.listener.id),
-        // Parse DM image and links from commentReply if it's JSON
+        // Stored DM image URL, otherwise parse DM image and links from commentReply if it's JSON
         dmImage: (() => {
+          if (automation.listener.dmImageHash) return dmImagePath(automation.id, automation.listener.dmImageHash)
           if (!automation.listener.commentReply) return null
           try {
             const parsed = JSON.parse(automation.listener.commentReply)
@@ -238,11 +247,10 @@ export const getAutomationInfo = async (id: string) => {
       } : null,
     }
     
-    console.log('✅ [getAutomationInfo] Returning automation data')
+    getAutomationInfoLog.debug('Returning automation data')
     return { status: 200, data: serialized }
   } catch (error: any) {
-    console.error('❌ [getAutomationInfo] ERROR:', error)
-    console.error('❌ [getAutomationInfo] Error stack:', error?.stack)
+    getAutomationInfoLog.error('Failed', { error })
     return { status: 500, data: null }
   }
 }
@@ -255,20 +263,19 @@ export const updateAutomationName = async (
     automation?: string
   }
 ) => {
-  console.log('🔍 [updateAutomationName] Starting for automationId:', automationId, 'data:', data)
+  updateAutomationNameLog.debug('Starting for automationId', { automationId, data })
   await onCurrentUser()
   try {
     const update = await updateAutomation(automationId, data)
-    console.log('🔍 [updateAutomationName] Update result:', !!update)
+    updateAutomationNameLog.debug('Update result', { updateResult: !!update })
     if (update) {
-      console.log('✅ [updateAutomationName] Success')
+      updateAutomationNameLog.info('Success')
       return { status: 200, data: 'Automation successfully updated' }
     }
-    console.warn('⚠️ [updateAutomationName] Automation not found')
+    updateAutomationNameLog.warn('Automation not found')
     return { status: 404, data: 'Oops! could not find automation' }
   } catch (error: any) {
-    console.error('❌ [updateAutomationName] ERROR:', error)
-    console.error('❌ [updateAutomationName] Error details:', { message: error?.message, stack: error?.stack })
+    updateAutomationNameLog.error('Failed', { error })
     return { status: 500, data: 'Oops! something went wrong' }
   }
 }
@@ -281,7 +288,7 @@ export const saveListener = async (
   dmImage?: string | null,
   dmLinks?: Array<{ title: string; url: string }>
 ) => {
-  console.log('🔍 [saveListener] Starting:', {
+  saveListenerLog.debug('Starting', () => ({
     automationId: autmationId,
     listener,
     promptLength: prompt?.length || 0,
@@ -289,54 +296,51 @@ export const saveListener = async (
     hasImage: !!dmImage,
     imageType: dmImage ? (dmImage.startsWith('data:') ? 'base64' : dmImage.startsWith('http') ? 'url' : 'unknown') : 'none',
     linksCount: dmLinks?.length || 0,
-  })
+  }))
   await onCurrentUser()
   try {
     const create = await addListener(autmationId, listener, prompt, reply, dmImage, dmLinks)
-    console.log('✅ [saveListener] Successfully saved to database')
+    saveListenerLog.info('Successfully saved to database')
     return { status: 200, data: 'Listener created' }
   } catch (error: any) {
-    console.error('❌ [saveListener] ERROR:', error)
-    console.error('❌ [saveListener] Error details:', { message: error?.message, stack: error?.stack })
+    saveListenerLog.error('Failed', { error })
     return { status: 500, data: error?.message || 'Oops! something went wrong' }
   }
 }
 
 export const saveTrigger = async (automationId: string, trigger: string[]) => {
-  console.log('🔍 [saveTrigger] Starting for automationId:', automationId, 'trigger:', trigger)
+  saveTriggerLog.debug('Starting for automationId', { automationId, trigger })
   await onCurrentUser()
   try {
     const create = await addTrigger(automationId, trigger)
-    console.log('🔍 [saveTrigger] Create result:', !!create)
+    saveTriggerLog.debug('Create result', { createResult: !!create })
     if (create) {
-      console.log('✅ [saveTrigger] Success')
+      saveTriggerLog.info('Success')
       return { status: 200, data: 'Trigger saved' }
     }
-    console.warn('⚠️ [saveTrigger] Failed to create trigger')
+    saveTriggerLog.warn('Failed to create trigger')
     return { status: 404, data: 'Cannot save trigger' }
   } catch (error: any) {
-    console.error('❌ [saveTrigger] ERROR:', error)
-    console.error('❌ [saveTrigger] Error details:', { message: error?.message, stack: error?.stack })
+    saveTriggerLog.error('Failed', { error })
     return { status: 500, data: 'Oops! something went wrong' }
   }
 }
 
 export const saveKeyword = async (automationId: string, keyword: string) => {
-  console.log('🔍 [saveKeyword] Starting for automationId:', automationId, 'keyword:', keyword)
+  saveKeywordLog.debug('Starting for automationId', { automationId, keyword })
   await onCurrentUser()
   try {
     const create = await addKeyWord(automationId, keyword)
-    console.log('🔍 [saveKeyword] Create result:', !!create)
+    saveKeywordLog.debug('Create result', { createResult: !!create })
 
     if (create) {
-      console.log('✅ [saveKeyword] Success')
+      saveKeywordLog.info('Success')
       return { status: 200, data: 'Keyword added successfully' }
     }
-    console.warn('⚠️ [saveKeyword] Failed to create keyword')
+    saveKeywordLog.warn('Failed to create keyword')
     return { status: 404, data: 'Cannot add this keyword' }
   } catch (error: any) {
-    console.error('❌ [saveKeyword] ERROR:', error)
-    console.error('❌ [saveKeyword] Error details:', { message: error?.message, stack: error?.stack })
+    saveKeywordLog.error('Failed', { error })
     return { status: 500, data: 'Oops! something went wrong' }
   }
 }
@@ -358,13 +362,13 @@ export const deleteKeyword = async (id: string) => {
 
 export const getProfilePosts = async () => {
   try {
-    console.log('🔍 [getProfilePosts] Starting...')
+    getProfilePostsLog.debug('Starting')
     const user = await onCurrentUser()
-    console.log('🔍 [getProfilePosts] User ID:', user?.id)
+    getProfilePostsLog.debug('User ID', { userId: user?.id })
 
     const profile = await findUser(user.id)
-    console.log('🔍 [getProfilePosts] Profile found:', !!profile, 'hasIntegrations:', !!profile?.integrations)
-    console.log('🔍 [getProfilePosts] Integrations array:', {
+    getProfilePostsLog.debug('Profile found', { profileFound: !!profile, hasIntegrations: !!profile?.integrations })
+    getProfilePostsLog.debug('Integrations array', () => ({
       isArray: Array.isArray(profile?.integrations),
       length: profile?.integrations?.length || 0,
       firstIntegration: profile?.integrations?.[0] ? {
@@ -372,14 +376,14 @@ export const getProfilePosts = async () => {
         hasToken: !!profile.integrations[0].token,
         tokenLength: profile.integrations[0].token?.length || 0,
       } : null,
-    })
+    }))
 
     const integration = profile?.integrations?.[0]
-    console.log('🔍 [getProfilePosts] Integration found:', !!integration, 'hasToken:', !!integration?.token)
+    getProfilePostsLog.debug('Integration found', { integrationFound: !!integration, hasToken: !!integration?.token })
     
     // ✅ Check if there's NO integration at all (not just missing token)
     if (!profile?.integrations || profile.integrations.length === 0 || !integration) {
-      console.warn('⚠️ [getProfilePosts] No integration found')
+      getProfilePostsLog.warn('No integration found')
       return { 
         status: 403, 
         data: { data: [] },
@@ -389,7 +393,7 @@ export const getProfilePosts = async () => {
     
     // ✅ Check if integration exists but token is missing
     if (!integration.token) {
-      console.warn('⚠️ [getProfilePosts] Integration exists but token is missing')
+      getProfilePostsLog.warn('Integration exists but token is missing')
       return { 
         status: 403, 
         data: { data: [] },
@@ -410,7 +414,7 @@ export const getProfilePosts = async () => {
       const FIVE_DAYS = 5 * 24 * 60 * 60 * 1000
 
       if (diffMs > 0 && diffMs < FIVE_DAYS) {
-        console.log('🔁 Pre-emptive IG token refresh (expires soon)...')
+        getProfilePostsLog.debug('Pre-emptive IG token refresh (expires soon)')
         try {
           const newTokenData = await refreshToken(token)
 
@@ -430,10 +434,10 @@ export const getProfilePosts = async () => {
               },
             })
 
-            console.log('✅ Token refreshed before expiry')
+            getProfilePostsLog.info('Token refreshed before expiry')
           }
         } catch (e) {
-          console.log('❌ Failed pre-emptive IG refresh:', e)
+          getProfilePostsLog.error('Failed pre-emptive IG refresh', { error: e })
           // continue with old token, IG will respond if invalid
         }
       }
@@ -450,12 +454,12 @@ export const getProfilePosts = async () => {
 
     // ✅ 3) IF IG SAYS TOKEN EXPIRED (code 190) → REFRESH & RETRY ONCE
     if (parsed?.error?.code === 190) {
-      console.log('🔁 Token expired, refreshing & retrying...')
+      getProfilePostsLog.debug('Token expired, refreshing & retrying')
 
       try {
         const newTokenData = await refreshToken(token)
         if (!newTokenData?.access_token) {
-          console.log('❌ Refresh response missing access_token')
+          getProfilePostsLog.error('Refresh response missing access_token')
           return { status: 401, data: [] }
         }
 
@@ -480,25 +484,24 @@ export const getProfilePosts = async () => {
         )
 
         parsed = await retry.json()
-        console.log('🔍 [getProfilePosts] Retry response:', { hasData: !!parsed?.data, dataLength: parsed?.data?.length, hasError: !!parsed?.error })
+        getProfilePostsLog.debug('Retry response', () => ({ hasData: !!parsed?.data, dataLength: parsed?.data?.length, hasError: !!parsed?.error }))
       } catch (e: any) {
-        console.error('❌ [getProfilePosts] ERROR refreshing expired IG token:', e)
-        console.error('❌ [getProfilePosts] Refresh error details:', { message: e?.message, stack: e?.stack })
+        getProfilePostsLog.error('ERROR refreshing expired IG token', { error: e })
         return { status: 401, data: { data: [] } }
       }
     }
 
     // ✅ 4) NORMAL RETURN
-    console.log('🔍 [getProfilePosts] Parsed response:', {
+    getProfilePostsLog.debug('Parsed response', () => ({
       hasData: !!parsed?.data,
       dataLength: parsed?.data?.length,
       hasError: !!parsed?.error,
       errorCode: parsed?.error?.code,
       errorMessage: parsed?.error?.message,
-    })
+    }))
     
     if (parsed?.error) {
-      console.error('❌ [getProfilePosts] Instagram API error:', parsed.error)
+      getProfilePostsLog.error('Instagram API error', { error: parsed.error })
       return { status: 401, data: { data: [] } }
     }
     
@@ -510,25 +513,20 @@ export const getProfilePosts = async () => {
         has_thumbnail: !!item.thumbnail_url,
         has_media_url: !!item.media_url,
       }))
-      console.log('✅ [getProfilePosts] Returning', parsed.data.length, 'posts')
-      console.log('🔍 [getProfilePosts] Media types breakdown:', {
+      getProfilePostsLog.info('Returning posts', { count: parsed.data.length })
+      getProfilePostsLog.debug('Media types breakdown', () => ({
         images: mediaTypes.filter((m: any) => m.media_type === 'IMAGE').length,
         videos: mediaTypes.filter((m: any) => m.media_type === 'VIDEO').length,
         carousels: mediaTypes.filter((m: any) => m.media_type === 'CAROUSEL_ALBUM').length,
         samples: mediaTypes.slice(0, 5),
-      })
+      }))
       return { status: 200, data: parsed }
     }
 
-    console.warn('⚠️ [getProfilePosts] No posts found, returning empty array')
+    getProfilePostsLog.warn('No posts found, returning empty array')
     return { status: 200, data: { data: [] } }
   } catch (error: any) {
-    console.error('❌ [getProfilePosts] ERROR:', error)
-    console.error('❌ [getProfilePosts] Error details:', { 
-      message: error?.message, 
-      stack: error?.stack,
-      name: error?.name,
-    })
+    getProfilePostsLog.error('Failed', { error })
     return { status: 500, data: { data: [] } }
   }
 }
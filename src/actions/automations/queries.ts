@@ -1,7 +1,55 @@
 'use server'
 
 import { client } from '@/lib/prisma'
+import { Prisma } from '@prisma/client'
 import { v4 } from 'uuid'
+import {
+  removeAutomationKeyword,
+  removeAutomationKeywords,
+  setAutomationKeywords,
+} from '@/actions/webhook/keyword-index'
+import {
+  removeAutomationMedia,
+  setAutomationMedia,
+} from '@/actions/webhook/media-index'
+import { invalidateWebhookAutomation } from '@/actions/webhook/automation-resolver'
+import { storeReplyPlan } from '@/actions/webhook/reply-plan'
+import {
+  collectUnusedDmImages,
+  invalidateDmImage,
+  parseDmImagePath,
+  storeDmImage,
+} from '@/actions/webhook/dm-images'
+import { connectImageBlob, getDmImageSource } from '@/actions/webhook/queries'
+import { createLogger } from '@/lib/logger'
+
+const createAutomationLog = createLogger('createAutomation')
+const findAutomationLog = createLogger('findAutomation')
+const addListenerLog = createLogger('addListener')
+
+type CounterShardCounts = { dmCount: number; commentCount: number }
+
+// Add not-yet-compacted ListenerCounterShard slots to the listener's counts
+const withShardCounts = <
+  T extends {
+    listener: CounterShardCounts | null
+    counterShards: CounterShardCounts[]
+  }
+>({ counterShards, ...automation }: T) => {
+  if (!automation.listener || counterShards.length === 0) return automation
+  return {
+    ...automation,
+    listener: {
+      ...automation.listener,
+      dmCount: counterShards.reduce((sum, shard) => sum + shard.dmCount, automation.listener.dmCount),
+      commentCount: counterShards.reduce((sum, shard) => sum + shard.commentCount, automation.listener.commentCount),
+    },
+  }
+}
+
+const counterShardsSelect = {
+  select: { dmCount: true, commentCount: true },
+} as const
 
 export const createAutomation = async (clerkId: string, id?: string) => {
   // Check if automation with this ID already exists
@@ -10,7 +58,7 @@ export const createAutomation = async (clerkId: string, id?: string) => {
       where: { id },
     })
     if (existing) {
-      console.warn('⚠️ [createAutomation] Automation with ID already exists:', id)
+      createAutomationLog.warn('Automation with ID already exists', { id })
       return existing
     }
   }
@@ -41,7 +89,7 @@ export const createAutomation = async (clerkId: string, id?: string) => {
 }
 
 export const getAutomations = async (clerkId: string) => {
-  return await client.user.findUnique({
+  const user = await client.user.findUnique({
     where: {
       clerkId,
     },
@@ -63,18 +111,31 @@ export const getAutomations = async (clerkId: string) => {
               commentCount: true,    // ✅ REQUIRED
             }
           },
+          counterShards: counterShardsSelect,
 
         },
       },
     },
   })
+
+  if (!user) return user
+  return { ...user, automations: user.automations.map(withShardCounts) }
+}
+
+// Whether the automation belongs to the user (by Clerk id) - for routes that act on one by id
+export const isAutomationOwner = async (id: string, clerkId: string) => {
+  const automation = await client.automation.findFirst({
+    where: { id, User: { clerkId } },
+    select: { id: true },
+  })
+  return !!automation
 }
 
 export const findAutomation = async (id: string) => {
   // Validate UUID format before querying
   const uuidRegex = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i
   if (!uuidRegex.test(id)) {
-    console.error('❌ [findAutomation] Invalid automation ID format:', id)
+    findAutomationLog.error('Invalid automation ID format', { id })
     throw new Error(`Invalid automation ID format: ${id}. Expected UUID format.`)
   }
   
@@ -94,6 +155,7 @@ export const findAutomation = async (id: string) => {
             commentCount: true,    // 🔥 REQUIRED
           }
         },
+      counterShards: counterShardsSelect,
       User: {
         select: {
           subscription: true,
@@ -111,7 +173,7 @@ export const findAutomation = async (id: string) => {
     },
   })
 
-  return automation
+  return automation && withShardCounts(automation)
 }
 
 
@@ -122,13 +184,31 @@ export const updateAutomation = async (
     active?: boolean
   }
 ) => {
-  return await client.automation.update({
+  const automation = await client.automation.update({
     where: { id },
     data: {
       name: update.name,
       active: update.active,
     },
+    include: {
+      keywords: { select: { word: true } },
+      posts: { select: { postid: true } },
+    },
   })
+
+  // Keep the webhook keyword / media indexes in sync with activation changes
+  if (update.active !== undefined) {
+    if (automation.active) {
+      setAutomationKeywords(automation.id, automation.keywords.map((k) => k.word))
+      setAutomationMedia(automation.id, automation.posts.map((p) => p.postid))
+    } else {
+      removeAutomationKeywords(automation.id)
+      removeAutomationMedia(automation.id)
+    }
+  }
+  invalidateWebhookAutomation(automation.id)
+
+  return automation
 }
 
 export const addListener = async (
@@ -139,7 +219,7 @@ export const addListener = async (
   dmImage?: string | null,
   dmLinks?: Array<{ title: string; url: string }>
 ) => {
-  console.log('💾 [addListener] Saving listener with:', {
+  addListenerLog.debug('Saving listener with', () => ({
     automationId,
     listener,
     promptLength: prompt.length,
@@ -147,34 +227,58 @@ export const addListener = async (
     hasImage: !!dmImage,
     imageType: dmImage ? (dmImage.startsWith('data:') ? 'base64' : dmImage.startsWith('http') ? 'url' : 'unknown') : 'none',
     linksCount: dmLinks?.length || 0,
-  })
+  }))
   
-  // ✅ Store DM image and links as JSON in commentReply field
+  // Uploaded images go to the blob store; the listener keeps only the hash.
+  // The builder sends a stored image back as its dm-image URL, which is left as is.
+  let dmImageHash: string | null = null
+  let dmImageRelation: Prisma.ImageBlobCreateNestedOneWithoutListenersInput | undefined
+  let inlineImage: string | null = null
+  if (dmImage) {
+    const existingHash = parseDmImagePath(dmImage)
+    if (existingHash) {
+      dmImageHash = existingHash
+      dmImageRelation = { connect: { hash: existingHash } }
+    } else if (dmImage.startsWith('data:')) {
+      const image = await storeDmImage(dmImage)
+      if (!image) throw new Error('Invalid DM image')
+      dmImageHash = image.hash
+      dmImageRelation = connectImageBlob(image)
+    } else {
+      // External image URL
+      inlineImage = dmImage
+    }
+  }
+
+  // The image the listener shows now - unused once replaced, it's cleaned up below
+  const previousImageHash = (await getDmImageSource(automationId))?.dmImageHash ?? null
+
+  // ✅ Store external DM image URL and links as JSON in commentReply field
   let replyData: string | null = null
   
-  // Always create JSON if we have image or links
-  if (dmImage || (dmLinks && dmLinks.length > 0)) {
+  // Always create JSON if we have an image URL or links
+  if (inlineImage || (dmLinks && dmLinks.length > 0)) {
     const validLinks = Array.isArray(dmLinks) 
       ? dmLinks.filter(link => link && typeof link === 'object' && link.title && link.url)
       : []
     
     const jsonData = {
-      dmImage: dmImage || null,
+      dmImage: inlineImage,
       dmLinks: validLinks,
       originalReply: reply || null,
     }
     replyData = JSON.stringify(jsonData)
-    console.log('💾 [addListener] Created JSON data:', {
-      hasImage: !!dmImage,
+    addListenerLog.debug('Created JSON data', () => ({
+      hasImage: !!inlineImage,
       linksCount: validLinks.length,
       jsonLength: replyData.length,
-    })
+    }))
   } else if (reply) {
     // No image/links, just use reply as plain text
     replyData = reply
   }
   
-  return await client.automation.update({
+  const automation = await client.automation.update({
     where: {
       id: automationId,
     },
@@ -185,53 +289,81 @@ export const addListener = async (
             listener,
             prompt,
             commentReply: replyData,
+            dmImage: dmImageRelation,
           },
           update: {
             listener,
             prompt,
             commentReply: replyData,
+            dmImage: dmImageRelation || { disconnect: true },
           },
         },
       },
     },
+    include: {
+      listener: { select: { updatedAt: true } },
+    },
   })
+
+  // Compile the reply plan now, so matched comments only look it up
+  if (listener === 'MESSAGE' && automation.listener) {
+    storeReplyPlan(automationId, {
+      prompt,
+      commentReply: replyData,
+      dmImageHash,
+      updatedAt: automation.listener.updatedAt,
+    })
+  }
+  invalidateWebhookAutomation(automationId)
+  invalidateDmImage(automationId)
+
+  if (previousImageHash && previousImageHash !== dmImageHash) {
+    collectUnusedDmImages([previousImageHash]).catch((error) =>
+      addListenerLog.error('Failed to clean up replaced image', { error: error?.message })
+    )
+  }
+
+  return automation
 }
 
 export const addTrigger = async (automationId: string, trigger: string[]) => {
   // ✅ CRITICAL FIX: Delete old triggers first, then create new ones
   // This prevents duplicate triggers
-  if (trigger.length === 2) {
-    return await client.automation.update({
-      where: { id: automationId },
-      data: {
-        trigger: {
-          deleteMany: {},  // ✅ Delete old triggers
-          createMany: {
-            data: [{ type: trigger[0] }, { type: trigger[1] }],
+  const automation =
+    trigger.length === 2
+      ? await client.automation.update({
+          where: { id: automationId },
+          data: {
+            trigger: {
+              deleteMany: {},  // ✅ Delete old triggers
+              createMany: {
+                data: [{ type: trigger[0] }, { type: trigger[1] }],
+              },
+            },
           },
-        },
-      },
-    })
-  }
-  return await client.automation.update({
-    where: {
-      id: automationId,
-    },
-    data: {
-      trigger: {
-        deleteMany: {},  // ✅ Delete old triggers
-        create: {
-          type: trigger[0],
-        },
-      },
-    },
-  })
+        })
+      : await client.automation.update({
+          where: {
+            id: automationId,
+          },
+          data: {
+            trigger: {
+              deleteMany: {},  // ✅ Delete old triggers
+              create: {
+                type: trigger[0],
+              },
+            },
+          },
+        })
+  invalidateWebhookAutomation(automationId)
+
+  return automation
 }
 
 export const addKeyWord = async (automationId: string, keyword: string) => {
   // ✅ CRITICAL FIX: Delete old keywords first, then create new one
   // This ensures only ONE keyword per automation (REPLACE, not ADD)
-  return client.automation.update({
+  const automation = await client.automation.update({
     where: {
       id: automationId,
     },
@@ -244,12 +376,20 @@ export const addKeyWord = async (automationId: string, keyword: string) => {
       },
     },
   })
+
+  if (automation.active) setAutomationKeywords(automation.id, [keyword])
+
+  return automation
 }
 
 export const deleteKeywordQuery = async (id: string) => {
-  return client.keyword.delete({
+  const keyword = await client.keyword.delete({
     where: { id },
   })
+
+  if (keyword.automationId) removeAutomationKeyword(keyword.automationId, keyword.word)
+
+  return keyword
 }
 
 export const addPost = async (
@@ -263,7 +403,7 @@ export const addPost = async (
 ) => {
   // ✅ CRITICAL FIX: Delete old posts first, then create new one
   // This ensures only ONE post per automation (REPLACE, not ADD)
-  return await client.automation.update({
+  const automation = await client.automation.update({
     where: {
       id: autmationId,
     },
@@ -276,4 +416,9 @@ export const addPost = async (
       },
     },
   })
+
+  if (automation.active) setAutomationMedia(automation.id, posts.map((p) => p.postid))
+  invalidateWebhookAutomation(automation.id)
+
+  return automation
 }
\ No newline at end of file
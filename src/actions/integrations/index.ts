@@ -5,6 +5,9 @@ import { onCurrentUser } from '../user'
 import { createIntegration, getIntegration } from './queries'
 import { generateTokens } from '@/lib/fetch'
 import axios from 'axios'
+import { createLogger } from '@/lib/logger'
+
+const onIntegrateLog = createLogger('onIntegrate')
 
 export const onOAuthInstagram = (strategy: 'INSTAGRAM' | 'CRM') => {
   if (strategy === 'INSTAGRAM') {
@@ -13,46 +16,46 @@ export const onOAuthInstagram = (strategy: 'INSTAGRAM' | 'CRM') => {
 }
 
 export const onIntegrate = async (code: string) => {
-  console.log('🔵 [onIntegrate] ===== STARTING INTEGRATION =====')
-  console.log('🔵 [onIntegrate] Code received:', code ? `${code.substring(0, 20)}...` : 'MISSING')
-  console.log('🔵 [onIntegrate] Code length:', code?.length || 0)
+  onIntegrateLog.debug('STARTING INTEGRATION')
+  onIntegrateLog.debug('Code received', { codeReceived: code ? `${code.substring(0, 20)}...` : 'MISSING' })
+  onIntegrateLog.debug('Code length', { codeLength: code?.length || 0 })
 
-  console.log('🔵 [onIntegrate] Getting current user...')
+  onIntegrateLog.debug('Getting current user')
   const user = await onCurrentUser()
-  console.log('👤 [onIntegrate] Current user ID:', user.id)
+  onIntegrateLog.debug('Current user ID', { currentUserId: user.id })
 
   try {
-    console.log('🔵 [onIntegrate] Fetching existing integration from database...')
+    onIntegrateLog.debug('Fetching existing integration from database')
     const integration = await getIntegration(user.id)
-    console.log('📊 [onIntegrate] Existing integration result:', {
+    onIntegrateLog.debug('Existing integration result', () => ({
       hasIntegration: !!integration,
       integrationsCount: integration?.integrations?.length || 0,
       integrationKeys: integration ? Object.keys(integration) : [],
-    })
+    }))
 
     // ✅ Handle case where user record doesn't exist (shouldn't happen, but safety check)
     if (!integration) {
-      console.error('❌ [onIntegrate] User integration record not found in database')
+      onIntegrateLog.error('User integration record not found in database')
       return { status: 404, message: 'User integration record not found' }
     }
 
     // ✅ First-time integration: user exists but has no integrations
     if (integration.integrations.length === 0) {
-      console.log('🔄 [onIntegrate] First-time integration - no existing integrations found')
-      console.log('🔄 [onIntegrate] Step 1: Generating short-lived token...')
+      onIntegrateLog.debug('First-time integration - no existing integrations found')
+      onIntegrateLog.debug('Step 1: Generating short-lived token')
 
       // 1) SHORT-LIVED TOKEN
-      console.log('🔄 [onIntegrate] Step 1: Generating short-lived token from code...')
+      onIntegrateLog.debug('Step 1: Generating short-lived token from code')
       let token
       try {
         token = await generateTokens(code)
-        console.log('✅ [onIntegrate] Short-lived token received:', {
+        onIntegrateLog.debug('Short-lived token received', () => ({
           hasToken: !!token,
           hasAccessToken: !!token?.access_token,
           tokenKeys: token ? Object.keys(token) : [],
-        })
+        }))
       } catch (tokenError: any) {
-        console.error('❌ [onIntegrate] Failed to generate token:', tokenError)
+        onIntegrateLog.error('Failed to generate token', { error: tokenError })
         return { 
           status: 500, 
           message: tokenError?.message || 'Failed to exchange authorization code for token' 
@@ -60,7 +63,7 @@ export const onIntegrate = async (code: string) => {
       }
 
       if (!token || !token.access_token) {
-        console.error('❌ [onIntegrate] Token response missing access_token:', token)
+        onIntegrateLog.error('Token response missing access_token', { token })
         return { status: 401, message: 'No access token received from Facebook' }
       }
 
@@ -69,7 +72,7 @@ export const onIntegrate = async (code: string) => {
       const clientSecret = process.env.INSTAGRAM_CLIENT_SECRET || process.env.META_APP_SECRET
 
       if (!instagramBaseUrl || !clientSecret) {
-        console.error('❌ [onIntegrate] Missing required environment variables:', {
+        onIntegrateLog.error('Missing required environment variables', {
           hasINSTAGRAM_BASE_URL: !!instagramBaseUrl,
           hasINSTAGRAM_CLIENT_SECRET: !!process.env.INSTAGRAM_CLIENT_SECRET,
           hasMETA_APP_SECRET: !!process.env.META_APP_SECRET,
@@ -114,22 +117,20 @@ export const onIntegrate = async (code: string) => {
       const igUsername = profileResponse.data.username
       const igProfilePhoto = profileResponse.data.profile_picture_url
 
-      console.log('✅ Instagram ID:', igId)
-      console.log('✅ Instagram username:', igUsername)
-      console.log('✅ Instagram photo:', igProfilePhoto)
+      onIntegrateLog.info('Instagram account', { igId, igUsername, hasPhoto: !!igProfilePhoto })
 
       const expire_date = new Date(Date.now() + expiresIn * 1000)
 
       // 4) SAVE EVERYTHING TO DB
-      console.log('💾 [onIntegrate] Step 4: Saving integration to database...')
-      console.log('💾 [onIntegrate] Data to save:', {
+      onIntegrateLog.debug('Step 4: Saving integration to database')
+      onIntegrateLog.debug('Data to save', () => ({
         userId: user.id,
         hasLongToken: !!longToken,
         expireDate: expire_date,
         igId,
         igUsername,
         hasProfilePhoto: !!igProfilePhoto,
-      })
+      }))
       
       const create = await createIntegration(
         user.id,
@@ -140,35 +141,35 @@ export const onIntegrate = async (code: string) => {
         igProfilePhoto
       )
 
-      console.log('💾 [onIntegrate] Integration saved successfully:', {
+      onIntegrateLog.debug('Integration saved successfully', () => ({
         hasData: !!create,
         dataKeys: create ? Object.keys(create) : [],
         firstname: create?.firstname,
         lastname: create?.lastname,
-      })
-      console.log('✅ [onIntegrate] ===== INTEGRATION COMPLETE =====')
+      }))
+      onIntegrateLog.info('INTEGRATION COMPLETE')
 
       return { status: 200, data: create }
     }
 
     // ✅ ALLOW RECONNECTION: Update existing integration with new token
     if (integration.integrations.length > 0) {
-      console.log('🔄 [onIntegrate] Updating existing integration...')
-      console.log('🔄 [onIntegrate] Existing integration count:', integration.integrations.length)
+      onIntegrateLog.debug('Updating existing integration')
+      onIntegrateLog.debug('Existing integration count', { existingIntegrationCount: integration.integrations.length })
       const existingIntegration = integration.integrations[0]
-      console.log('🔄 [onIntegrate] Existing integration ID:', existingIntegration.id)
+      onIntegrateLog.debug('Existing integration ID', { existingIntegrationId: existingIntegration.id })
       
       // 1) SHORT-LIVED TOKEN
-      console.log('🔄 [onIntegrate] Step 1: Generating short-lived token from code...')
+      onIntegrateLog.debug('Step 1: Generating short-lived token from code')
       let token
       try {
         token = await generateTokens(code)
-        console.log('✅ [onIntegrate] Short-lived token received:', {
+        onIntegrateLog.debug('Short-lived token received', () => ({
           hasToken: !!token,
           hasAccessToken: !!token?.access_token,
-        })
+        }))
       } catch (tokenError: any) {
-        console.error('❌ [onIntegrate] Failed to generate token:', tokenError)
+        onIntegrateLog.error('Failed to generate token', { error: tokenError })
         return { 
           status: 500, 
           message: tokenError?.message || 'Failed to exchange authorization code for token' 
@@ -176,7 +177,7 @@ export const onIntegrate = async (code: string) => {
       }
 
       if (!token || !token.access_token) {
-        console.error('❌ [onIntegrate] Token response missing access_token:', token)
+        onIntegrateLog.error('Token response missing access_token', { token })
         return { status: 401, message: 'No access token received from Facebook' }
       }
 
@@ -185,7 +186,7 @@ export const onIntegrate = async (code: string) => {
       const clientSecret = process.env.INSTAGRAM_CLIENT_SECRET || process.env.META_APP_SECRET
 
       if (!instagramBaseUrl || !clientSecret) {
-        console.error('❌ [onIntegrate] Missing required environment variables:', {
+        onIntegrateLog.error('Missing required environment variables', {
           hasINSTAGRAM_BASE_URL: !!instagramBaseUrl,
           hasINSTAGRAM_CLIENT_SECRET: !!process.env.INSTAGRAM_CLIENT_SECRET,
           hasMETA_APP_SECRET: !!process.env.META_APP_SECRET,
@@ -230,7 +231,7 @@ export const onIntegrate = async (code: string) => {
       const igUsername = profileResponse.data.username
       const igProfilePhoto = profileResponse.data.profile_picture_url
 
-      console.log('✅ Updated Instagram data:', {
+      onIntegrateLog.info('Updated Instagram data', {
         id: igId,
         username: igUsername,
         hasPhoto: !!igProfilePhoto,
@@ -249,29 +250,20 @@ export const onIntegrate = async (code: string) => {
         igProfilePhoto
       )
 
-      console.log('✅ [onIntegrate] Integration updated successfully')
-      console.log('✅ [onIntegrate] Updated data:', {
+      onIntegrateLog.info('Integration updated successfully')
+      onIntegrateLog.debug('Updated data', () => ({
         hasData: !!updated,
         dataKeys: updated ? Object.keys(updated) : [],
-      })
-      console.log('✅ [onIntegrate] ===== UPDATE COMPLETE =====')
+      }))
+      onIntegrateLog.info('UPDATE COMPLETE')
       return { status: 200, data: updated }
     }
 
-    console.error('❌ [onIntegrate] Unexpected integration state')
+    onIntegrateLog.error('Unexpected integration state')
     return { status: 404, message: 'Unexpected integration state' }
   } catch (error: any) {
-    console.error('🔴 [onIntegrate] ===== ERROR OCCURRED =====')
-    console.error('🔴 [onIntegrate] Error object:', error)
-    console.error('🔴 [onIntegrate] Error message:', error?.message)
-    console.error('🔴 [onIntegrate] Error stack:', error?.stack)
-    if (error?.response) {
-      console.error('🔴 [onIntegrate] Error response status:', error.response.status)
-      console.error('🔴 [onIntegrate] Error response data:', error.response.data)
-    }
-    
     const errorMessage = error.response?.data?.error?.message || error.message || 'Integration failed'
-    console.error('🔴 [onIntegrate] Final error message:', errorMessage)
+    onIntegrateLog.error('Integration failed', { error, errorMessage })
     
     return {
       status: 500,
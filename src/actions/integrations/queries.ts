@@ -1,6 +1,9 @@
 'use server'
 
 import { client } from '@/lib/prisma'
+import { createLogger } from '@/lib/logger'
+
+const createIntegrationLog = createLogger('createIntegration')
 
 export const updateIntegration = async (
   id: string,
@@ -67,13 +70,13 @@ export const createIntegration = async (
     },
   })
   
-  console.log('💾 [createIntegration] User data returned:', {
+  createIntegrationLog.debug('User data returned', () => ({
     firstname: result.firstname,
     lastname: result.lastname,
     email: result.email,
     hasFirstname: !!result.firstname,
     hasLastname: !!result.lastname,
-  })
+  }))
   
   return result
 }
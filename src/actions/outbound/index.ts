@@ -0,0 +1,42 @@
+'use server'
+
+import { onCurrentUser } from '../user'
+import { getOutboundDeadLetters, replayOutboundDeadLetter } from './queries'
+import { startOutboundWorkers, wakeOutboundWorkers } from './worker'
+import { createLogger } from '@/lib/logger'
+
+const getDeadLettersLog = createLogger('getDeadLetters')
+const replayDeadLetterLog = createLogger('replayDeadLetter')
+
+// Dead-lettered sends for the current user's automations
+export const getDeadLetters = async (includeReplayed = false) => {
+  const user = await onCurrentUser()
+  try {
+    const letters = await getOutboundDeadLetters(user.id, includeReplayed)
+    return { status: 200, data: letters }
+  } catch (error) {
+    getDeadLettersLog.error('Failed', { error })
+    return { status: 500, data: [] }
+  }
+}
+
+// Re-queue a dead-lettered send for delivery
+export const replayDeadLetter = async (id: string) => {
+  const user = await onCurrentUser()
+  try {
+    const letters = await getOutboundDeadLetters(user.id)
+    if (!letters.some((letter) => letter.id === id)) {
+      return { status: 404, data: 'Dead letter not found' }
+    }
+
+    const replayed = await replayOutboundDeadLetter(id)
+    if (!replayed) return { status: 409, data: 'Already replayed' }
+
+    startOutboundWorkers()
+    wakeOutboundWorkers()
+    return { status: 200, data: 'Message queued for delivery' }
+  } catch (error) {
+    replayDeadLetterLog.error('Failed', { error })
+    return { status: 500, data: 'Internal server error' }
+  }
+}
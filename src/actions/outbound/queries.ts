@@ -0,0 +1,146 @@
+import { client } from '@/lib/prisma'
+import { OutboundMessage, OUTBOUND_KIND, Prisma } from '@prisma/client'
+
+export const enqueueOutboundMessage = async (data: {
+  kind: OUTBOUND_KIND
+  pageId: string
+  automationId?: string | null
+  payload: any
+  runAt: Date
+  lastError?: string
+}) => {
+  return await client.outboundMessage.create({
+    data: {
+      kind: data.kind,
+      pageId: data.pageId,
+      automationId: data.automationId || null,
+      payload: data.payload as Prisma.InputJsonValue,
+      runAt: data.runAt,
+      // The inline send that failed counts as the first attempt
+      attempts: 1,
+      lastError: data.lastError?.substring(0, 2000),
+    },
+    select: { id: true },
+  })
+}
+
+// Same claiming scheme as the webhook job queue: PENDING and due, or PROCESSING
+// with a lapsed visibility timeout. SKIP LOCKED keeps workers on disjoint rows.
+export const claimOutboundMessages = async (
+  limit: number,
+  visibilityTimeoutMs: number
+) => {
+  return await client.$queryRaw<OutboundMessage[]>`
+    UPDATE "OutboundMessage"
+    SET "status" = 'PROCESSING',
+        "attempts" = "attempts" + 1,
+        "lockedUntil" = NOW() + (${visibilityTimeoutMs}::int * INTERVAL '1 millisecond'),
+        "updatedAt" = NOW()
+    WHERE "id" IN (
+      SELECT "id" FROM "OutboundMessage"
+      WHERE ("status" = 'PENDING' AND "runAt" <= NOW())
+         OR ("status" = 'PROCESSING' AND "lockedUntil" < NOW())
+      ORDER BY "runAt" ASC
+      LIMIT ${limit}::int
+      FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+  `
+}
+
+// Delivered - nothing left to keep
+export const completeOutboundMessage = async (id: string) => {
+  return await client.outboundMessage.delete({
+    where: { id },
+  })
+}
+
+export const retryOutboundMessage = async (id: string, runAt: Date, error: string) => {
+  return await client.outboundMessage.update({
+    where: { id },
+    data: {
+      status: 'PENDING',
+      lockedUntil: null,
+      runAt,
+      lastError: error.substring(0, 2000),
+      updatedAt: new Date(),
+    },
+  })
+}
+
+// Move a message that can't be delivered into the dead-letter table
+export const deadLetterOutboundMessage = async (message: OutboundMessage, error: string) => {
+  return await client.$transaction([
+    client.outboundDeadLetter.create({
+      data: {
+        messageId: message.id,
+        kind: message.kind,
+        pageId: message.pageId,
+        automationId: message.automationId,
+        payload: message.payload as Prisma.InputJsonValue,
+        attempts: message.attempts,
+        lastError: error.substring(0, 2000),
+      },
+    }),
+    client.outboundMessage.delete({
+      where: { id: message.id },
+    }),
+  ])
+}
+
+export const getOutboundDeadLetters = async (clerkId: string, includeReplayed = false) => {
+  const automations = await client.automation.findMany({
+    where: { User: { clerkId } },
+    select: { id: true },
+  })
+
+  return await client.outboundDeadLetter.findMany({
+    where: {
+      automationId: { in: automations.map((a) => a.id) },
+      ...(!includeReplayed && { replayedAt: null }),
+    },
+    orderBy: { failedAt: 'desc' },
+    take: 100,
+  })
+}
+
+// Put a dead-lettered message back on the queue as a fresh message
+export const replayOutboundDeadLetter = async (id: string) => {
+  return await client.$transaction(async (tx) => {
+    const letter = await tx.outboundDeadLetter.findUnique({
+      where: { id },
+    })
+    if (!letter || letter.replayedAt) return null
+
+    await tx.outboundDeadLetter.update({
+      where: { id },
+      data: { replayedAt: new Date() },
+    })
+
+    return await tx.outboundMessage.create({
+      data: {
+        kind: letter.kind,
+        pageId: letter.pageId,
+        automationId: letter.automationId,
+        payload: letter.payload as Prisma.InputJsonValue,
+      },
+      select: { id: true },
+    })
+  })
+}
+
+// User integration token for an automation, used to refresh an expired page
+// token when a queued send is retried outside the original webhook handler
+export const getAutomationUserToken = async (automationId: string) => {
+  const automation = await client.automation.findUnique({
+    where: { id: automationId },
+    select: {
+      User: {
+        select: {
+          integrations: { select: { token: true } },
+        },
+      },
+    },
+  })
+  return automation?.User?.integrations[0]?.token || null
+}
@@ -0,0 +1,126 @@
+import { DmLink, sendDM, sendPrivateReplyToComment, sendPublicReplyToComment } from '@/lib/fetch'
+import { isTransientError } from '@/lib/graph'
+import { withPageToken } from '@/lib/page-token'
+import { enqueueOutboundMessage } from './queries'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('outbound')
+
+// First retry delay and the cap the jittered backoff grows towards
+const BASE_BACKOFF_MS = Number(process.env.OUTBOUND_BASE_BACKOFF_MS) || 2_000
+const MAX_BACKOFF_MS = Number(process.env.OUTBOUND_MAX_BACKOFF_MS) || 10 * 60 * 1000
+
+// One outbound Graph send, stored as the queue payload when it has to be retried
+export type OutboundSend = {
+  pageId: string
+  automationId?: string | null
+  // Listener counter to bump once the send is delivered
+  track?: 'COMMENT' | 'DM'
+} & (
+  | { kind: 'DM'; recipientId: string; message: string }
+  | {
+      kind: 'PRIVATE_REPLY'
+      commentId: string
+      message: string
+      imageUrl?: string | null
+      links?: readonly DmLink[]
+      recipientId?: string
+    }
+  | { kind: 'PUBLIC_REPLY'; commentId: string; message: string }
+)
+
+export type OutboundOutcome<T = any> =
+  | { sent: true; result: T }
+  | { sent: false; queued: boolean; error: any }
+
+// "Full jitter" exponential backoff: a random delay between 0 and
+// base * 2^attempt (capped), so retries after an outage don't arrive in lockstep
+export const outboundBackoffMs = (attempt: number) =>
+  Math.round(Math.random() * Math.min(MAX_BACKOFF_MS, BASE_BACKOFF_MS * 2 ** attempt))
+
+export const describeOutboundError = (error: any) => {
+  const details = error?.response?.data || error?.error || error?.message || error
+  return typeof details === 'string' ? details : JSON.stringify(details)
+}
+
+// Put a send on the outbound retry queue (the failed inline send is attempt 1)
+const queueForRetry = async (send: OutboundSend, error: any) => {
+  const { kind, pageId, automationId } = send
+  const queued = await enqueueOutboundMessage({
+    kind,
+    pageId,
+    automationId,
+    payload: send,
+    runAt: new Date(Date.now() + outboundBackoffMs(1)),
+    lastError: describeOutboundError(error),
+  })
+  log.warn('Send failed transiently - queued for retry', { kind, pageId, messageId: queued.id })
+  return queued
+}
+
+// Perform the send with the current page token (refreshed once on 190/463).
+// Throws on failure; sendPrivateReplyToComment's `success: false` result is
+// turned into an error carrying its `transient` flag. Follow-up DMs of a private
+// reply that failed transiently after the image went out are queued on their own,
+// so only they are retried.
+export const performOutboundSend = async (send: OutboundSend, userToken?: string | null) => {
+  switch (send.kind) {
+    case 'DM':
+      return await withPageToken(send.pageId, userToken, (token) =>
+        sendDM(send.pageId, send.recipientId, send.message, token)
+      )
+    case 'PUBLIC_REPLY':
+      return await withPageToken(send.pageId, userToken, (token) =>
+        sendPublicReplyToComment(send.pageId, send.commentId, send.message, token)
+      )
+    case 'PRIVATE_REPLY': {
+      const result = await withPageToken(send.pageId, userToken, (token) =>
+        sendPrivateReplyToComment(
+          send.pageId,
+          send.commentId,
+          send.message,
+          token,
+          send.imageUrl,
+          send.links,
+          send.recipientId
+        )
+      )
+      if (!result.success) {
+        const error: any = new Error('Private reply not delivered')
+        error.error = result.error
+        error.transient = !!result.transient
+        error.result = result
+        throw error
+      }
+      const unsent = 'unsent' in result ? result.unsent : []
+      if (unsent.length && send.recipientId) {
+        for (const message of unsent) {
+          await queueForRetry(
+            { kind: 'DM', pageId: send.pageId, automationId: send.automationId, recipientId: send.recipientId, message },
+            'Follow-up message not delivered'
+          )
+        }
+      }
+      return result
+    }
+  }
+}
+
+// Send now; if the send fails on something transient (timeout, 5xx, throttling)
+// hand it to the outbound retry queue instead of dropping it. Permanent failures
+// are returned as-is. The webhook handler never blocks on retries.
+export const sendOrQueue = async (
+  send: OutboundSend,
+  userToken?: string | null
+): Promise<OutboundOutcome> => {
+  try {
+    return { sent: true, result: await performOutboundSend(send, userToken) }
+  } catch (error: any) {
+    if (!isTransientError(error)) {
+      return { sent: false, queued: false, error }
+    }
+
+    await queueForRetry(send, error)
+    return { sent: false, queued: true, error }
+  }
+}
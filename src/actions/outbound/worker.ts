@@ -0,0 +1,132 @@
+import { OutboundMessage } from '@prisma/client'
+import { isTransientError } from '@/lib/graph'
+import { trackResponses } from '@/actions/webhook/counter-buffer'
+import {
+  claimOutboundMessages,
+  completeOutboundMessage,
+  deadLetterOutboundMessage,
+  getAutomationUserToken,
+  retryOutboundMessage,
+} from './queries'
+import {
+  describeOutboundError,
+  outboundBackoffMs,
+  OutboundSend,
+  performOutboundSend,
+} from './send'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('outbound-worker')
+
+// Retry workers per instance. Separate from the webhook workers, so a backlog of
+// retries during a Graph outage never delays fresh webhook events.
+const WORKER_CONCURRENCY = Number(process.env.OUTBOUND_WORKER_CONCURRENCY) || 2
+// How long a claimed message stays invisible before another worker may retry it
+const VISIBILITY_TIMEOUT_MS = Number(process.env.OUTBOUND_VISIBILITY_TIMEOUT_MS) || 60_000
+// Retries are never urgent, so idle workers poll less often than webhook workers
+const IDLE_POLL_MS = 5_000
+
+type WorkerPool = {
+  started: boolean
+  sleepers: Set<() => void>
+}
+
+declare global {
+  var outboundWorkerPool: WorkerPool | undefined
+}
+
+const pool: WorkerPool = globalThis.outboundWorkerPool || {
+  started: false,
+  sleepers: new Set(),
+}
+globalThis.outboundWorkerPool = pool
+
+const idle = () =>
+  new Promise<void>((resolve) => {
+    const wake = () => {
+      clearTimeout(timer)
+      pool.sleepers.delete(wake)
+      resolve()
+    }
+    const timer = setTimeout(wake, IDLE_POLL_MS)
+    pool.sleepers.add(wake)
+  })
+
+const deliver = async (workerId: number, message: OutboundMessage) => {
+  const send = message.payload as unknown as OutboundSend
+
+  // Reclaimed after a crash/timeout once too often
+  if (message.attempts > message.maxAttempts) {
+    await deadLetterOutboundMessage(message, message.lastError || 'Visibility timeout exceeded')
+    return
+  }
+
+  try {
+    const userToken = message.automationId
+      ? await getAutomationUserToken(message.automationId)
+      : null
+    await performOutboundSend(send, userToken)
+    await completeOutboundMessage(message.id)
+    if (message.automationId && send.track) {
+      await trackResponses(message.automationId, send.track)
+    }
+    log.info('Delivered', { workerId, kind: message.kind, messageId: message.id, attempt: message.attempts })
+  } catch (error: any) {
+    const reason = describeOutboundError(error)
+
+    if (!isTransientError(error) || message.attempts >= message.maxAttempts) {
+      log.error('Dead-lettered', { workerId, kind: message.kind, messageId: message.id, attempts: message.attempts, error: reason })
+      await deadLetterOutboundMessage(message, reason)
+      return
+    }
+
+    const delayMs = outboundBackoffMs(message.attempts)
+    log.warn('Send failed - retrying', {
+      workerId,
+      kind: message.kind,
+      messageId: message.id,
+      attempt: message.attempts,
+      maxAttempts: message.maxAttempts,
+      retryInMs: delayMs,
+    })
+    await retryOutboundMessage(message.id, new Date(Date.now() + delayMs), reason)
+  }
+}
+
+const runWorker = async (workerId: number) => {
+  while (true) {
+    let messages
+    try {
+      messages = await claimOutboundMessages(1, VISIBILITY_TIMEOUT_MS)
+    } catch (error: any) {
+      log.error('Failed to claim messages', { workerId, error: error?.message })
+      await idle()
+      continue
+    }
+
+    if (messages.length === 0) {
+      await idle()
+      continue
+    }
+
+    for (const message of messages) {
+      await deliver(workerId, message).catch((error) =>
+        log.error('Failed to record outcome', { workerId, messageId: message.id, error: error?.message })
+      )
+    }
+  }
+}
+
+// Start the in-process retry worker pool (idempotent)
+export const startOutboundWorkers = () => {
+  if (pool.started) return
+  pool.started = true
+  log.info('Starting workers', { workers: WORKER_CONCURRENCY })
+  for (let i = 0; i < WORKER_CONCURRENCY; i++) {
+    void runWorker(i)
+  }
+}
+
+export const wakeOutboundWorkers = () => {
+  for (const wake of Array.from(pool.sleepers)) wake()
+}
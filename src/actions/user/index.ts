@@ -4,6 +4,11 @@ import { createUser, findUser, updateSubscription } from './queries'
 import { refreshToken } from '@/lib/fetch'
 import { updateIntegration } from '../integrations/queries'
 import { stripe } from '@/lib/stripe'
+import { createLogger } from '@/lib/logger'
+
+const onBoardUserLog = createLogger('onBoardUser')
+const onUserInfoLog = createLogger('onUserInfo')
+const onSubscribeLog = createLogger('onSubscribe')
 
 export const onCurrentUser = async () => {
   return {
@@ -26,7 +31,7 @@ export const onBoardUser = async () => {
 
         const days = Math.round(time_left / (1000 * 3600 * 24))
         if (days < 5) {
-          console.log('🔄 [onBoardUser] Token expires in', days, 'days, refreshing...')
+          onBoardUserLog.debug('Token expires soon, refreshing', { days })
 
           const refresh = await refreshToken(found.integrations[0].token)
 
@@ -41,15 +46,15 @@ export const onBoardUser = async () => {
                 expire_date
               )
               if (update_token) {
-                console.log('✅ [onBoardUser] Token refreshed successfully')
+                onBoardUserLog.info('Token refreshed successfully')
               } else {
-                console.error('❌ [onBoardUser] Update token failed - no result returned')
+                onBoardUserLog.error('Update token failed - no result returned')
               }
             } catch (updateError: any) {
-              console.error('❌ [onBoardUser] Update token failed:', updateError?.message || updateError)
+              onBoardUserLog.error('Update token failed', { error: updateError?.message || updateError })
             }
           } else {
-            console.error('❌ [onBoardUser] Token refresh failed - no access_token in response')
+            onBoardUserLog.error('Token refresh failed - no access_token in response')
           }
         }
       }
@@ -70,7 +75,7 @@ export const onBoardUser = async () => {
     )
     return { status: 201, data: created }
   } catch (error) {
-    console.log(error)
+    onBoardUserLog.error('Failed', { error })
     return { status: 500 }
   }
 }
@@ -78,57 +83,55 @@ export const onBoardUser = async () => {
 export const onUserInfo = async () => {
   try {
   const user = await onCurrentUser()
-    console.log('🔍 [onUserInfo] User ID:', user?.id)
+    onUserInfoLog.debug('User ID', { userId: user?.id })
     
     if (!user || !user.id) {
-      console.error('❌ [onUserInfo] No user')
+      onUserInfoLog.error('No user')
       return { status: 401, data: null }
     }
     
     const profile = await findUser(user.id)
-    console.log('🔍 [onUserInfo] Profile found:', !!profile)
+    onUserInfoLog.debug('Profile found', { profileFound: !!profile })
     
     if (profile) {
-      console.log('✅ [onUserInfo] Returning profile with integrations:', profile.integrations?.length || 0)
+      onUserInfoLog.debug('Returning profile with integrations', { integrations: profile.integrations?.length || 0 })
       return { status: 200, data: profile }
     }
 
-    console.warn('⚠️ [onUserInfo] Profile not found for user:', user.id)
+    onUserInfoLog.warn('Profile not found for user', { userId: user.id })
     // ✅ Return empty data instead of 404 to prevent React Query errors
     return { status: 200, data: null }
   } catch (error: any) {
-    console.error('❌ [onUserInfo] ERROR:', error)
-    console.error('❌ [onUserInfo] Error stack:', error?.stack)
+    onUserInfoLog.error('Failed', { error })
     return { status: 500, data: null }
   }
 }
 
 export const onSubscribe = async (session_id: string) => {
-  console.log('🔍 [onSubscribe] Starting for session_id:', session_id)
+  onSubscribeLog.debug('Starting for session_id', { session_id })
   const user = await onCurrentUser()
-  console.log('🔍 [onSubscribe] User ID:', user?.id)
+  onSubscribeLog.debug('User ID', { userId: user?.id })
   try {
     const session = await stripe.checkout.sessions.retrieve(session_id)
-    console.log('🔍 [onSubscribe] Session found:', !!session, 'customer:', session?.customer)
+    onSubscribeLog.debug('Session found', { sessionFound: !!session, customer: session?.customer })
     if (session) {
       const subscribed = await updateSubscription(user.id, {
         customerId: session.customer as string,
         plan: 'PRO',
       })
-      console.log('🔍 [onSubscribe] Subscription update result:', !!subscribed)
+      onSubscribeLog.debug('Subscription update result', { subscriptionUpdateResult: !!subscribed })
 
       if (subscribed) {
-        console.log('✅ [onSubscribe] Success')
+        onSubscribeLog.info('Success')
         return { status: 200 }
       }
-      console.warn('⚠️ [onSubscribe] Subscription update failed')
+      onSubscribeLog.warn('Subscription update failed')
       return { status: 401 }
     }
-    console.warn('⚠️ [onSubscribe] Session not found')
+    onSubscribeLog.warn('Session not found')
     return { status: 404 }
   } catch (error: any) {
-    console.error('❌ [onSubscribe] ERROR:', error)
-    console.error('❌ [onSubscribe] Error details:', { message: error?.message, stack: error?.stack })
+    onSubscribeLog.error('Failed', { error })
     return { status: 500 }
   }
 }
@@ -0,0 +1,69 @@
+import { LRUCache } from '@/lib/lru'
+import { getWebhookAutomation } from './queries'
+import { getReplyPlan, ReplyPlan } from './reply-plan'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('automation-resolver')
+
+// Resolved automations are reused for this long. Edits made through the
+// automation actions on this instance invalidate them right away; plan and
+// token changes (and edits on other instances) show up after the TTL.
+const AUTOMATION_CACHE_TTL_MS = Number(process.env.AUTOMATION_CACHE_TTL_MS) || 30_000
+const AUTOMATION_CACHE_SIZE = 2_000
+
+export type ResolvedAutomation = {
+  id: string
+  active: boolean
+  userId: string | null
+  listener: { listener: 'SMARTAI' | 'MESSAGE'; prompt: string } | null
+  // Compiled MESSAGE reply (public reply, DM text, image URL, rendered links)
+  replyPlan: ReplyPlan | null
+  plan: 'PRO' | 'FREE' | null
+  token: string | null
+  triggers: string[]
+  postIds: string[]
+}
+
+declare global {
+  var webhookAutomationCache: LRUCache<string, ResolvedAutomation | null> | undefined
+}
+
+const cache =
+  globalThis.webhookAutomationCache ||
+  new LRUCache<string, ResolvedAutomation | null>(AUTOMATION_CACHE_SIZE, AUTOMATION_CACHE_TTL_MS)
+globalThis.webhookAutomationCache = cache
+
+const resolve = async (automationId: string): Promise<ResolvedAutomation | null> => {
+  const automation = await getWebhookAutomation(automationId)
+  if (!automation) return null
+
+  const listener = automation.listener
+  return {
+    id: automation.id,
+    active: automation.active,
+    userId: automation.userId,
+    listener: listener && { listener: listener.listener, prompt: listener.prompt },
+    replyPlan: listener?.listener === 'MESSAGE' ? getReplyPlan(automation.id, listener) : null,
+    plan: automation.User?.subscription?.plan || null,
+    token: automation.User?.integrations[0]?.token || null,
+    triggers: automation.trigger.map((t) => t.type),
+    postIds: automation.posts.map((p) => p.postid),
+  }
+}
+
+// One query (or none, when cached) for everything a matched webhook event needs:
+// listener type and prompt, the compiled reply plan, plan, token, trigger types and post ids
+export const resolveWebhookAutomation = async (automationId: string) => {
+  const cached = cache.get(automationId)
+  if (cached !== undefined) return cached
+
+  const automation = await resolve(automationId)
+  cache.set(automationId, automation)
+  log.debug('Resolved automation', { automationId, found: !!automation })
+  return automation
+}
+
+// Drop a cached automation after it was edited
+export const invalidateWebhookAutomation = (automationId: string) => {
+  cache.delete(automationId)
+}
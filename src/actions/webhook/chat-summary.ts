@@ -0,0 +1,68 @@
+import { createChatReply } from '@/lib/openai'
+import { getUnsummarizedMessages, saveConversationSummary } from './queries'
+import { createLogger } from '@/lib/logger'
+
+// Recent messages sent verbatim to the model on every SMARTAI turn
+export const CHAT_HISTORY_WINDOW = Number(process.env.CHAT_HISTORY_WINDOW) || 12
+// Messages that have left the window are folded into the summary once this many
+// have piled up, and at most SUMMARY_MAX_BATCH at a time
+const SUMMARY_MIN_BATCH = Number(process.env.CHAT_SUMMARY_BATCH) || 10
+const SUMMARY_MAX_BATCH = 40
+const SUMMARY_MODEL = 'gpt-4o-mini'
+
+const log = createLogger('chat-summary')
+
+declare global {
+  var chatSummaryInflight: Set<string> | undefined
+}
+
+// One refresh per conversation at a time
+const inflight: Set<string> = globalThis.chatSummaryInflight || new Set()
+globalThis.chatSummaryInflight = inflight
+
+// Fold the messages that dropped out of the history window into the stored
+// rolling summary. Runs in batches, so each call costs at most one small
+// completion no matter how long the conversation is.
+export const refreshConversationSummary = async (
+  pageId: string,
+  userId: string,
+  windowStart: Date | null
+) => {
+  const key = `${pageId}:${userId}`
+  if (!windowStart || inflight.has(key)) return
+  inflight.add(key)
+
+  try {
+    const { summary, messages } = await getUnsummarizedMessages(pageId, userId, windowStart, SUMMARY_MAX_BATCH)
+    if (messages.length < SUMMARY_MIN_BATCH) return
+
+    const transcript = messages
+      .map((m) => `${m.senderId === pageId ? 'Assistant' : 'Customer'}: ${m.message || ''}`)
+      .join('\n')
+
+    const updated = await createChatReply({
+      model: SUMMARY_MODEL,
+      messages: [
+        {
+          role: 'system',
+          content:
+            'You keep a running summary of a customer conversation for an assistant. ' +
+            'Merge the new messages into the existing summary. Keep facts the customer shared, ' +
+            'open questions and anything promised to them. At most 5 sentences.',
+        },
+        {
+          role: 'user',
+          content: `Existing summary:\n${summary || '(none)'}\n\nNew messages:\n${transcript}`,
+        },
+      ],
+    })
+    if (!updated) return
+
+    await saveConversationSummary(pageId, userId, updated, messages[messages.length - 1].createdAt)
+    log.debug('Summary updated', { pageId, messages: messages.length })
+  } catch (error: any) {
+    log.error('Failed to update conversation summary', { error: error?.message })
+  } finally {
+    inflight.delete(key)
+  }
+}
@@ -0,0 +1,53 @@
+import { LRUCache } from '@/lib/lru'
+import { getConversation, saveChatTurn } from './queries'
+import { mightHaveConversation, noteConversation, reportFalsePositive } from './sender-filter'
+
+// How long a conversation lookup is reused. Writes on this instance replace
+// the entry right away; other instances see them after the TTL.
+const CONVERSATION_CACHE_TTL_MS = Number(process.env.CONVERSATION_CACHE_TTL_MS) || 30_000
+// "No conversation" is cached for less time, so a first turn handled by another
+// instance is picked up quickly
+const NEGATIVE_TTL_MS = 5_000
+const CONVERSATION_CACHE_SIZE = 10_000
+
+export type ActiveConversation = NonNullable<Awaited<ReturnType<typeof getConversation>>>
+
+declare global {
+  var conversationCache: LRUCache<string, ActiveConversation | null> | undefined
+}
+
+const cache =
+  globalThis.conversationCache ||
+  new LRUCache<string, ActiveConversation | null>(CONVERSATION_CACHE_SIZE, CONVERSATION_CACHE_TTL_MS)
+globalThis.conversationCache = cache
+
+const conversationKey = (pageId: string, userId: string) => `${pageId}:${userId}`
+
+// The conversation a DM sender has with the page (and the automation running it), or null
+export const getActiveConversation = async (pageId: string, userId: string) => {
+  // Most DMs come from people who never triggered an automation - answered from memory
+  if (!(await mightHaveConversation(pageId, userId))) return null
+
+  const key = conversationKey(pageId, userId)
+  const cached = cache.get(key)
+  if (cached !== undefined) return cached
+
+  const conversation = await getConversation(pageId, userId)
+  if (!conversation) reportFalsePositive()
+  cache.set(key, conversation, conversation ? CONVERSATION_CACHE_TTL_MS : NEGATIVE_TTL_MS)
+  return conversation
+}
+
+// Save a user message + AI reply and update the conversation row in one transaction
+export const recordChatTurn = async (
+  automationId: string,
+  pageId: string,
+  userId: string,
+  userMessage: string,
+  aiMessage: string
+) => {
+  await saveChatTurn(automationId, pageId, userId, userMessage, aiMessage)
+  noteConversation(pageId, userId)
+  // The automation running the conversation may have changed - reload on next lookup
+  cache.delete(conversationKey(pageId, userId))
+}
@@ -0,0 +1,138 @@
+import {
+  applyResponseCounts,
+  applyShardedResponseCounts,
+  compactCounterShards,
+  ResponseCountDelta,
+} from './queries'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('counter-buffer')
+
+// Flush buffered counts at least this often...
+const FLUSH_INTERVAL_MS = Number(process.env.COUNTER_FLUSH_INTERVAL_MS) || 1_000
+// ...or as soon as this many increments are waiting
+const FLUSH_MAX_EVENTS = Number(process.env.COUNTER_FLUSH_MAX_EVENTS) || 100
+// Slots per automation in ListenerCounterShard; 0 writes straight to Listener
+const COUNTER_SHARDS = Number(process.env.COUNTER_SHARDS) || 0
+// How often shard slots are folded back into Listener
+const COMPACT_INTERVAL_MS = Number(process.env.COUNTER_COMPACT_INTERVAL_MS) || 60_000
+
+type CounterBuffer = {
+  pending: Map<string, { dm: number; comment: number }>
+  events: number
+  timer: ReturnType<typeof setTimeout> | null
+  flushing: Promise<void> | null
+  shutdownHooked: boolean
+  lastCompaction: number
+}
+
+declare global {
+  var responseCounterBuffer: CounterBuffer | undefined
+}
+
+const buffer: CounterBuffer = globalThis.responseCounterBuffer || {
+  pending: new Map(),
+  events: 0,
+  timer: null,
+  flushing: null,
+  shutdownHooked: false,
+  lastCompaction: Date.now(),
+}
+globalThis.responseCounterBuffer = buffer
+
+const add = (automationId: string, dm: number, comment: number) => {
+  const counts = buffer.pending.get(automationId) || { dm: 0, comment: 0 }
+  counts.dm += dm
+  counts.comment += comment
+  buffer.pending.set(automationId, counts)
+}
+
+// Write every buffered increment in one UPDATE. On failure the counts are
+// merged back so they go out with the next flush.
+export const flushResponseCounts = async (): Promise<void> => {
+  if (buffer.timer) {
+    clearTimeout(buffer.timer)
+    buffer.timer = null
+  }
+  // One flush at a time; increments arriving meanwhile wait for the next one
+  if (buffer.flushing) {
+    await buffer.flushing
+    if (buffer.pending.size > 0) return flushResponseCounts()
+    return
+  }
+  if (buffer.pending.size === 0) return
+
+  const batch: ResponseCountDelta[] = Array.from(buffer.pending, ([automationId, counts]) => ({
+    automationId,
+    ...counts,
+  }))
+  buffer.pending = new Map()
+  buffer.events = 0
+
+  const write = COUNTER_SHARDS > 0
+    ? applyShardedResponseCounts(batch, COUNTER_SHARDS)
+    : applyResponseCounts(batch)
+
+  buffer.flushing = write
+    .then(() => {
+      log.debug('Flushed counts', { automations: batch.length })
+      maybeCompact()
+    })
+    .catch((error) => {
+      log.error('Flush failed - keeping counts for the next flush', { error: error?.message })
+      for (const { automationId, dm, comment } of batch) add(automationId, dm, comment)
+      scheduleFlush()
+    })
+    .finally(() => {
+      buffer.flushing = null
+    })
+
+  await buffer.flushing
+}
+
+// Piggybacks on flushes, like the dedup purge: at most one compaction per interval.
+// Also runs with sharding off, so slots left over from when it was on get drained.
+const maybeCompact = () => {
+  if (Date.now() - buffer.lastCompaction < COMPACT_INTERVAL_MS) return
+  buffer.lastCompaction = Date.now()
+  compactCounterShards().catch((error) =>
+    log.error('Failed to compact counter shards', { error: error?.message })
+  )
+}
+
+const scheduleFlush = () => {
+  if (buffer.timer) return
+  buffer.timer = setTimeout(() => void flushResponseCounts(), FLUSH_INTERVAL_MS)
+  // Don't keep the process alive just for a pending flush (the exit hooks handle it)
+  buffer.timer.unref?.()
+}
+
+// Flush what's left when the process is stopped
+const hookShutdown = () => {
+  if (buffer.shutdownHooked) return
+  buffer.shutdownHooked = true
+
+  process.once('beforeExit', () => void flushResponseCounts())
+  for (const signal of ['SIGTERM', 'SIGINT'] as const) {
+    process.once(signal, () => {
+      flushResponseCounts().finally(() => {
+        // Only exit ourselves if nothing else (e.g. the Next.js server) handles the signal
+        if (process.listenerCount(signal) === 0) process.exit(0)
+      })
+    })
+  }
+}
+
+// Count a delivered reply. The increment is buffered in memory and written
+// with everyone else's on the next flush instead of as its own UPDATE.
+export const trackResponses = (automationId: string, type: 'COMMENT' | 'DM') => {
+  hookShutdown()
+  add(automationId, type === 'DM' ? 1 : 0, type === 'COMMENT' ? 1 : 0)
+  buffer.events++
+
+  if (buffer.events >= FLUSH_MAX_EVENTS) {
+    void flushResponseCounts()
+  } else {
+    scheduleFlush()
+  }
+}
@@ -0,0 +1,124 @@
+import { beforeEach, describe, expect, it, vi } from 'vitest'
+
+// In-memory stand-in for the ProcessedEvent table, following the same conflict
+// rule as recordProcessedEvent: a key can be (re)claimed when it is new, expired,
+// or held by the same job.
+const rows = new Map<string, { jobId: string | null; expiresAt: number }>()
+
+vi.mock('./queries', () => ({
+  recordProcessedEvent: vi.fn(async (key: string, ttlMs: number, jobId: string | null) => {
+    const row = rows.get(key)
+    if (row && row.expiresAt >= Date.now() && !(row.jobId !== null && row.jobId === jobId)) {
+      return false
+    }
+    rows.set(key, { jobId, expiresAt: Date.now() + ttlMs })
+    return true
+  }),
+  completeProcessedEvent: vi.fn(async (key: string) => {
+    const row = rows.get(key)
+    if (row) row.jobId = null
+  }),
+  deleteProcessedEvent: vi.fn(async (key: string) => {
+    rows.delete(key)
+  }),
+  purgeExpiredEvents: vi.fn(async () => 0),
+}))
+
+const loadDispatcher = async () => {
+  // Fresh module state (the in-process LRU) for every test
+  vi.resetModules()
+  return import('./dispatcher')
+}
+
+const commentEntry = (commentId: string) => ({
+  changes: [{ field: 'comments', value: { id: commentId, from: { id: 'user-1' } } }],
+})
+
+describe('dispatchWebhookBatch dedup', () => {
+  beforeEach(() => {
+    rows.clear()
+  })
+
+  it('skips a redelivered event from another job', async () => {
+    const { dispatchWebhookBatch } = await loadDispatcher()
+    const comment = vi.fn(async () => ({ message: 'ok' }))
+    const handlers = { comment, messaging: vi.fn() }
+
+    await dispatchWebhookBatch([commentEntry('c1')], handlers, 'job-1')
+    const second = await dispatchWebhookBatch([commentEntry('c1')], handlers, 'job-2')
+
+    expect(comment).toHaveBeenCalledTimes(1)
+    expect(second.results[0].message).toBe('Duplicate event skipped')
+  })
+
+  it('lets a reclaimed job run an event its crashed worker had claimed', async () => {
+    const { dispatchWebhookBatch } = await loadDispatcher()
+    const comment = vi.fn(async () => ({ message: 'ok' }))
+
+    // The first worker claimed the event and died before the handler finished
+    rows.set('comment:c1', { jobId: 'job-1', expiresAt: Date.now() + 60_000 })
+
+    const result = await dispatchWebhookBatch(
+      [commentEntry('c1')],
+      { comment, messaging: vi.fn() },
+      'job-1'
+    )
+
+    expect(comment).toHaveBeenCalledTimes(1)
+    expect(result.succeeded).toBe(1)
+  })
+
+  it('retries only the failed events when the same job runs again', async () => {
+    const { dispatchWebhookBatch } = await loadDispatcher()
+    let failures = 1
+    const comment = vi.fn(async (change: any) => {
+      if (change.value.id === 'c2' && failures-- > 0) throw new Error('boom')
+      return { message: 'ok' }
+    })
+    const handlers = { comment, messaging: vi.fn() }
+    const entries = [commentEntry('c1'), commentEntry('c2')]
+
+    const first = await dispatchWebhookBatch(entries, handlers, 'job-1')
+    expect(first.failed).toBe(1)
+
+    // failWebhookJob re-queues the job under the same id
+    const retry = await dispatchWebhookBatch(entries, handlers, 'job-1')
+    expect(retry.results[0].message).toBe('Duplicate event skipped')
+    expect(retry.results[1].message).toBe('ok')
+    expect(comment.mock.calls.map(([change]: any) => change.value.id)).toEqual(['c1', 'c2', 'c2'])
+  })
+
+  it('does not rerun a handled event when the job is reclaimed on another instance', async () => {
+    const { dispatchWebhookBatch } = await loadDispatcher()
+    const comment = vi.fn(async () => ({ message: 'ok' }))
+
+    // Handled by job-1's previous worker: the claim was closed
+    rows.set('comment:c1', { jobId: null, expiresAt: Date.now() + 60_000 })
+
+    const result = await dispatchWebhookBatch(
+      [commentEntry('c1')],
+      { comment, messaging: vi.fn() },
+      'job-1'
+    )
+
+    expect(comment).not.toHaveBeenCalled()
+    expect(result.results[0].message).toBe('Duplicate event skipped')
+  })
+
+  it('releases the claim when the handler throws', async () => {
+    const { dispatchWebhookBatch } = await loadDispatcher()
+    const comment = vi
+      .fn()
+      .mockRejectedValueOnce(new Error('boom'))
+      .mockResolvedValueOnce({ message: 'ok' })
+    const handlers = { comment, messaging: vi.fn() }
+
+    const first = await dispatchWebhookBatch([commentEntry('c1')], handlers, 'job-1')
+    expect(first.failed).toBe(1)
+    expect(rows.has('comment:c1')).toBe(false)
+
+    const retry = await dispatchWebhookBatch([commentEntry('c1')], handlers, 'job-2')
+    expect(retry.succeeded).toBe(1)
+    expect(comment).toHaveBeenCalledTimes(2)
+  })
+})
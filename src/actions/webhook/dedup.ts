@@ -0,0 +1,65 @@
+import { LRUCache } from '@/lib/lru'
+import {
+  completeProcessedEvent,
+  deleteProcessedEvent,
+  purgeExpiredEvents,
+  recordProcessedEvent,
+} from './queries'
+import { createLogger } from '@/lib/logger'
+
+// How long a comment id / message mid is remembered (Meta retries within hours)
+const DEDUP_TTL_MS = Number(process.env.WEBHOOK_DEDUP_TTL_MS) || 24 * 60 * 60 * 1000
+const DEDUP_LRU_SIZE = 10_000
+const PURGE_INTERVAL_MS = 10 * 60 * 1000
+
+const log = createLogger('dedup')
+
+// event key -> id of the job handling it ('' once handled, or claimed outside the queue)
+const seen = new LRUCache<string, string>(DEDUP_LRU_SIZE, DEDUP_TTL_MS)
+let lastPurge = 0
+
+// Dedup key for a webhook event: comment `id` for comment changes, message `mid` for DMs
+export const getEventKey = (kind: 'comment' | 'messaging', event: any): string | null => {
+  if (kind === 'comment') {
+    const commentId = event?.value?.id
+    return commentId ? `comment:${commentId}` : null
+  }
+
+  const mid = event?.message?.mid
+  return mid ? `message:${mid}` : null
+}
+
+// Claim an event for processing. Returns false for a duplicate delivery.
+// The in-process LRU answers repeat deliveries to this instance without a query;
+// the ProcessedEvent unique key catches duplicates that land on other instances.
+// A claim belongs to the queue job that made it until the event is handled: when
+// that job is reclaimed after its worker crashed or timed out, it claims its
+// unfinished events again and runs them. Handled events stay duplicates.
+export const claimEvent = async (key: string, jobId: string | null = null) => {
+  const owner = seen.get(key)
+  if (owner !== undefined) return !!jobId && owner === jobId
+
+  const claimed = await recordProcessedEvent(key, DEDUP_TTL_MS, jobId)
+  if (claimed) seen.set(key, jobId || '')
+
+  if (Date.now() - lastPurge > PURGE_INTERVAL_MS) {
+    lastPurge = Date.now()
+    purgeExpiredEvents().catch((error) =>
+      log.error('Failed to purge expired events', { error: error?.message })
+    )
+  }
+
+  return claimed
+}
+
+// The event was handled - a retry of the same job must not run it again
+export const completeEvent = async (key: string) => {
+  seen.set(key, '')
+  await completeProcessedEvent(key)
+}
+
+// Forget an event whose processing failed so the queue retry can run it again
+export const releaseEvent = async (key: string) => {
+  seen.delete(key)
+  await deleteProcessedEvent(key)
+}
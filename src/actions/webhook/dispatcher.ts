@@ -0,0 +1,144 @@
+import type { WebhookResult } from './handlers'
+import { claimEvent, completeEvent, getEventKey, releaseEvent } from './dedup'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('dispatchWebhookBatch')
+
+// Max number of senders processed in parallel for one delivery
+const BATCH_CONCURRENCY = Number(process.env.WEBHOOK_BATCH_CONCURRENCY) || 8
+
+type EventKind = 'comment' | 'messaging'
+
+type BatchItem = {
+  kind: EventKind
+  // Events from the same sender share a key and run one after another
+  key: string
+  event: any
+}
+
+export type BatchItemResult = {
+  kind: EventKind
+  key: string
+  message?: string
+  error?: string
+}
+
+export type BatchResult = {
+  total: number
+  succeeded: number
+  failed: number
+  results: BatchItemResult[]
+}
+
+type BatchHandlers = {
+  comment: (change: any) => Promise<WebhookResult>
+  messaging: (messaging: any) => Promise<WebhookResult>
+}
+
+// Flatten every entry.changes[] and entry.messaging[] item in delivery order
+const collectItems = (entries: any[]): BatchItem[] => {
+  const items: BatchItem[] = []
+
+  entries.forEach((entry, entryIndex) => {
+    if (Array.isArray(entry?.changes)) {
+      for (const change of entry.changes) {
+        items.push({
+          kind: 'comment',
+          key: change?.value?.from?.id || `entry-${entryIndex}`,
+          event: change,
+        })
+      }
+    }
+
+    if (Array.isArray(entry?.messaging)) {
+      for (const messaging of entry.messaging) {
+        items.push({
+          kind: 'messaging',
+          key: messaging?.sender?.id || `entry-${entryIndex}`,
+          event: messaging,
+        })
+      }
+    }
+  })
+
+  return items
+}
+
+// Fan out every event in a webhook batch to the comment / DM handlers.
+// Events are grouped into one lane per sender so a sender's events keep their
+// order, and at most BATCH_CONCURRENCY lanes run at the same time.
+// `jobId` is the queue job delivering the batch; events are claimed for it.
+export const dispatchWebhookBatch = async (
+  entries: any[],
+  handlers: BatchHandlers,
+  jobId: string | null = null,
+  concurrency: number = BATCH_CONCURRENCY
+): Promise<BatchResult> => {
+  const items = collectItems(entries)
+  const results: BatchItemResult[] = new Array(items.length)
+
+  const lanes = new Map<string, number[]>()
+  items.forEach((item, index) => {
+    const lane = lanes.get(item.key)
+    if (lane) lane.push(index)
+    else lanes.set(item.key, [index])
+  })
+
+  const queue = Array.from(lanes.values())
+
+  const runLane = async (lane: number[]) => {
+    for (const index of lane) {
+      const item = items[index]
+      const eventKey = getEventKey(item.kind, item.event)
+      let claimed = false
+      try {
+        // Meta redelivers events - skip anything we've already handled
+        if (eventKey) {
+          claimed = await claimEvent(eventKey, jobId)
+          if (!claimed) {
+            results[index] = { kind: item.kind, key: item.key, message: 'Duplicate event skipped' }
+            continue
+          }
+        }
+
+        const result =
+          item.kind === 'comment'
+            ? await handlers.comment(item.event)
+            : await handlers.messaging(item.event)
+        results[index] = { kind: item.kind, key: item.key, message: result.message }
+
+        // Close the claim so a retry of this job (after another event failed) skips it
+        if (eventKey && claimed && jobId) {
+          await completeEvent(eventKey).catch((error) =>
+            log.warn('Could not mark event handled', { key: eventKey, error: error?.message })
+          )
+        }
+      } catch (error: any) {
+        if (eventKey && claimed) {
+          await releaseEvent(eventKey).catch(() => {})
+        }
+        log.error('Event failed', { kind: item.kind, key: item.key, error: error?.message })
+        results[index] = { kind: item.kind, key: item.key, error: error?.message || String(error) }
+      }
+    }
+  }
+
+  const runNext = async (): Promise<void> => {
+    const lane = queue.shift()
+    if (!lane) return
+    await runLane(lane)
+    return runNext()
+  }
+
+  await Promise.all(
+    Array.from({ length: Math.min(Math.max(concurrency, 1), queue.length) }, runNext)
+  )
+
+  const failed = results.filter((r) => r.error).length
+  return {
+    total: items.length,
+    succeeded: items.length - failed,
+    failed,
+    results,
+  }
+}
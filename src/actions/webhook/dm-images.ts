@@ -0,0 +1,253 @@
+import { decodeImageDataUrl, deleteBlob, getBlob, hashBlob, isBlobHash, putBlob } from '@/lib/blob-store'
+import { normalizeImage } from '@/lib/image-normalizer'
+import { LRUCache } from '@/lib/lru'
+import {
+  deleteUnusedImageBlobs,
+  getDmImageSource,
+  getInlineDmImageListeners,
+  moveListenerDmImage,
+  saveImageBlob,
+  StoredImage,
+} from './queries'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('dm-images')
+
+const MIGRATION_BATCH = 50
+// Decoded images kept in memory for the dm-image route, bounded by total bytes
+const DM_IMAGE_CACHE_BYTES = Number(process.env.DM_IMAGE_CACHE_BYTES) || 64 * 1024 * 1024
+const DM_IMAGE_CACHE_SIZE = 1_000
+// How long "automation X currently shows image H" is trusted for requests
+// without ?v=<hash>. Saves on this instance clear it right away.
+const DM_IMAGE_POINTER_TTL_MS = 60_000
+// How long an uploaded image may wait for the listener save that uses it
+// before a sweep treats it as unused
+const UNUSED_IMAGE_GRACE_MS = 24 * 60 * 60 * 1000
+
+export type StoredDmImage = StoredImage & { rendition: StoredImage | null }
+
+// Path the builder (and, made absolute, Meta) loads a stored DM image from.
+// The hash makes the URL change whenever the image does.
+export const dmImagePath = (automationId: string, hash: string) =>
+  `/api/dm-image/${automationId}?v=${hash}`
+
+// The hash in a URL built by dmImagePath - the builder sends it back on every save
+export const parseDmImagePath = (value: string) => {
+  const match = value.match(/^(?:https?:\/\/[^/]+)?\/api\/dm-image\/[^/?]+\?v=([0-9a-f]{64})$/)
+  return match && isBlobHash(match[1]) ? match[1] : null
+}
+
+// Put image bytes in the blob store, with the optimized rendition that DMs
+// actually send stored next to them
+const storeImageBytes = async (data: Buffer, contentType: string): Promise<StoredDmImage> => {
+  const [hash, normalized] = await Promise.all([
+    putBlob(data),
+    normalizeImage(data).catch((error) => {
+      log.warn('Could not normalize image', { error: error?.message })
+      return null
+    }),
+  ])
+
+  let rendition: StoredImage | null = null
+  if (normalized) {
+    rendition = {
+      hash: await putBlob(normalized.data),
+      contentType: normalized.contentType,
+      size: normalized.data.length,
+      width: normalized.width,
+      height: normalized.height,
+    }
+  }
+  return { hash, contentType, size: data.length, rendition }
+}
+
+// Move a base64 data URL (older builders, and the backfill) into the blob store
+export const storeDmImage = async (dataUrl: string) => {
+  const image = decodeImageDataUrl(dataUrl)
+  if (!image) return null
+  return storeImageBytes(image.data, image.contentType)
+}
+
+// An image uploaded by the builder: stored now, linked to the listener by the
+// next save, which sends back the URL returned here
+export const saveDmImageUpload = async (automationId: string, data: Buffer, contentType: string) => {
+  const image = await storeImageBytes(data, contentType)
+  await saveImageBlob(image)
+  log.info('Image uploaded', () => ({
+    automationId,
+    hash: image.hash,
+    bytes: image.size,
+    renditionBytes: image.rendition?.size,
+  }))
+  return { ...image, url: dmImagePath(automationId, image.hash) }
+}
+
+// -----------------------------
+// Serving
+// -----------------------------
+
+export type DmImage = {
+  // The listener's image hash - what ?v= names
+  version: string
+  // SHA-256 of the bytes served (the rendition's when there is one) - the ETag
+  hash: string
+  contentType: string
+  data: Buffer
+}
+
+declare global {
+  var dmImageCache: LRUCache<string, DmImage> | undefined
+  var dmImagePointers: LRUCache<string, string | null> | undefined
+}
+
+// automationId:version -> decoded image
+const images =
+  globalThis.dmImageCache ||
+  new LRUCache<string, DmImage>(DM_IMAGE_CACHE_SIZE, Infinity, {
+    maxSize: DM_IMAGE_CACHE_BYTES,
+    sizeOf: (image) => image.data.length,
+  })
+globalThis.dmImageCache = images
+
+// automationId -> version of its current image (null: none)
+const pointers =
+  globalThis.dmImagePointers ||
+  new LRUCache<string, string | null>(DM_IMAGE_CACHE_SIZE * 10, DM_IMAGE_POINTER_TTL_MS)
+globalThis.dmImagePointers = pointers
+
+const readDmImage = async (automationId: string): Promise<DmImage | null> => {
+  const source = await getDmImageSource(automationId)
+  if (!source) return null
+
+  if (source.dmImageHash && source.dmImage) {
+    const version = source.dmImageHash
+    const rendition = source.dmImage.rendition
+    if (rendition) {
+      const data = await getBlob(rendition.hash)
+      if (data) return { version, hash: rendition.hash, contentType: rendition.contentType, data }
+      log.error('Stored rendition missing', { automationId, hash: rendition.hash })
+    }
+
+    const data = await getBlob(version)
+    if (!data) {
+      log.error('Stored image missing', { automationId, hash: version })
+      return null
+    }
+    return { version, hash: version, contentType: source.dmImage.contentType, data }
+  }
+
+  // Not moved to the blob store yet - decode it from the commentReply JSON
+  if (!source.commentReply) return null
+  try {
+    const image = decodeImageDataUrl(JSON.parse(source.commentReply).dmImage || '')
+    if (!image) return null
+    const hash = hashBlob(image.data)
+    return { version: hash, hash, ...image }
+  } catch {
+    return null
+  }
+}
+
+// The image an automation sends in its DM. `hash` is the ?v= the URL was built
+// with; when the image it names is cached no database or store read happens.
+// A ?v= that isn't cached is checked against the database, never against this
+// instance's pointer (the listener may have changed on another instance), and
+// gets null unless the automation shows that image now - so a URL naming one
+// image is never answered with another.
+export const loadDmImage = async (automationId: string, hash?: string | null) => {
+  const requested = hash && isBlobHash(hash) ? hash : null
+  if (requested) {
+    const cached = images.get(`${automationId}:${requested}`)
+    if (cached) return cached
+  } else {
+    // No ?v= - whatever the automation shows now, as far as this instance knows
+    const current = pointers.get(automationId)
+    if (current === null) return null
+    if (current) {
+      const cached = images.get(`${automationId}:${current}`)
+      if (cached) return cached
+    }
+  }
+
+  const image = await readDmImage(automationId)
+  pointers.set(automationId, image?.version ?? null)
+  if (image) images.set(`${automationId}:${image.version}`, image)
+  log.debug('Loaded image', () => ({ automationId, found: !!image, bytes: image?.data.length }))
+
+  if (requested && image?.version !== requested) {
+    log.warn('Requested image is not the current one', { automationId, requested, current: image?.version })
+    return null
+  }
+  return image
+}
+
+// The automation's image changed (its old cache entry simply ages out)
+export const invalidateDmImage = (automationId: string) => {
+  pointers.delete(automationId)
+}
+
+// -----------------------------
+// Cleanup
+// -----------------------------
+
+const deleteImageBytes = async (hashes: string[]) => {
+  for (const hash of hashes) {
+    await deleteBlob(hash).catch((error) =>
+      log.warn('Could not delete image bytes', { hash, error: error?.message })
+    )
+  }
+}
+
+// Images a listener save detached (replaced or removed): drop the ones nothing
+// else uses, with their renditions
+export const collectUnusedDmImages = async (hashes: string[]) => {
+  const deleted = await deleteUnusedImageBlobs({ hashes })
+  await deleteImageBytes(deleted)
+  if (deleted.length) log.info('Deleted unused images', { count: deleted.length })
+  return deleted.length
+}
+
+// Every unused image past the grace period: uploads that were never saved,
+// and images of deleted automations
+export const sweepUnusedDmImages = async () => {
+  const deleted = await deleteUnusedImageBlobs({
+    createdBefore: new Date(Date.now() - UNUSED_IMAGE_GRACE_MS),
+  })
+  await deleteImageBytes(deleted)
+  log.info('Swept unused images', { count: deleted.length })
+  return deleted.length
+}
+
+// -----------------------------
+// Backfill
+// -----------------------------
+
+// Listeners saved before the blob store kept the image as base64 inside the
+// commentReply JSON. Move each one into the store and drop it from the JSON.
+export const migrateInlineDmImages = async () => {
+  let cursor: string | null = null
+  let moved = 0
+  let failed = 0
+
+  while (true) {
+    const listeners = await getInlineDmImageListeners(cursor, MIGRATION_BATCH)
+    for (const listener of listeners) {
+      try {
+        const parsed = JSON.parse(listener.commentReply!)
+        const image = await storeDmImage(parsed.dmImage)
+        if (!image) throw new Error('Invalid image data URL')
+        const { dmImage, ...rest } = parsed
+        await moveListenerDmImage(listener.id, image, JSON.stringify(rest))
+        moved++
+      } catch (error: any) {
+        failed++
+        log.warn('Could not move DM image', { listenerId: listener.id, error: error?.message })
+      }
+    }
+    if (listeners.length < MIGRATION_BATCH) break
+    cursor = listeners[listeners.length - 1].id
+  }
+
+  log.info('Moved inline DM images', { moved, failed })
+  return { moved, failed }
+}
@@ -0,0 +1,516 @@
+import { getPageToken } from '@/lib/page-token'
+import { matchKeyword, getChatHistory } from '@/actions/webhook/queries'
+import { getAutomationsForMedia } from './media-index'
+import { sendOrQueue } from '@/actions/outbound/send'
+import { trackResponses } from './counter-buffer'
+import { getOrCreateReply } from './reply-cache'
+import { CHAT_HISTORY_WINDOW, refreshConversationSummary } from './chat-summary'
+import { getActiveConversation, recordChatTurn } from './conversations'
+import { resolveWebhookAutomation } from './automation-resolver'
+import { createChatReply } from '@/lib/openai'
+import { BatchItemResult, dispatchWebhookBatch } from './dispatcher'
+import { createLogger } from '@/lib/logger'
+
+const FACEBOOK_PAGE_ID = "899407896585353"
+const AI_MODEL = 'gpt-4o'
+// Matches the "under 2 sentences" instruction; the stream is cut once it's met
+const MAX_REPLY_SENTENCES = 2
+
+const webhookLog = createLogger('Webhook')
+
+export type WebhookResult = {
+  message: string
+  error?: any
+  results?: BatchItemResult[]
+}
+
+// Route a raw webhook delivery to the comment / DM handlers.
+// Called by the webhook worker once the job has been claimed from the queue.
+// Every entry / change / messaging item in the batch is dispatched, not just the first.
+export const handleWebhookPayload = async (
+  webhook_payload: any,
+  jobId: string | null = null
+): Promise<WebhookResult> => {
+  webhookLog.debug('Full payload', () => ({ payload: webhook_payload }))
+
+  // Check if it's an Instagram webhook
+  if (webhook_payload?.object !== 'instagram') {
+    return { message: 'Not Instagram webhook' }
+  }
+
+  if (!Array.isArray(webhook_payload.entry) || webhook_payload.entry.length === 0) {
+    return { message: 'No entry data' }
+  }
+
+  const batch = await dispatchWebhookBatch(
+    webhook_payload.entry,
+    {
+      comment: handleCommentEvent,
+      messaging: handleMessagingEvent,
+    },
+    jobId
+  )
+
+  webhookLog.info('Batch result', {
+    total: batch.total,
+    succeeded: batch.succeeded,
+    failed: batch.failed,
+  })
+
+  // Let the worker retry the delivery if any item threw
+  if (batch.failed > 0) {
+    const firstError = batch.results.find((r) => r.error)?.error
+    throw new Error(`${batch.failed}/${batch.total} webhook events failed: ${firstError}`)
+  }
+
+  return {
+    message: batch.total === 0 ? 'Event processed' : `Processed ${batch.total} event(s)`,
+    results: batch.results,
+  }
+}
+
+// Handle comment events
+export const handleCommentEvent = async (change: any): Promise<WebhookResult> => {
+  if (!change || change.field !== 'comments') {
+    return { message: 'Not a comment event' }
+  }
+
+  const value = change.value
+  // Debug/info lines are sampled per comment (LOG_SAMPLE_RATE); warnings and errors always log
+  const log = webhookLog.forEvent(value?.id ? `comment:${value.id}` : null)
+  log.debug('Processing comment event', () => ({ value }))
+
+  // Extract comment data
+  const commentText = value.text || ''
+  const commentId = value.id
+  const mediaId = value.media?.id
+  const fromUserId = value.from?.id
+  const instagramScopedId = value.from?.self_ig_scoped_id // ✅ Instagram scoped ID for direct DM
+  const pageId = FACEBOOK_PAGE_ID
+
+
+  if (!commentText || !commentId) {
+    log.warn('Missing comment text or ID')
+    return { message: 'Invalid comment data' }
+  }
+
+  log.debug('Comment details', () => ({
+    commentText,
+    commentId,
+    mediaId,
+    fromUserId,
+    instagramScopedId: instagramScopedId || 'NOT PROVIDED',
+    from: value.from,
+  }))
+
+  // ✅ CRITICAL: Check if comment matches keyword from ACTIVE automation on THIS SPECIFIC POST
+  if (!mediaId) {
+    log.warn('No media ID provided, cannot verify post')
+    return { message: 'No media ID' }
+  }
+
+  // ✅ Drop comments on posts no active automation watches before any keyword work
+  const watching = await getAutomationsForMedia(mediaId)
+  if (watching.size === 0) {
+    log.debug('Post is not monitored by any active automation', { mediaId })
+    return { message: 'Post not monitored' }
+  }
+
+  const matcher = await matchKeyword(commentText, mediaId)
+  log.debug('Keyword match', { matcher })
+
+  if (!matcher || !matcher.automationId) {
+    log.debug('No keyword match found for active automation on this post')
+    return { message: 'No keyword match' }
+  }
+
+  // ✅ One cached lookup for everything the reply needs (listener, parsed reply, plan, token, triggers, posts)
+  const automation = await resolveWebhookAutomation(matcher.automationId)
+  
+  if (!automation || !automation.active) {
+    log.info('Automation not found or not active', { automationId: matcher.automationId })
+    return { message: 'No active automation' }
+  }
+
+  if (!automation.triggers.includes('COMMENT')) {
+    log.info('No trigger configured for automation', { automationId: automation.id })
+    return { message: 'No trigger' }
+  }
+
+  // ✅ Double-check: Verify this post is in the automation's post list
+  if (!automation.postIds.includes(mediaId)) {
+    log.info('Post not in automation', { mediaId, automationId: automation.id })
+    return { message: 'Post not in automation' }
+  }
+
+  log.info('Keyword matched on monitored post', { automationId: automation.id, mediaId, keyword: matcher.word })
+
+  // ✅ PAGE ACCESS TOKEN comes from the token manager (env token, or one refreshed
+  // from the user integration). No preflight Graph call - an expired token (190/463)
+  // is detected on the real sends below, refreshed once and the send retried.
+  const userToken = automation.token
+  const token = getPageToken()
+  if (!token) {
+    log.error('CRITICAL: No page access token found in env (META_PAGE_ACCESS_TOKEN)', {
+      action: 'Add META_PAGE_ACCESS_TOKEN to your .env file (https://developers.facebook.com/tools/explorer/) and restart the server',
+    })
+    return { message: 'No page access token configured' }
+  }
+  
+  // ✅ Validate token format (should start with EAA for page tokens)
+  if (!token.startsWith('EAA')) {
+    log.warn('Token does not start with "EAA" - might not be a valid Page Access Token', {
+      hint: 'Make sure you selected "Page" (not "User") in Graph API Explorer',
+    })
+  }
+
+  // Handle MESSAGE listener - Send private reply to comment
+  if (automation.listener?.listener === 'MESSAGE' && automation.replyPlan) {
+    // ✅ DM message, image URL, rendered links and public reply, compiled once per listener version
+    const { dmMessage, imageUrl: dmImage, links: dmLinks, publicReply } = automation.replyPlan
+
+    log.debug('Extracted DM data', () => ({
+      message: dmMessage.substring(0, 50),
+      hasImage: !!dmImage,
+      imageUrl: dmImage ? dmImage.substring(0, 80) : 'none',
+      linksCount: dmLinks.length,
+      links: dmLinks.map(l => l.title),
+    }))
+
+    try {
+      // ✅ PUBLIC COMMENT REPLY (under the post) and PRIVATE DM (image + text + links)
+      // are independent Graph calls, so they're sent concurrently and joined here.
+      log.debug('Sending public reply + private DM concurrently', () => ({
+        commentId,
+        fromUserId,
+        hasImage: !!dmImage,
+        imageUrl: dmImage ? dmImage.substring(0, 80) : 'none',
+        linksCount: dmLinks.length,
+        links: dmLinks.map(l => l.title),
+        messageLength: dmMessage.length,
+        instagramScopedId: instagramScopedId || 'NOT PROVIDED (will use comment_id fallback)',
+      }))
+
+      // sendOrQueue never throws on a failed send: transient failures (timeouts,
+      // 5xx, throttling) go to the outbound retry queue, which bumps the counter
+      // once the retry is delivered.
+      const [publicOutcome, privateOutcome] = await Promise.all([
+        sendOrQueue(
+          {
+            kind: 'PUBLIC_REPLY',
+            pageId,
+            automationId: automation.id,
+            track: 'COMMENT',
+            commentId,
+            message: publicReply,
+          },
+          userToken
+        ),
+        // ✅ Pass Instagram scoped ID for the direct DM after the image is sent as comment reply
+        sendOrQueue(
+          {
+            kind: 'PRIVATE_REPLY',
+            pageId,
+            automationId: automation.id,
+            track: 'DM',
+            commentId,
+            message: dmMessage,
+            imageUrl: dmImage,
+            links: dmLinks,
+            recipientId: instagramScopedId,
+          },
+          userToken
+        ),
+      ])
+
+      const publicSent = publicOutcome.sent
+      if (publicOutcome.sent) {
+        log.info('Public reply sent', { commentId })
+      } else {
+        const publicError: any = publicOutcome.error
+        log.error('Failed to send public reply', {
+          queued: publicOutcome.queued,
+          error: publicError?.response?.data || publicError?.message,
+        })
+      }
+
+      const privateSent = privateOutcome.sent
+      if (privateOutcome.sent) {
+        const result = privateOutcome.result
+        log.info('Private DM sent', {
+          success: result?.success,
+          status: result?.status,
+          summary: result?.summary,
+        })
+      } else {
+        const privateReplyError: any = privateOutcome.error
+        const errorDetails = privateReplyError?.response?.data || privateReplyError?.error || privateReplyError?.message
+        log.error('Private DM not delivered', {
+          queued: privateOutcome.queued,
+          error: errorDetails,
+          status: privateReplyError?.response?.status,
+          errorCode: errorDetails?.error?.code,
+          errorMessage: errorDetails?.error?.message,
+        })
+      }
+
+      // ✅ Track responses once, after both sends have settled
+      await Promise.all([
+        publicSent && trackResponses(automation.id, 'COMMENT'),
+        privateSent && trackResponses(automation.id, 'DM'),
+      ])
+      log.debug('Counts updated', { comment: publicSent, dm: privateSent })
+
+      return { message: 'Public + Private replies sent successfully' }
+
+    } catch (error: any) {
+      log.error('Failed to send replies', { error })
+      return { message: 'Error sending replies', error: error.response?.data || error.message }
+    }
+  }
+
+
+  // Handle SMARTAI listener
+  if (
+    automation.listener?.listener === 'SMARTAI' &&
+    automation.plan === 'PRO'
+  ) {
+    log.debug('Using Smart AI for response')
+    
+    try {
+      const systemPrompt = `${automation.listener.prompt}. Keep responses under 2 sentences.`
+      // First turn, no history: identical comments reuse a cached reply
+      const aiResponse = await getOrCreateReply(
+        { automationId: automation.id, model: AI_MODEL, systemPrompt, text: commentText },
+        () =>
+          createChatReply({
+            model: AI_MODEL,
+            userId: automation.userId,
+            maxSentences: MAX_REPLY_SENTENCES,
+            messages: [
+              { role: 'system', content: systemPrompt },
+              { role: 'user', content: commentText },
+            ],
+          })
+      )
+      
+      if (aiResponse) {
+        // Save chat history (user message + AI reply) and the conversation row
+        await recordChatTurn(automation.id, pageId, fromUserId, commentText, aiResponse)
+
+        // Send private reply
+        const privateReply = await sendOrQueue(
+          {
+            kind: 'PRIVATE_REPLY',
+            pageId,
+            automationId: automation.id,
+            track: 'COMMENT',
+            commentId,
+            message: aiResponse,
+          },
+          userToken
+        )
+
+        if (privateReply.sent) {
+          await trackResponses(automation.id, 'COMMENT')
+          log.info('AI private reply sent', { automationId: automation.id })
+          
+          return { message: 'AI reply sent' }
+        }
+        if (privateReply.queued) {
+          return { message: 'AI reply queued for retry' }
+        }
+      }
+    } catch (error) {
+      log.error('Smart AI error', { error })
+    }
+  }
+
+  return { message: 'Comment processed' }
+}
+
+// Handle direct message events
+export const handleMessagingEvent = async (messaging: any): Promise<WebhookResult> => {
+  if (!messaging) {
+    return { message: 'No messaging data' }
+  }
+
+  // Debug/info lines are sampled per message (LOG_SAMPLE_RATE); warnings and errors always log
+  const log = webhookLog.forEvent(messaging.message?.mid ? `message:${messaging.message.mid}` : null)
+
+  if (messaging?.message?.is_echo === true) {
+    log.debug('Ignoring echo message')
+    return { message: "Echo ignored" }
+  }
+
+  const messageText = messaging.message?.text || ''
+  const senderId = messaging.sender?.id
+  const recipientId = messaging.recipient?.id
+  const pageId = FACEBOOK_PAGE_ID
+
+
+  log.debug('Processing messaging event', () => ({ messageText, senderId }))
+
+  // ✅ Check for keyword match from ACTIVE automation (no postId for DMs)
+  const matcher = await matchKeyword(messageText)
+
+  if (matcher && matcher.automationId) {
+    // ✅ Same cached resolver as comments - no chat logs or counters loaded
+    const automation = await resolveWebhookAutomation(matcher.automationId)
+    
+    if (!automation || !automation.active) {
+      log.info('Automation not found or not active', { automationId: matcher.automationId })
+      return { message: 'No active automation' }
+    }
+
+    if (!automation.triggers.includes('DM')) {
+      log.info('No trigger configured', { automationId: automation.id })
+      return { message: 'No trigger' }
+    }
+
+    log.info('Keyword matched in DM', { automationId: automation.id, keyword: matcher.word })
+
+    // ✅ Use PAGE ACCESS TOKEN from the token manager for sending DMs
+    if (!getPageToken()) {
+      log.error('No page access token found in env for DM')
+      return { message: 'No page access token configured' }
+    }
+    const userToken = automation.token
+
+    // Handle MESSAGE listener
+    if (automation.listener?.listener === 'MESSAGE') {
+      const dm = await sendOrQueue(
+        {
+          kind: 'DM',
+          pageId,
+          automationId: automation.id,
+          track: 'DM',
+          recipientId: senderId,
+          message: automation.listener.prompt || 'Thank you for your message!',
+        },
+        userToken
+      )
+
+      if (dm.sent) {
+        await trackResponses(automation.id, 'DM')
+        return { message: 'DM sent' }
+      }
+      if (dm.queued) {
+        return { message: 'DM queued for retry' }
+      }
+    }
+
+    // Handle SMARTAI listener
+    if (
+      automation.listener?.listener === 'SMARTAI' &&
+      automation.plan === 'PRO'
+    ) {
+      const systemPrompt = `${automation.listener.prompt}. Keep responses under 2 sentences.`
+      // First turn, no history: identical keyword DMs reuse a cached reply
+      const aiResponse = await getOrCreateReply(
+        { automationId: automation.id, model: AI_MODEL, systemPrompt, text: messageText },
+        () =>
+          createChatReply({
+            model: AI_MODEL,
+            userId: automation.userId,
+            maxSentences: MAX_REPLY_SENTENCES,
+            messages: [
+              { role: 'system', content: systemPrompt },
+              { role: 'user', content: messageText },
+            ],
+          })
+      )
+      
+      if (aiResponse) {
+        // Save chat history (user message + AI reply) and the conversation row
+        await recordChatTurn(automation.id, pageId, senderId, messageText, aiResponse)
+
+        const dm = await sendOrQueue(
+          {
+            kind: 'DM',
+            pageId,
+            automationId: automation.id,
+            track: 'DM',
+            recipientId: senderId,
+            message: aiResponse,
+          },
+          userToken
+        )
+
+        if (dm.sent) {
+          await trackResponses(automation.id, 'DM')
+          return { message: 'AI DM sent' }
+        }
+        if (dm.queued) {
+          return { message: 'AI DM queued for retry' }
+        }
+      }
+    }
+  }
+
+  // Handle conversation continuation
+  // Note: recipientId is the page, senderId is the user
+  // ✅ One cached primary-key lookup decides whether a SMARTAI conversation is running
+  const conversation = await getActiveConversation(recipientId, senderId)
+  const automation = conversation && (await resolveWebhookAutomation(conversation.automationId))
+
+  if (
+    automation?.plan === 'PRO' &&
+    automation.listener?.listener === 'SMARTAI'
+  ) {
+    // Only the last CHAT_HISTORY_WINDOW messages are sent; older ones come in as a summary
+    const customerHistory = await getChatHistory(recipientId, senderId, CHAT_HISTORY_WINDOW)
+
+    const aiResponse = await createChatReply({
+      model: AI_MODEL,
+      userId: automation.userId,
+      maxSentences: MAX_REPLY_SENTENCES,
+      messages: [
+        {
+          role: 'system',
+          content: `${automation.listener.prompt}. Keep responses under 2 sentences.`,
+        },
+        ...(customerHistory.summary
+          ? [{ role: 'system' as const, content: `Earlier in this conversation: ${customerHistory.summary}` }]
+          : []),
+        ...customerHistory.history,
+        {
+          role: 'user',
+          content: messageText,
+        },
+      ],
+    })
+    
+    if (aiResponse) {
+      // Save chat history (user message + AI reply) and the conversation row
+      await recordChatTurn(automation.id, pageId, senderId, messageText, aiResponse)
+      // Off the reply path: fold messages that left the window into the summary
+      void refreshConversationSummary(recipientId, senderId, customerHistory.windowStart)
+
+      // ✅ Use PAGE ACCESS TOKEN from the token manager
+      if (!getPageToken()) {
+        log.error('No page access token found in env')
+        return { message: 'No page access token configured' }
+      }
+      const dm = await sendOrQueue(
+        {
+          kind: 'DM',
+          pageId,
+          automationId: automation.id,
+          recipientId: senderId,
+          message: aiResponse,
+        },
+        automation.token
+      )
+
+      if (dm.sent) {
+        return { message: 'Conversation continued' }
+      }
+      if (dm.queued) {
+        return { message: 'Conversation reply queued for retry' }
+      }
+    }
+  }
+
+  return { message: 'Message processed' }
+}
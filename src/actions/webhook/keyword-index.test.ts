@@ -0,0 +1,43 @@
+import { describe, expect, it, vi } from 'vitest'
+
+vi.mock('@/lib/prisma', () => ({ client: { keyword: { findMany: vi.fn() } } }))
+
+// Fresh, never-loaded index per test, plus the (re-created) mocked query
+const loadKeywordIndex = async () => {
+  vi.resetModules()
+  globalThis.keywordIndex = undefined
+  const { client } = await import('@/lib/prisma')
+  return { ...(await import('./keyword-index')), findMany: vi.mocked(client.keyword.findMany) }
+}
+
+const automationIds = (hits: { automationId: string }[]) => hits.map((hit) => hit.automationId)
+
+describe('keyword index reload', () => {
+  it('keeps changes made while a reload is reading the table', async () => {
+    const { findMany, ...keywords } = await loadKeywordIndex()
+    let resolve!: (rows: { word: string; automationId: string }[]) => void
+    findMany.mockReturnValueOnce(new Promise((r) => (resolve = r)) as any)
+
+    const first = keywords.findKeywordCandidates('promo')
+    // The reload is in flight with rows read before these edits were committed
+    keywords.setAutomationKeywords('automation-2', ['promo'])
+    keywords.removeAutomationKeywords('automation-1')
+    resolve([
+      { word: 'promo', automationId: 'automation-1' },
+      { word: 'hello', automationId: 'automation-3' },
+    ])
+
+    expect(automationIds(await first)).toEqual(['automation-2'])
+    expect(automationIds(await keywords.findKeywordCandidates('hello'))).toEqual(['automation-3'])
+    expect(findMany).toHaveBeenCalledTimes(1)
+  })
+
+  it('applies changes directly once no reload is running', async () => {
+    const { findMany, ...keywords } = await loadKeywordIndex()
+    findMany.mockResolvedValueOnce([{ word: 'promo', automationId: 'automation-1' }] as any)
+
+    expect(automationIds(await keywords.findKeywordCandidates('promo'))).toEqual(['automation-1'])
+    keywords.removeAutomationKeyword('automation-1', 'promo')
+    expect(await keywords.findKeywordCandidates('promo')).toEqual([])
+  })
+})
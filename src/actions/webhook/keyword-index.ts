@@ -0,0 +1,123 @@
+import { client } from '@/lib/prisma'
+import {
+  KeywordHit,
+  KeywordMatcher,
+  KeywordMatchMode,
+} from '@/lib/keyword-matcher'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('keyword-index')
+
+// exact = whole comment equals the keyword (original behaviour), token, or substring
+const MATCH_MODE = (process.env.KEYWORD_MATCH_MODE as KeywordMatchMode) || 'exact'
+// Full reload interval, so keyword changes made on other instances are picked up
+const RELOAD_INTERVAL_MS = Number(process.env.KEYWORD_INDEX_RELOAD_MS) || 60_000
+
+type KeywordIndex = {
+  // Active automation id -> its keywords
+  byAutomation: Map<string, string[]>
+  matcher: KeywordMatcher | null
+  loadedAt: number
+  loading: Promise<void> | null
+  // Automations changed while a reload is reading the table (empty = removed).
+  // Re-applied over the reloaded rows, which may predate the change.
+  pending: Map<string, string[]> | null
+}
+
+declare global {
+  var keywordIndex: KeywordIndex | undefined
+}
+
+// Shared via globalThis so server actions and the webhook route see the same index
+const index: KeywordIndex = globalThis.keywordIndex || {
+  byAutomation: new Map(),
+  matcher: null,
+  loadedAt: 0,
+  loading: null,
+  pending: null,
+}
+globalThis.keywordIndex = index
+
+const reload = async () => {
+  const pending = new Map<string, string[]>()
+  index.pending = pending
+  const keywords = await client.keyword
+    .findMany({
+      where: { Automation: { active: true } },
+      select: { word: true, automationId: true },
+    })
+    .finally(() => {
+      index.pending = null
+    })
+
+  const byAutomation = new Map<string, string[]>()
+  for (const keyword of keywords) {
+    if (!keyword.automationId) continue
+    const words = byAutomation.get(keyword.automationId)
+    if (words) words.push(keyword.word)
+    else byAutomation.set(keyword.automationId, [keyword.word])
+  }
+  pending.forEach((words, automationId) => {
+    if (words.length === 0) byAutomation.delete(automationId)
+    else byAutomation.set(automationId, words)
+  })
+
+  index.byAutomation = byAutomation
+  index.matcher = null
+  index.loadedAt = Date.now()
+  log.info('Loaded keywords', { keywords: keywords.length, automations: byAutomation.size })
+}
+
+const ensureLoaded = async () => {
+  if (Date.now() - index.loadedAt < RELOAD_INTERVAL_MS) return
+
+  if (!index.loading) {
+    index.loading = reload().finally(() => {
+      index.loading = null
+    })
+  }
+  await index.loading
+}
+
+// The automaton is compiled lazily after any change to the keyword table
+const getMatcher = () => {
+  if (!index.matcher) {
+    const hits: KeywordHit[] = []
+    index.byAutomation.forEach((words, automationId) => {
+      for (const word of words) hits.push({ automationId, word })
+    })
+    index.matcher = new KeywordMatcher(hits)
+  }
+  return index.matcher
+}
+
+// Every active automation whose keyword matches the text. No DB query unless
+// the index is due for its periodic reload.
+export const findKeywordCandidates = async (text: string) => {
+  await ensureLoaded()
+  return getMatcher().match(text, MATCH_MODE)
+}
+
+// -----------------------------
+// INCREMENTAL UPDATES (called from automation mutations)
+// -----------------------------
+export const setAutomationKeywords = (automationId: string, words: string[]) => {
+  index.pending?.set(automationId, words)
+  if (words.length === 0) index.byAutomation.delete(automationId)
+  else index.byAutomation.set(automationId, words)
+  index.matcher = null
+}
+
+export const removeAutomationKeywords = (automationId: string) => {
+  index.pending?.set(automationId, [])
+  if (index.byAutomation.delete(automationId)) index.matcher = null
+}
+
+export const removeAutomationKeyword = (automationId: string, word: string) => {
+  const words = index.byAutomation.get(automationId)
+  if (!words) return
+  setAutomationKeywords(
+    automationId,
+    words.filter((w) => w !== word)
+  )
+}
@@ -0,0 +1,42 @@
+import { describe, expect, it, vi } from 'vitest'
+
+vi.mock('@/lib/prisma', () => ({ client: { post: { findMany: vi.fn() } } }))
+
+// Fresh, never-loaded index per test, plus the (re-created) mocked query
+const loadMediaIndex = async () => {
+  vi.resetModules()
+  globalThis.mediaIndex = undefined
+  const { client } = await import('@/lib/prisma')
+  return { ...(await import('./media-index')), findMany: vi.mocked(client.post.findMany) }
+}
+
+describe('media index reload', () => {
+  it('keeps changes made while a reload is reading the table', async () => {
+    const { findMany, ...media } = await loadMediaIndex()
+    let resolve!: (rows: { postid: string; automationId: string }[]) => void
+    findMany.mockReturnValueOnce(new Promise((r) => (resolve = r)) as any)
+
+    const first = media.getAutomationsForMedia('media-1')
+    // The reload is in flight with rows read before these edits were committed
+    media.setAutomationMedia('automation-2', ['media-1'])
+    media.removeAutomationMedia('automation-1')
+    resolve([
+      { postid: 'media-1', automationId: 'automation-1' },
+      { postid: 'media-2', automationId: 'automation-3' },
+    ])
+
+    expect(Array.from(await first)).toEqual(['automation-2'])
+    expect(Array.from(await media.getAutomationsForMedia('media-2'))).toEqual(['automation-3'])
+    expect(findMany).toHaveBeenCalledTimes(1)
+  })
+
+  it('applies changes directly once no reload is running', async () => {
+    const { findMany, ...media } = await loadMediaIndex()
+    findMany.mockResolvedValueOnce([{ postid: 'media-1', automationId: 'automation-1' }] as any)
+
+    expect(Array.from(await media.getAutomationsForMedia('media-1'))).toEqual(['automation-1'])
+    media.setAutomationMedia('automation-1', ['media-2'])
+    expect(Array.from(await media.getAutomationsForMedia('media-1'))).toEqual([])
+    expect(Array.from(await media.getAutomationsForMedia('media-2'))).toEqual(['automation-1'])
+  })
+})
@@ -0,0 +1,117 @@
+import { client } from '@/lib/prisma'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('media-index')
+
+// Full reload interval, so post changes made on other instances are picked up
+const RELOAD_INTERVAL_MS = Number(process.env.MEDIA_INDEX_RELOAD_MS) || 60_000
+
+type MediaIndex = {
+  // Instagram media id -> active automation ids watching it
+  byMedia: Map<string, Set<string>>
+  // Active automation id -> media ids it watches (used to undo an automation's entries)
+  byAutomation: Map<string, string[]>
+  loadedAt: number
+  loading: Promise<void> | null
+  // Automations changed while a reload is reading the table (empty = removed).
+  // Re-applied over the reloaded rows, which may predate the change.
+  pending: Map<string, string[]> | null
+}
+
+declare global {
+  var mediaIndex: MediaIndex | undefined
+}
+
+// Shared via globalThis so server actions and the webhook route see the same index
+const index: MediaIndex = globalThis.mediaIndex || {
+  byMedia: new Map(),
+  byAutomation: new Map(),
+  loadedAt: 0,
+  loading: null,
+  pending: null,
+}
+globalThis.mediaIndex = index
+
+const link = (automationId: string, mediaIds: string[]) => {
+  index.byAutomation.set(automationId, mediaIds)
+  for (const mediaId of mediaIds) {
+    const automations = index.byMedia.get(mediaId)
+    if (automations) automations.add(automationId)
+    else index.byMedia.set(mediaId, new Set([automationId]))
+  }
+}
+
+const unlink = (automationId: string) => {
+  const mediaIds = index.byAutomation.get(automationId)
+  if (!mediaIds) return
+
+  for (const mediaId of mediaIds) {
+    const automations = index.byMedia.get(mediaId)
+    if (!automations) continue
+    automations.delete(automationId)
+    if (automations.size === 0) index.byMedia.delete(mediaId)
+  }
+  index.byAutomation.delete(automationId)
+}
+
+const reload = async () => {
+  const pending = new Map<string, string[]>()
+  index.pending = pending
+  const posts = await client.post
+    .findMany({
+      where: { Automation: { active: true } },
+      select: { postid: true, automationId: true },
+    })
+    .finally(() => {
+      index.pending = null
+    })
+
+  const grouped = new Map<string, string[]>()
+  for (const post of posts) {
+    if (!post.automationId) continue
+    const mediaIds = grouped.get(post.automationId)
+    if (mediaIds) mediaIds.push(post.postid)
+    else grouped.set(post.automationId, [post.postid])
+  }
+  pending.forEach((mediaIds, automationId) => {
+    if (mediaIds.length === 0) grouped.delete(automationId)
+    else grouped.set(automationId, mediaIds)
+  })
+
+  index.byMedia = new Map()
+  index.byAutomation = new Map()
+  grouped.forEach((mediaIds, automationId) => link(automationId, mediaIds))
+  index.loadedAt = Date.now()
+  log.info('Loaded posts', { posts: posts.length, automations: grouped.size })
+}
+
+const ensureLoaded = async () => {
+  if (Date.now() - index.loadedAt < RELOAD_INTERVAL_MS) return
+
+  if (!index.loading) {
+    index.loading = reload().finally(() => {
+      index.loading = null
+    })
+  }
+  await index.loading
+}
+
+// Active automation ids watching this media id (empty when nobody monitors the post)
+export const getAutomationsForMedia = async (mediaId: string): Promise<Set<string>> => {
+  await ensureLoaded()
+  return index.byMedia.get(mediaId) || new Set()
+}
+
+// -----------------------------
+// INCREMENTAL UPDATES (called from automation mutations)
+// -----------------------------
+export const setAutomationMedia = (automationId: string, mediaIds: string[]) => {
+  index.pending?.set(automationId, mediaIds)
+  unlink(automationId)
+  if (mediaIds.length > 0) link(automationId, mediaIds)
+}
+
+export const removeAutomationMedia = (automationId: string) => {
+  index.pending?.set(automationId, [])
+  unlink(automationId)
+}
@@ -1,139 +1,261 @@
 import { client } from '@/lib/prisma'
+import { Prisma, WebhookJob } from '@prisma/client'
+import { findKeywordCandidates } from './keyword-index'
+import { getAutomationsForMedia } from './media-index'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('matchKeyword')
 
 // ✅ IMPROVED: Match keyword AND post together for ACTIVE automations
+// Keywords are matched against the in-memory automaton first, so the common case
+// (a comment that matches no keyword) resolves without touching the database.
 export const matchKeyword = async (keyword: string, postId?: string) => {
-  // If no postId, we can't verify - used for DMs
-  if (!postId) {
-  return await client.keyword.findFirst({
-      where: {
-        word: { equals: keyword, mode: 'insensitive' },
-        Automation: { active: true },
-      },
-      include: {
-        Automation: {
-          include: { posts: true, trigger: true, listener: true },
-        },
-      },
-    })
-  }
-
-  // ✅ For comments: Find ALL keywords matching this word from ACTIVE automations
-  const allMatches = await client.keyword.findMany({
-    where: {
-      word: { equals: keyword, mode: 'insensitive' },
-      Automation: { active: true },
-    },
-    include: {
-      Automation: {
-        include: { posts: true, trigger: true, listener: true },
-      },
-    },
-  })
+  const candidates = await findKeywordCandidates(keyword)
 
-  console.log(`🔍 Searching for keyword "${keyword}" on post ${postId}`)
-  console.log(`🔍 Found ${allMatches.length} active automation(s) with keyword "${keyword}"`)
-
-  if (allMatches.length === 0) {
-    console.log(`❌ No active automations with keyword "${keyword}" found in database`)
-    console.log(`   💡 TIP: Make sure automation is ACTIVATED and keyword is saved`)
+  if (candidates.length === 0) {
     return null
   }
 
-  // ✅ Filter to find which automation is monitoring THIS specific post
-  for (const match of allMatches) {
-    if (!match.Automation) {
-      console.log(`⚠️  Match found but Automation is null`)
-      continue
-    }
-
-    console.log(`   📋 Checking automation ${match.Automation.id}:`)
-    console.log(`      - Active: ${match.Automation.active}`)
-    console.log(`      - Posts count: ${match.Automation.posts.length}`)
-    console.log(`      - Trigger count: ${match.Automation.trigger?.length || 0}`)
-    console.log(`      - Listener: ${match.Automation.listener ? 'Yes' : 'No'}`)
+  // If no postId, we can't verify - used for DMs
+  if (!postId) {
+    return candidates[0]
+  }
 
-    if (match.Automation.posts.length > 0) {
-      console.log(`      - Post IDs: ${match.Automation.posts.map((p) => p.postid).join(', ')}`)
-    }
+  // ✅ Keep only the candidates monitoring THIS specific post (in-memory media index)
+  const watching = await getAutomationsForMedia(postId)
+  const match = candidates.find((c) => watching.has(c.automationId))
 
-    const hasPost = match.Automation.posts.some((post) => post.postid === postId)
-    
-    if (hasPost) {
-      console.log(`✅ MATCH! Automation ${match.Automation.id} monitors post ${postId}`)
-      return match
-    } else {
-      console.log(`   ⏭️  Automation ${match.Automation.id} uses keyword "${keyword}" but monitors different post(s)`)
-    }
+  if (!match) {
+    log.debug('No active automation found with this keyword for post', () => ({
+      keyword,
+      postId,
+      tip: 'Check that you selected the correct post when setting up automation',
+    }))
+    return null
   }
 
-  console.log(`❌ No active automation found with keyword "${keyword}" for post ${postId}`)
-  console.log(`   💡 TIP: Check that you selected the correct post when setting up automation`)
-  return null
+  log.debug('Automation monitors post', { automationId: match.automationId, postId })
+  return match
 }
 
-export const getKeywordAutomation = async (
-  automationId: string,
-  dm: boolean
-) => {
+// Everything the webhook handlers need about an automation, and nothing else
+// (no chat logs, no counters). Cached by resolveWebhookAutomation.
+export const getWebhookAutomation = async (automationId: string) => {
   return await client.automation.findUnique({
-    where: {
-      id: automationId,
-      active: true,  // ✅ ONLY get if automation is active
-    },
-
-    include: {
-      dms: dm,
-      posts: true,  // ✅ Include posts to verify
-      trigger: {
-        where: {
-          type: dm ? 'DM' : 'COMMENT',
+    where: { id: automationId },
+    select: {
+      id: true,
+      active: true,
+      userId: true,
+      listener: {
+        select: {
+          listener: true,
+          prompt: true,
+          commentReply: true,
+          dmImageHash: true,
+          updatedAt: true,
         },
       },
-      listener: true,
+      trigger: { select: { type: true } },
+      posts: { select: { postid: true } },
       User: {
         select: {
-          subscription: {
-            select: {
-              plan: true,
-            },
-          },
+          subscription: { select: { plan: true } },
           integrations: {
-            select: {
-              token: true,
-            },
+            select: { token: true },
+            take: 1,
           },
         },
       },
     },
   })
 }
-export const trackResponses = async (
-  automationId: string,
-  type: 'COMMENT' | 'DM'
-) => {
-  if (type === 'COMMENT') {
-    return await client.listener.update({
-      where: { automationId },
-      data: {
-        commentCount: {
-          increment: 1,
-        },
-      },
-    })
-  }
 
-  if (type === 'DM') {
-    return await client.listener.update({
-      where: { automationId },
-      data: {
-        dmCount: {
-          increment: 1,
+// Just what /api/dm-image needs: the stored image's hash and type, or the
+// commentReply JSON for listeners whose image hasn't been moved yet
+export const getDmImageSource = async (automationId: string) => {
+  return await client.listener.findUnique({
+    where: { automationId },
+    select: {
+      dmImageHash: true,
+      dmImage: {
+        select: {
+          contentType: true,
+          rendition: { select: { hash: true, contentType: true } },
         },
       },
-    })
+      commentReply: true,
+    },
+  })
+}
+
+export type StoredImage = {
+  hash: string
+  contentType: string
+  size: number
+  width?: number | null
+  height?: number | null
+}
+
+type StoredImageWithRendition = StoredImage & { rendition?: StoredImage | null }
+
+const connectRendition = (rendition: StoredImage) => ({
+  connectOrCreate: { where: { hash: rendition.hash }, create: rendition },
+})
+
+const imageBlobCreate = ({ rendition, ...image }: StoredImageWithRendition) => ({
+  ...image,
+  ...(rendition && { rendition: connectRendition(rendition) }),
+})
+
+// Nested write linking a listener to an image in the blob store (and its
+// optimized rendition), creating the ImageBlob rows the first time a hash is seen
+export const connectImageBlob = (image: StoredImageWithRendition) => ({
+  connectOrCreate: {
+    where: { hash: image.hash },
+    create: imageBlobCreate(image),
+  },
+})
+
+// Record an uploaded image ahead of the listener save that will point at it.
+// A rendition made now is attached to an existing row that has none.
+export const saveImageBlob = async (image: StoredImageWithRendition) => {
+  return await client.imageBlob.upsert({
+    where: { hash: image.hash },
+    create: imageBlobCreate(image),
+    update: image.rendition ? { rendition: connectRendition(image.rendition) } : {},
+    select: { hash: true },
+  })
+}
+
+// Delete ImageBlob rows no listener uses and that aren't another image's
+// rendition - among `hashes`, or every such row created before `createdBefore`.
+// Renditions left unused by the deleted rows go too. Returns the deleted hashes.
+export const deleteUnusedImageBlobs = async (
+  scope: { hashes: string[] } | { createdBefore: Date }
+) => {
+  if ('hashes' in scope && scope.hashes.length === 0) return []
+
+  const deleted: string[] = []
+  let filter =
+    'hashes' in scope
+      ? Prisma.sql`b."hash" IN (${Prisma.join(scope.hashes)})`
+      : Prisma.sql`b."createdAt" < ${scope.createdBefore}`
+
+  while (true) {
+    const rows = await client.$queryRaw<{ hash: string; renditionHash: string | null }[]>`
+      DELETE FROM "ImageBlob" b
+      WHERE ${filter}
+        AND NOT EXISTS (SELECT 1 FROM "Listener" l WHERE l."dmImageHash" = b."hash")
+        AND NOT EXISTS (SELECT 1 FROM "ImageBlob" o WHERE o."renditionHash" = b."hash")
+      RETURNING b."hash", b."renditionHash"
+    `
+    deleted.push(...rows.map((row) => row.hash))
+
+    const renditions = rows.map((row) => row.renditionHash).filter((hash): hash is string => !!hash)
+    if (renditions.length === 0) return deleted
+    filter = Prisma.sql`b."hash" IN (${Prisma.join(renditions)})`
   }
 }
 
+// Listeners that still carry a base64 DM image inside the commentReply JSON, by id
+export const getInlineDmImageListeners = async (cursor: string | null, take: number) => {
+  return await client.listener.findMany({
+    where: {
+      commentReply: { contains: '"dmImage":"data:image' },
+      ...(cursor && { id: { gt: cursor } }),
+    },
+    select: { id: true, commentReply: true },
+    orderBy: { id: 'asc' },
+    take,
+  })
+}
+
+// Point a listener at its DM image in the blob store and save the slimmed commentReply
+export const moveListenerDmImage = async (
+  listenerId: string,
+  image: StoredImageWithRendition,
+  commentReply: string
+) => {
+  return await client.listener.update({
+    where: { id: listenerId },
+    data: {
+      commentReply,
+      dmImage: connectImageBlob(image),
+    },
+    select: { automationId: true },
+  })
+}
+
+export type ResponseCountDelta = {
+  automationId: string
+  dm: number
+  comment: number
+}
+
+// Apply buffered dmCount / commentCount increments for many automations in a
+// single statement. Rows are sorted so concurrent flushes from several
+// instances lock Listener rows in the same order.
+export const applyResponseCounts = async (deltas: ResponseCountDelta[]) => {
+  if (deltas.length === 0) return 0
+
+  const rows = [...deltas]
+    .sort((a, b) => a.automationId.localeCompare(b.automationId))
+    .map((d) => Prisma.sql`(${d.automationId}::uuid, ${d.dm}::int, ${d.comment}::int)`)
+
+  return await client.$executeRaw`
+    UPDATE "Listener" AS l
+    SET "dmCount" = l."dmCount" + v."dm",
+        "commentCount" = l."commentCount" + v."comment"
+    FROM (VALUES ${Prisma.join(rows)}) AS v("automationId", "dm", "comment")
+    WHERE l."automationId" = v."automationId"
+  `
+}
+
+// Sharded variant: each automation's delta lands in one of `shards` slot rows
+// picked at random, so concurrent flushes for the same automation rarely touch
+// the same row.
+export const applyShardedResponseCounts = async (
+  deltas: ResponseCountDelta[],
+  shards: number
+) => {
+  if (deltas.length === 0) return 0
+
+  const rows = deltas
+    .map((d) => ({ ...d, slot: Math.floor(Math.random() * shards) }))
+    .sort((a, b) => a.automationId.localeCompare(b.automationId) || a.slot - b.slot)
+    .map((d) => Prisma.sql`(${d.automationId}::uuid, ${d.slot}::int, ${d.dm}::int, ${d.comment}::int)`)
+
+  return await client.$executeRaw`
+    INSERT INTO "ListenerCounterShard" ("automationId", "slot", "dmCount", "commentCount")
+    VALUES ${Prisma.join(rows)}
+    ON CONFLICT ("automationId", "slot") DO UPDATE
+      SET "dmCount" = "ListenerCounterShard"."dmCount" + EXCLUDED."dmCount",
+          "commentCount" = "ListenerCounterShard"."commentCount" + EXCLUDED."commentCount"
+  `
+}
+
+// Fold all counter shards back into Listener in one statement. Deleting the
+// shard rows and adding their sums happen atomically, so readers that add
+// Listener + shards never see a count twice or not at all.
+export const compactCounterShards = async () => {
+  return await client.$executeRaw`
+    WITH moved AS (
+      DELETE FROM "ListenerCounterShard"
+      RETURNING "automationId", "dmCount", "commentCount"
+    ), sums AS (
+      SELECT "automationId", SUM("dmCount")::int AS "dm", SUM("commentCount")::int AS "comment"
+      FROM moved
+      GROUP BY "automationId"
+    )
+    UPDATE "Listener" AS l
+    SET "dmCount" = l."dmCount" + sums."dm",
+        "commentCount" = l."commentCount" + sums."comment"
+    FROM sums
+    WHERE l."automationId" = sums."automationId"
+  `
+}
+
 export const createChatHistory = (
   automationId: string,
   sender: string,
@@ -156,6 +278,66 @@ export const createChatHistory = (
   })
 }
 
+// Point the (page, user) conversation at the automation that just replied and count the turn
+export const touchConversation = (pageId: string, userId: string, automationId: string) => {
+  return client.$executeRaw`
+    INSERT INTO "Conversation" ("pageId", "userId", "automationId", "lastActivityAt", "turns")
+    VALUES (${pageId}, ${userId}, ${automationId}::uuid, NOW(), 1)
+    ON CONFLICT ("pageId", "userId") DO UPDATE SET
+      "automationId" = EXCLUDED."automationId",
+      "lastActivityAt" = NOW(),
+      "turns" = "Conversation"."turns" + 1
+  `
+}
+
+// Store one exchange (the user's message and the AI reply) together with the conversation row
+export const saveChatTurn = (
+  automationId: string,
+  pageId: string,
+  userId: string,
+  userMessage: string,
+  aiMessage: string
+) => {
+  return client.$transaction([
+    createChatHistory(automationId, userId, pageId, userMessage),
+    createChatHistory(automationId, pageId, userId, aiMessage),
+    touchConversation(pageId, userId, automationId),
+  ])
+}
+
+// Primary-key lookup of the (page, user) conversation
+export const getConversation = async (pageId: string, userId: string) => {
+  return await client.conversation.findUnique({
+    where: { pageId_userId: { pageId, userId } },
+    select: {
+      automationId: true,
+      turns: true,
+      lastActivityAt: true,
+    },
+  })
+}
+
+// One page of (page, user) conversation keys, in primary-key order
+export const getConversationKeys = async (
+  cursor: { pageId: string; userId: string } | null,
+  take: number
+) => {
+  return await client.conversation.findMany({
+    select: { pageId: true, userId: true },
+    orderBy: [{ pageId: 'asc' }, { userId: 'asc' }],
+    take,
+    ...(cursor && { cursor: { pageId_userId: cursor }, skip: 1 }),
+  })
+}
+
+// Conversations with activity at or after `since` (created or continued on any instance)
+export const getConversationsActiveSince = async (since: Date) => {
+  return await client.conversation.findMany({
+    where: { lastActivityAt: { gte: since } },
+    select: { pageId: true, userId: true, lastActivityAt: true },
+  })
+}
+
 export const getKeywordPost = async (postId: string, automationId: string) => {
   return await client.post.findFirst({
     where: {
@@ -165,35 +347,71 @@ export const getKeywordPost = async (postId: string, automationId: string) => {
   })
 }
 
-export const getChatHistory = async (pageId: string, userId: string) => {
-  // Get ALL messages in the conversation (both directions)
-  const history = await client.dms.findMany({
-    where: {
-      OR: [
-        // Messages from user to page
-        { senderId: userId, reciever: pageId },
-        // Messages from page to user
-        { senderId: pageId, reciever: userId },
-      ],
-    },
-    orderBy: { createdAt: 'asc' },
-  })
-  
-  // ✅ CRITICAL FIX: Check if history exists before accessing
-  if (history.length === 0) {
+type ChatRow = {
+  senderId: string
+  message: string | null
+  automationId: string | null
+  createdAt: Date
+}
+
+// Messages of one page <-> user conversation, newest first. Each direction is
+// its own leg on the (senderId, reciever, createdAt) index, so the cost depends
+// on `limit`, not on how long the conversation is.
+const getConversationMessages = async (
+  pageId: string,
+  userId: string,
+  limit: number,
+  range: { after?: Date; before?: Date; order: 'ASC' | 'DESC' }
+) => {
+  const after = range.after ? Prisma.sql`AND "createdAt" > ${range.after}` : Prisma.empty
+  const before = range.before ? Prisma.sql`AND "createdAt" < ${range.before}` : Prisma.empty
+  const order = range.order === 'ASC' ? Prisma.sql`ASC` : Prisma.sql`DESC`
+  const leg = (sender: string, reciever: string) => Prisma.sql`
+    SELECT "senderId", "message", "automationId"::text AS "automationId", "createdAt"
+    FROM "Dms"
+    WHERE "senderId" = ${sender} AND "reciever" = ${reciever} ${after} ${before}
+    ORDER BY "createdAt" ${order}
+    LIMIT ${limit}::int
+  `
+
+  return await client.$queryRaw<ChatRow[]>`
+    SELECT * FROM (
+      (${leg(userId, pageId)})
+      UNION ALL
+      (${leg(pageId, userId)})
+    ) AS m
+    ORDER BY "createdAt" ${order}
+    LIMIT ${limit}::int
+  `
+}
+
+// The last `limit` messages of a conversation in OpenAI format, plus the rolling
+// summary of everything before them (see refreshConversationSummary).
+export const getChatHistory = async (pageId: string, userId: string, limit = 12) => {
+  const [recent, summary] = await Promise.all([
+    getConversationMessages(pageId, userId, limit, { order: 'DESC' }),
+    client.conversationSummary.findUnique({
+      where: { pageId_userId: { pageId, userId } },
+      select: { summary: true },
+    }),
+  ])
+
+  if (recent.length === 0) {
     return {
       history: [],
+      summary: null,
       automationId: null,
+      windowStart: null,
     }
   }
-  
+
   // Map chat history to OpenAI format
   // If senderId is the page, it's an assistant message
   // If senderId is the user, it's a user message
   const chatSession: {
     role: 'assistant' | 'user'
     content: string
-  }[] = history.map((chat) => {
+  }[] = recent.reverse().map((chat) => {
     const isAssistant = chat.senderId === pageId
     return {
       role: isAssistant ? 'assistant' : 'user',
@@ -203,6 +421,190 @@ export const getChatHistory = async (pageId: string, userId: string) => {
 
   return {
     history: chatSession,
-    automationId: history[history.length - 1].automationId,
+    summary: summary?.summary || null,
+    automationId: recent[recent.length - 1].automationId,
+    // Oldest message still in the window; anything before it belongs in the summary
+    windowStart: recent[0].createdAt,
   }
 }
+
+// Messages that have dropped out of the history window but aren't in the summary yet
+export const getUnsummarizedMessages = async (
+  pageId: string,
+  userId: string,
+  windowStart: Date,
+  limit: number
+) => {
+  const summary = await client.conversationSummary.findUnique({
+    where: { pageId_userId: { pageId, userId } },
+    select: { summary: true, summarizedUntil: true },
+  })
+  const messages = await getConversationMessages(pageId, userId, limit, {
+    after: summary?.summarizedUntil,
+    before: windowStart,
+    order: 'ASC',
+  })
+  return { summary: summary?.summary || null, messages }
+}
+
+export const saveConversationSummary = async (
+  pageId: string,
+  userId: string,
+  summary: string,
+  summarizedUntil: Date
+) => {
+  return await client.conversationSummary.upsert({
+    where: { pageId_userId: { pageId, userId } },
+    create: { pageId, userId, summary, summarizedUntil },
+    update: { summary, summarizedUntil },
+  })
+}
+
+// -----------------------------
+// WEBHOOK JOB QUEUE
+// -----------------------------
+export const enqueueWebhookJob = async (payload: any) => {
+  return await client.webhookJob.create({
+    data: { payload: payload as Prisma.InputJsonValue },
+    select: { id: true },
+  })
+}
+
+// Claim up to `limit` runnable jobs. A job is runnable when it is PENDING and due,
+// or when a previous worker's visibility timeout has lapsed while PROCESSING.
+// SKIP LOCKED lets concurrent workers (and instances) claim disjoint jobs.
+export const claimWebhookJobs = async (
+  limit: number,
+  visibilityTimeoutMs: number
+) => {
+  return await client.$queryRaw<WebhookJob[]>`
+    UPDATE "WebhookJob"
+    SET "status" = 'PROCESSING',
+        "attempts" = "attempts" + 1,
+        "lockedUntil" = NOW() + (${visibilityTimeoutMs}::int * INTERVAL '1 millisecond'),
+        "updatedAt" = NOW()
+    WHERE "id" IN (
+      SELECT "id" FROM "WebhookJob"
+      WHERE ("status" = 'PENDING' AND "runAt" <= NOW())
+         OR ("status" = 'PROCESSING' AND "lockedUntil" < NOW())
+      ORDER BY "runAt" ASC
+      LIMIT ${limit}::int
+      FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+  `
+}
+
+// A handled job has nothing left worth keeping (its events are recorded in
+// ProcessedEvent), so it's deleted rather than left behind with its payload
+export const completeWebhookJob = async (id: string) => {
+  return await client.webhookJob.deleteMany({
+    where: { id },
+  })
+}
+
+// Put a failed job back on the queue with exponential backoff, or move it to
+// the DEAD state once it has used up its attempts.
+export const failWebhookJob = async (job: WebhookJob, error: string) => {
+  const dead = job.attempts >= job.maxAttempts
+  const backoffMs = Math.min(1000 * 2 ** job.attempts, 5 * 60 * 1000)
+
+  return await client.webhookJob.update({
+    where: { id: job.id },
+    data: {
+      status: dead ? 'DEAD' : 'PENDING',
+      lockedUntil: null,
+      lastError: error.substring(0, 2000),
+      runAt: dead ? job.runAt : new Date(Date.now() + backoffMs),
+      updatedAt: new Date(),
+    },
+  })
+}
+
+// Drop DEAD jobs (kept for inspection) once they're older than the retention
+// window, and any DONE rows left by earlier versions
+export const purgeFinishedWebhookJobs = async (deadRetentionMs: number) => {
+  return await client.webhookJob.deleteMany({
+    where: {
+      OR: [
+        { status: 'DONE' },
+        { status: 'DEAD', updatedAt: { lt: new Date(Date.now() - deadRetentionMs) } },
+      ],
+    },
+  })
+}
+
+// -----------------------------
+// WEBHOOK EVENT DEDUP
+// -----------------------------
+// Returns true when this call recorded the key (first delivery, the previous
+// record has expired, or the same queue job recorded it and never finished it -
+// a job reclaimed after its worker died) and false when the event is taken.
+// Handled events have no jobId (see completeProcessedEvent), so they never match.
+export const recordProcessedEvent = async (key: string, ttlMs: number, jobId: string | null) => {
+  const rows = await client.$queryRaw<{ key: string }[]>`
+    INSERT INTO "ProcessedEvent" ("key", "expiresAt", "jobId")
+    VALUES (${key}, NOW() + (${ttlMs}::int * INTERVAL '1 millisecond'), ${jobId})
+    ON CONFLICT ("key") DO UPDATE
+      SET "expiresAt" = EXCLUDED."expiresAt", "createdAt" = NOW(), "jobId" = EXCLUDED."jobId"
+      WHERE "ProcessedEvent"."expiresAt" < NOW()
+         OR "ProcessedEvent"."jobId" = EXCLUDED."jobId"
+    RETURNING "key"
+  `
+  return rows.length > 0
+}
+
+// The event was handled: no retry of the job that claimed it may run it again
+export const completeProcessedEvent = async (key: string) => {
+  return await client.processedEvent.updateMany({
+    where: { key },
+    data: { jobId: null },
+  })
+}
+
+export const deleteProcessedEvent = async (key: string) => {
+  return await client.processedEvent.deleteMany({
+    where: { key },
+  })
+}
+
+export const purgeExpiredEvents = async () => {
+  return await client.processedEvent.deleteMany({
+    where: { expiresAt: { lt: new Date() } },
+  })
+}
+
+// Cached replies for a key, or null when there are none or they have expired
+export const getCachedReplies = async (key: string) => {
+  return await client.replyCache.findFirst({
+    where: { key, expiresAt: { gt: new Date() } },
+    select: { replies: true, expiresAt: true },
+  })
+}
+
+// Add a reply variant (up to `variety` per key). An expired row starts over
+// with a fresh TTL. Returns the stored variants.
+export const addCachedReply = async (key: string, reply: string, variety: number, ttlMs: number) => {
+  const rows = await client.$queryRaw<{ replies: string[]; expiresAt: Date }[]>`
+    INSERT INTO "ReplyCache" ("key", "replies", "expiresAt")
+    VALUES (${key}, ARRAY[${reply}], NOW() + (${ttlMs}::int * INTERVAL '1 millisecond'))
+    ON CONFLICT ("key") DO UPDATE SET
+      "replies" = CASE
+        WHEN "ReplyCache"."expiresAt" < NOW() THEN EXCLUDED."replies"
+        WHEN cardinality("ReplyCache"."replies") < ${variety}::int THEN "ReplyCache"."replies" || EXCLUDED."replies"
+        ELSE "ReplyCache"."replies"
+      END,
+      "expiresAt" = CASE
+        WHEN "ReplyCache"."expiresAt" < NOW() THEN EXCLUDED."expiresAt"
+        ELSE "ReplyCache"."expiresAt"
+      END
+    RETURNING "replies", "expiresAt"
+  `
+  return rows[0]
+}
+
+export const purgeExpiredReplies = async () => {
+  return await client.replyCache.deleteMany({
+    where: { expiresAt: { lt: new Date() } },
+  })
+}
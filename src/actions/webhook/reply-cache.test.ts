@@ -0,0 +1,53 @@
+import { beforeEach, describe, expect, it, vi } from 'vitest'
+
+vi.mock('./queries', () => ({
+  addCachedReply: vi.fn(),
+  getCachedReplies: vi.fn(),
+  purgeExpiredReplies: vi.fn(async () => ({ count: 0 })),
+}))
+
+// Fresh module state (LRU and in-flight map) per test, on the memory store
+const loadReplyCache = async () => {
+  vi.resetModules()
+  globalThis.replyCache = undefined
+  globalThis.replyCacheInflight = undefined
+  return import('./reply-cache')
+}
+
+const input = {
+  automationId: 'automation-1',
+  model: 'gpt-4o',
+  systemPrompt: 'Be nice',
+  text: 'Giveaway!!',
+}
+
+describe('getOrCreateReply', () => {
+  beforeEach(() => {
+    vi.clearAllMocks()
+  })
+
+  it('makes one completion for a burst of identical first messages', async () => {
+    const { getOrCreateReply } = await loadReplyCache()
+    let resolve!: (reply: string) => void
+    const generate = vi.fn(() => new Promise<string>((r) => (resolve = r)))
+
+    const burst = Array.from({ length: 5 }, () => getOrCreateReply(input, generate))
+    // Let every caller get past its cache lookup before the completion returns
+    await new Promise((r) => setTimeout(r, 0))
+    resolve('Check your DMs!')
+
+    expect(await Promise.all(burst)).toEqual(Array(5).fill('Check your DMs!'))
+    expect(generate).toHaveBeenCalledTimes(1)
+  })
+
+  it('serves later identical messages from the cache', async () => {
+    const { getOrCreateReply } = await loadReplyCache()
+    const generate = vi.fn(async () => 'Check your DMs!')
+
+    await getOrCreateReply(input, generate)
+    const reply = await getOrCreateReply({ ...input, text: '  giveaway ' }, generate)
+
+    expect(reply).toBe('Check your DMs!')
+    expect(generate).toHaveBeenCalledTimes(1)
+  })
+})
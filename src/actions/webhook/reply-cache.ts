@@ -0,0 +1,131 @@
+import { createHash } from 'crypto'
+import { LRUCache } from '@/lib/lru'
+import { addCachedReply, getCachedReplies, purgeExpiredReplies } from './queries'
+import { createLogger } from '@/lib/logger'
+
+// How long a generated reply is reused for the same prompt + message
+const REPLY_CACHE_TTL_MS = Number(process.env.REPLY_CACHE_TTL_MS) || 6 * 60 * 60 * 1000
+const REPLY_CACHE_SIZE = Number(process.env.REPLY_CACHE_SIZE) || 1_000
+// Distinct replies kept per key. Above 1, the first N identical messages each get
+// a fresh completion and later ones are answered with a random pick among them.
+const REPLY_CACHE_VARIETY = Math.max(1, Number(process.env.REPLY_CACHE_VARIETY) || 1)
+// memory = per-instance LRU, postgres = LRU in front of the shared ReplyCache table, off = disabled
+const STORE = process.env.REPLY_CACHE_STORE || 'memory'
+// Longer messages practically never repeat, so they aren't worth a cache entry
+const MAX_CACHEABLE_LENGTH = 200
+const PURGE_INTERVAL_MS = 10 * 60 * 1000
+
+const log = createLogger('reply-cache')
+
+type CachedReplies = { replies: string[] }
+
+declare global {
+  var replyCache: LRUCache<string, CachedReplies> | undefined
+  var replyCacheInflight: Map<string, Promise<string | null>> | undefined
+}
+
+const cache = globalThis.replyCache || new LRUCache<string, CachedReplies>(REPLY_CACHE_SIZE, REPLY_CACHE_TTL_MS)
+globalThis.replyCache = cache
+// Misses being generated right now, so a burst of identical comments makes one LLM call
+const inflight: Map<string, Promise<string | null>> = globalThis.replyCacheInflight || new Map()
+globalThis.replyCacheInflight = inflight
+let lastPurge = 0
+
+// "Giveaway!!", "giveaway" and " GIVEAWAY " are the same trigger
+export const normalizeReplyText = (text: string) =>
+  text
+    .normalize('NFKC')
+    .toLowerCase()
+    .replace(/\p{P}+/gu, ' ')
+    .replace(/\s+/g, ' ')
+    .trim()
+
+type ReplyInput = {
+  automationId: string
+  model: string
+  systemPrompt: string
+  text: string
+}
+
+const replyCacheKey = ({ automationId, model, systemPrompt, text }: ReplyInput, normalized: string) => {
+  // Editing the listener prompt changes the hash, so stale replies are never served
+  const hash = createHash('sha256')
+    .update(`${model}\u0000${systemPrompt}\u0000${normalized}`)
+    .digest('hex')
+  return `${automationId}:${hash}`
+}
+
+const pick = (replies: string[]) => replies[Math.floor(Math.random() * replies.length)]
+
+const loadReplies = async (key: string): Promise<string[]> => {
+  const local = cache.get(key)
+  if (local || STORE !== 'postgres') return local?.replies || []
+
+  const row = await getCachedReplies(key)
+  if (!row) return []
+  cache.set(key, { replies: row.replies }, row.expiresAt.getTime() - Date.now())
+  return row.replies
+}
+
+const storeReply = async (key: string, reply: string, known: string[]) => {
+  if (STORE !== 'postgres') {
+    cache.set(key, { replies: [...known, reply].slice(0, REPLY_CACHE_VARIETY) })
+    return
+  }
+
+  const row = await addCachedReply(key, reply, REPLY_CACHE_VARIETY, REPLY_CACHE_TTL_MS)
+  cache.set(key, { replies: row.replies }, row.expiresAt.getTime() - Date.now())
+
+  if (Date.now() - lastPurge > PURGE_INTERVAL_MS) {
+    lastPurge = Date.now()
+    purgeExpiredReplies().catch((error) =>
+      log.error('Failed to purge expired replies', { error: error?.message })
+    )
+  }
+}
+
+// Reply to a first-turn SMARTAI message (a prompt with no chat history), reusing
+// an earlier completion for the same automation, prompt and normalized text.
+// `generate` is only called on a miss, or while fewer than REPLY_CACHE_VARIETY
+// variants are cached. Cache failures fall back to generating.
+export const getOrCreateReply = async (
+  input: ReplyInput,
+  generate: () => Promise<string | null | undefined>
+): Promise<string | null> => {
+  const normalized = normalizeReplyText(input.text)
+  if (STORE === 'off' || !normalized || normalized.length > MAX_CACHEABLE_LENGTH) {
+    return (await generate()) || null
+  }
+
+  const key = replyCacheKey(input, normalized)
+  const pending = inflight.get(key)
+  if (pending) return pending
+
+  // Registered before the first await, so concurrent misses for the same key
+  // (the burst this guards against) all wait on this one lookup / generation
+  const lookup = (async () => {
+    const known = await loadReplies(key).catch((error) => {
+      log.error('Failed to read reply cache', { error: error?.message })
+      return [] as string[]
+    })
+    if (known.length >= REPLY_CACHE_VARIETY) {
+      log.debug('Reply cache hit', { automationId: input.automationId, variants: known.length })
+      return pick(known)
+    }
+
+    const reply = (await generate()) || null
+    if (reply) {
+      await storeReply(key, reply, known).catch((error) =>
+        log.error('Failed to store reply', { error: error?.message })
+      )
+    }
+    return reply
+  })()
+
+  inflight.set(key, lookup)
+  try {
+    return await lookup
+  } finally {
+    inflight.delete(key)
+  }
+}
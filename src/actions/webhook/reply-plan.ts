@@ -0,0 +1,102 @@
+import { DmLink, renderLinkMessage } from '@/lib/fetch'
+import { LRUCache } from '@/lib/lru'
+import { dmImagePath } from './dm-images'
+
+const REPLY_PLAN_CACHE_SIZE = 2_000
+
+// Everything a MESSAGE listener sends, worked out once per listener version:
+// the public comment reply, the DM text, the absolute image URL and the links
+// with their follow-up messages already rendered. Frozen - shared by every event.
+export type ReplyPlan = Readonly<{
+  // Listener.updatedAt (ms) the plan was compiled from
+  version: number
+  publicReply: string
+  dmMessage: string
+  imageUrl: string | null
+  links: ReadonlyArray<Readonly<Required<DmLink>>>
+}>
+
+type ListenerSource = {
+  prompt: string
+  commentReply: string | null
+  dmImageHash: string | null
+  updatedAt: Date
+}
+
+declare global {
+  var replyPlanCache: LRUCache<string, ReplyPlan> | undefined
+}
+
+// Versioned, so entries never need a TTL: a newer listener simply misses
+const cache = globalThis.replyPlanCache || new LRUCache<string, ReplyPlan>(REPLY_PLAN_CACHE_SIZE)
+globalThis.replyPlanCache = cache
+
+// Public base URL Meta can fetch /api/dm-image from
+const getPublicBaseUrl = () => {
+  // ✅ Priority: Use environment variables for public URL (ngrok, production, etc.)
+  const baseUrl =
+    process.env.NGROK_URL || // ngrok URL (e.g., https://abc123.ngrok.io)
+    process.env.NEXT_PUBLIC_APP_URL || // Production URL
+    (process.env.VERCEL_URL ? `https://${process.env.VERCEL_URL}` : null) || // Vercel URL
+    'http://localhost:3000' // Fallback
+
+  // ✅ Fix: Remove trailing slash to avoid double slashes
+  return baseUrl.replace(/\/$/, '')
+}
+
+// commentReply holds either plain text (the public reply) or JSON with the links,
+// public reply and (for listeners not yet moved to the blob store, or external
+// URLs) the DM image (see addListener)
+export const compileReplyPlan = (automationId: string, listener: ListenerSource): ReplyPlan => {
+  let publicReply = 'Thanks for your comment ❤️'
+  let imageUrl: string | null = null
+  let links: DmLink[] = []
+
+  if (listener.commentReply) {
+    try {
+      const parsed = JSON.parse(listener.commentReply)
+      imageUrl = parsed.dmImage || null
+      links = Array.isArray(parsed.dmLinks)
+        ? parsed.dmLinks.filter((l: any) => l && typeof l === 'object' && l.title && l.url)
+        : []
+      publicReply = parsed.originalReply || publicReply
+
+      // Base64 images are served by the dm-image route; only its URL is kept
+      if (imageUrl && imageUrl.startsWith('data:image')) {
+        imageUrl = `${getPublicBaseUrl()}/api/dm-image/${automationId}`
+      }
+    } catch {
+      // Not JSON, use as plain text for public reply
+      publicReply = listener.commentReply
+    }
+  }
+
+  if (listener.dmImageHash) {
+    imageUrl = getPublicBaseUrl() + dmImagePath(automationId, listener.dmImageHash)
+  }
+
+  return Object.freeze({
+    version: listener.updatedAt.getTime(),
+    publicReply,
+    dmMessage: listener.prompt || 'Thanks for your message 💬',
+    imageUrl,
+    links: Object.freeze(
+      links.map(({ title, url }) => Object.freeze({ title, url, text: renderLinkMessage({ title, url }) }))
+    ),
+  })
+}
+
+// The compiled plan for this listener version - a map lookup unless the listener changed.
+// A newer cached plan (saved here after `listener` was read) wins.
+export const getReplyPlan = (automationId: string, listener: ListenerSource) => {
+  const cached = cache.get(automationId)
+  if (cached && cached.version >= listener.updatedAt.getTime()) return cached
+  return storeReplyPlan(automationId, listener)
+}
+
+// Compile and cache the plan (called by addListener when the listener is saved)
+export const storeReplyPlan = (automationId: string, listener: ListenerSource) => {
+  const plan = compileReplyPlan(automationId, listener)
+  cache.set(automationId, plan)
+  return plan
+}
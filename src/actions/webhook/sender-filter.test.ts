@@ -0,0 +1,58 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest'
+
+vi.mock('./queries', () => ({
+  getConversationKeys: vi.fn(async () => []),
+  getConversationsActiveSince: vi.fn(async () => []),
+}))
+
+import { getConversationsActiveSince } from './queries'
+
+const loadFilter = async () => {
+  vi.resetModules()
+  globalThis.senderFilter = undefined
+  return import('./sender-filter')
+}
+
+const sinceArgs = () =>
+  vi.mocked(getConversationsActiveSince).mock.calls.map(([since]) => (since as Date).getTime())
+
+describe('sender filter sync', () => {
+  beforeEach(() => {
+    vi.useFakeTimers()
+    vi.setSystemTime(new Date('2026-01-01T00:00:00Z'))
+    vi.mocked(getConversationsActiveSince).mockReset().mockResolvedValue([])
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+  })
+
+  it('keeps the watermark in place when polls find nothing new', async () => {
+    const { mightHaveConversation } = await loadFilter()
+
+    await mightHaveConversation('page', 'user')
+    vi.advanceTimersByTime(10_000)
+    await mightHaveConversation('page', 'user')
+    vi.advanceTimersByTime(10_000)
+    await mightHaveConversation('page', 'user')
+
+    const [first, ...rest] = sinceArgs()
+    expect(rest).toEqual([first, first])
+  })
+
+  it('advances the watermark to the newest row, less the overlap', async () => {
+    const { mightHaveConversation } = await loadFilter()
+    const activity = new Date('2026-01-01T00:00:05Z')
+    vi.mocked(getConversationsActiveSince).mockResolvedValueOnce([
+      { pageId: 'page', userId: 'user', lastActivityAt: activity },
+    ] as any)
+
+    await mightHaveConversation('page', 'user')
+    vi.advanceTimersByTime(10_000)
+    await mightHaveConversation('page', 'user')
+
+    // The first window started 30s before the load; the second 30s before the row
+    expect(sinceArgs()[1]).toBe(activity.getTime() - 30_000)
+    expect(await mightHaveConversation('page', 'user')).toBe(true)
+  })
+})
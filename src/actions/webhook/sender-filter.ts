@@ -0,0 +1,182 @@
+import { BloomFilter } from '@/lib/bloom-filter'
+import { getConversationKeys, getConversationsActiveSince } from './queries'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('sender-filter')
+
+// Full rebuild interval (resizes filters that have filled up)
+const RELOAD_INTERVAL_MS = Number(process.env.SENDER_FILTER_RELOAD_MS) || 10 * 60 * 1000
+// How often conversations started on other instances are pulled in
+const SYNC_INTERVAL_MS = Number(process.env.SENDER_FILTER_SYNC_MS) || 5_000
+const TARGET_FALSE_POSITIVE_RATE = Number(process.env.SENDER_FILTER_FP_RATE) || 0.01
+// Filters are sized for twice the senders they start with, and at least this many
+const MIN_CAPACITY = 1_024
+const LOAD_BATCH = 10_000
+const RETRY_AFTER_FAILURE_MS = 30_000
+// Re-read a little before the last sync, so rows committed late aren't skipped
+const SYNC_OVERLAP_MS = 30_000
+
+type SenderFilter = {
+  // pageId -> senders that have a conversation with the page
+  byPage: Map<string, BloomFilter>
+  // false until the first load succeeds; lookups fail open meanwhile
+  ready: boolean
+  loadedAt: number
+  syncedUntil: Date | null
+  syncedAt: number
+  loading: Promise<void> | null
+  syncing: Promise<void> | null
+  lookups: number
+  rejected: number
+  falsePositives: number
+}
+
+declare global {
+  var senderFilter: SenderFilter | undefined
+}
+
+const state: SenderFilter = globalThis.senderFilter || {
+  byPage: new Map(),
+  ready: false,
+  loadedAt: 0,
+  syncedUntil: null,
+  syncedAt: 0,
+  loading: null,
+  syncing: null,
+  lookups: 0,
+  rejected: 0,
+  falsePositives: 0,
+}
+globalThis.senderFilter = state
+
+const newFilter = (senders: number) =>
+  new BloomFilter(Math.max(MIN_CAPACITY, senders * 2), TARGET_FALSE_POSITIVE_RATE)
+
+const add = (pageId: string, userId: string) => {
+  let filter = state.byPage.get(pageId)
+  if (!filter) {
+    filter = newFilter(0)
+    state.byPage.set(pageId, filter)
+  }
+  filter.add(userId)
+  // Past its capacity the false-positive rate climbs - resize on the next lookup
+  if (filter.saturated) state.loadedAt = 0
+}
+
+const reload = async () => {
+  const startedAt = Date.now()
+  const senders = new Map<string, string[]>()
+  let cursor: { pageId: string; userId: string } | null = null
+
+  while (true) {
+    const keys = await getConversationKeys(cursor, LOAD_BATCH)
+    for (const { pageId, userId } of keys) {
+      const users = senders.get(pageId)
+      if (users) users.push(userId)
+      else senders.set(pageId, [userId])
+    }
+    if (keys.length < LOAD_BATCH) break
+    cursor = keys[keys.length - 1]
+  }
+
+  const byPage = new Map<string, BloomFilter>()
+  senders.forEach((users, pageId) => {
+    const filter = newFilter(users.length)
+    for (const userId of users) filter.add(userId)
+    byPage.set(pageId, filter)
+  })
+
+  state.byPage = byPage
+  state.ready = true
+  state.loadedAt = Date.now()
+  // Catch up on anything written while the load was running before the next lookup
+  state.syncedUntil = new Date(startedAt - SYNC_OVERLAP_MS)
+  state.syncedAt = 0
+  log.info('Loaded senders', () => ({
+    pages: byPage.size,
+    senders: Array.from(senders.values()).reduce((sum, users) => sum + users.length, 0),
+    ms: Date.now() - startedAt,
+  }))
+}
+
+const sync = async () => {
+  const since = state.syncedUntil || new Date(Date.now() - SYNC_OVERLAP_MS)
+  const rows = await getConversationsActiveSince(since)
+
+  let latest = since.getTime()
+  for (const row of rows) {
+    add(row.pageId, row.userId)
+    latest = Math.max(latest, row.lastActivityAt.getTime())
+  }
+  // Never move the watermark back: with no newer rows, the next poll reads the same window
+  state.syncedUntil = new Date(Math.max(since.getTime(), latest - SYNC_OVERLAP_MS))
+  state.syncedAt = Date.now()
+}
+
+const ensureLoaded = async () => {
+  if (Date.now() - state.loadedAt >= RELOAD_INTERVAL_MS && !state.loading) {
+    state.loading = reload()
+      .catch((error) => {
+        log.error('Failed to load senders', { error: error?.message })
+        state.loadedAt = Date.now() - RELOAD_INTERVAL_MS + RETRY_AFTER_FAILURE_MS
+      })
+      .finally(() => {
+        state.loading = null
+      })
+  }
+  // Only the first load is waited for; later rebuilds swap in when done
+  if (!state.ready && state.loading) await state.loading
+  if (!state.ready) return
+
+  if (Date.now() - state.syncedAt >= SYNC_INTERVAL_MS && !state.syncing && !state.loading) {
+    state.syncing = sync()
+      .catch((error) => {
+        log.error('Failed to sync senders', { error: error?.message })
+      })
+      .finally(() => {
+        state.syncing = null
+      })
+  }
+  if (state.syncing) await state.syncing
+}
+
+// False means the sender has definitely never had a conversation with the page,
+// so the database doesn't need asking. True means "maybe" (about
+// SENDER_FILTER_FP_RATE of strangers get through). Fails open while not loaded.
+export const mightHaveConversation = async (pageId: string, userId: string) => {
+  await ensureLoaded()
+  if (!state.ready) return true
+
+  state.lookups++
+  const maybe = !!state.byPage.get(pageId)?.has(userId)
+  if (!maybe) state.rejected++
+  return maybe
+}
+
+// A conversation was just recorded on this instance
+export const noteConversation = (pageId: string, userId: string) => {
+  if (state.ready) add(pageId, userId)
+}
+
+// The filter said "maybe" but there was no conversation
+export const reportFalsePositive = () => {
+  state.falsePositives++
+}
+
+export const getSenderFilterMetrics = () => {
+  const pages = Array.from(state.byPage, ([pageId, filter]) => ({ pageId, ...filter.stats }))
+  return {
+    ready: state.ready,
+    loadedAt: state.loadedAt ? new Date(state.loadedAt) : null,
+    lookups: state.lookups,
+    rejected: state.rejected,
+    falsePositives: state.falsePositives,
+    // Share of senders without a conversation that still reached the database
+    observedFalsePositiveRate:
+      state.rejected + state.falsePositives > 0
+        ? state.falsePositives / (state.rejected + state.falsePositives)
+        : 0,
+    bytes: pages.reduce((sum, page) => sum + page.bytes, 0),
+    pages,
+  }
+}
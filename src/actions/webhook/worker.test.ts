@@ -0,0 +1,74 @@
+import { beforeEach, describe, expect, it, vi } from 'vitest'
+import type { WebhookJob } from '@prisma/client'
+
+vi.mock('./queries', () => ({
+  claimWebhookJobs: vi.fn(),
+  completeWebhookJob: vi.fn(async () => ({})),
+  failWebhookJob: vi.fn(async () => ({})),
+  purgeFinishedWebhookJobs: vi.fn(async () => ({ count: 0 })),
+}))
+vi.mock('./handlers', () => ({
+  handleWebhookPayload: vi.fn(),
+}))
+
+import { completeWebhookJob, failWebhookJob } from './queries'
+import { handleWebhookPayload } from './handlers'
+import { processWebhookJob } from './worker'
+
+const job = (overrides: Partial<WebhookJob> = {}) =>
+  ({
+    id: 'job-1',
+    payload: { object: 'instagram', entry: [] },
+    status: 'PROCESSING',
+    attempts: 1,
+    maxAttempts: 5,
+    lastError: null,
+    runAt: new Date(),
+    lockedUntil: new Date(),
+    createdAt: new Date(),
+    updatedAt: new Date(),
+    ...overrides,
+  }) as WebhookJob
+
+describe('processWebhookJob', () => {
+  beforeEach(() => {
+    vi.clearAllMocks()
+  })
+
+  it('marks a job done when the handler succeeds', async () => {
+    vi.mocked(handleWebhookPayload).mockResolvedValue({ message: 'ok' } as any)
+
+    await processWebhookJob(job())
+
+    expect(handleWebhookPayload).toHaveBeenCalledWith(job().payload, 'job-1')
+    expect(completeWebhookJob).toHaveBeenCalledWith('job-1')
+    expect(failWebhookJob).not.toHaveBeenCalled()
+  })
+
+  it('puts a failed job back on the queue', async () => {
+    vi.mocked(handleWebhookPayload).mockRejectedValue(new Error('Graph down'))
+
+    await processWebhookJob(job())
+
+    expect(completeWebhookJob).not.toHaveBeenCalled()
+    expect(failWebhookJob).toHaveBeenCalledTimes(1)
+    expect(vi.mocked(failWebhookJob).mock.calls[0][1]).toContain('Graph down')
+  })
+
+  it('runs a job reclaimed after a visibility timeout again', async () => {
+    vi.mocked(handleWebhookPayload).mockResolvedValue({ message: 'ok' } as any)
+
+    // Claimed a second time: the first worker died mid-job
+    await processWebhookJob(job({ attempts: 2, lastError: null }))
+
+    expect(handleWebhookPayload).toHaveBeenCalledTimes(1)
+    expect(completeWebhookJob).toHaveBeenCalledWith('job-1')
+  })
+
+  it('dead-letters a job reclaimed more often than its attempts allow', async () => {
+    await processWebhookJob(job({ attempts: 6, maxAttempts: 5, lastError: 'timeout' }))
+
+    expect(handleWebhookPayload).not.toHaveBeenCalled()
+    expect(failWebhookJob).toHaveBeenCalledWith(expect.objectContaining({ id: 'job-1' }), 'timeout')
+  })
+})
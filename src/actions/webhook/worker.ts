@@ -0,0 +1,121 @@
+import { WebhookJob } from '@prisma/client'
+import {
+  claimWebhookJobs,
+  completeWebhookJob,
+  failWebhookJob,
+  purgeFinishedWebhookJobs,
+} from './queries'
+import { handleWebhookPayload } from './handlers'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('webhook-worker')
+
+// Number of jobs processed concurrently by this instance
+const WORKER_CONCURRENCY = Number(process.env.WEBHOOK_WORKER_CONCURRENCY) || 4
+// How long a claimed job stays invisible to other workers before it can be reclaimed
+const VISIBILITY_TIMEOUT_MS = Number(process.env.WEBHOOK_VISIBILITY_TIMEOUT_MS) || 60_000
+// How long an idle worker sleeps before polling the queue again
+const IDLE_POLL_MS = 2_000
+// How long dead-lettered jobs are kept for inspection, and how often they're purged
+const DEAD_RETENTION_MS = Number(process.env.WEBHOOK_DEAD_RETENTION_MS) || 7 * 24 * 60 * 60 * 1000
+const PURGE_INTERVAL_MS = 10 * 60 * 1000
+
+type WorkerPool = {
+  started: boolean
+  sleepers: Set<() => void>
+  lastPurge: number
+}
+
+declare global {
+  var webhookWorkerPool: WorkerPool | undefined
+}
+
+// Kept on globalThis so hot reloads in dev don't spawn a second pool
+const pool: WorkerPool = globalThis.webhookWorkerPool || {
+  started: false,
+  sleepers: new Set(),
+  lastPurge: 0,
+}
+globalThis.webhookWorkerPool = pool
+
+const idle = () =>
+  new Promise<void>((resolve) => {
+    const wake = () => {
+      clearTimeout(timer)
+      pool.sleepers.delete(wake)
+      resolve()
+    }
+    const timer = setTimeout(wake, IDLE_POLL_MS)
+    pool.sleepers.add(wake)
+  })
+
+// Run one claimed job and record the outcome: deleted when done, back to
+// PENDING with backoff, or DEAD once its attempts are used up
+export const processWebhookJob = async (job: WebhookJob, workerId: number = 0) => {
+  // Reclaimed after a crash/timeout once too often - dead-letter it without running again
+  if (job.attempts > job.maxAttempts) {
+    await failWebhookJob(job, job.lastError || 'Visibility timeout exceeded').catch(() => {})
+    return
+  }
+
+  try {
+    const result = await handleWebhookPayload(job.payload, job.id)
+    await completeWebhookJob(job.id)
+    log.info('Job done', { workerId, jobId: job.id, result: result.message })
+  } catch (error: any) {
+    log.error('Job failed', { workerId, jobId: job.id, attempt: job.attempts, maxAttempts: job.maxAttempts, error: error?.message })
+    await failWebhookJob(job, error?.stack || error?.message || String(error)).catch(
+      (e) => log.error('Failed to record failure', { workerId, jobId: job.id, error: e?.message })
+    )
+  }
+}
+
+// At most once per PURGE_INTERVAL_MS per instance, from whichever worker gets there first
+const maybePurge = () => {
+  if (Date.now() - pool.lastPurge < PURGE_INTERVAL_MS) return
+  pool.lastPurge = Date.now()
+  purgeFinishedWebhookJobs(DEAD_RETENTION_MS)
+    .then(({ count }) => {
+      if (count) log.info('Purged finished jobs', { count })
+    })
+    .catch((error) => log.error('Failed to purge finished jobs', { error: error?.message }))
+}
+
+const runWorker = async (workerId: number) => {
+  while (true) {
+    maybePurge()
+
+    let jobs
+    try {
+      jobs = await claimWebhookJobs(1, VISIBILITY_TIMEOUT_MS)
+    } catch (error: any) {
+      log.error('Failed to claim jobs', { workerId, error: error?.message })
+      await idle()
+      continue
+    }
+
+    if (jobs.length === 0) {
+      await idle()
+      continue
+    }
+
+    for (const job of jobs) {
+      await processWebhookJob(job, workerId)
+    }
+  }
+}
+
+// Start the in-process worker pool (idempotent)
+export const startWebhookWorkers = () => {
+  if (pool.started) return
+  pool.started = true
+  log.info('Starting workers', { workers: WORKER_CONCURRENCY })
+  for (let i = 0; i < WORKER_CONCURRENCY; i++) {
+    void runWorker(i)
+  }
+}
+
+// Wake idle workers so a freshly enqueued job is picked up without waiting for the next poll
+export const wakeWebhookWorkers = () => {
+  for (const wake of Array.from(pool.sleepers)) wake()
+}
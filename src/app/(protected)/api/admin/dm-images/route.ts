@@ -0,0 +1,28 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { migrateInlineDmImages, sweepUnusedDmImages } from '@/actions/webhook/dm-images'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('admin-dm-images')
+
+// Blob store and sharp need Node
+export const runtime = 'nodejs'
+
+// One-off maintenance, run by an operator after deploying the blob store:
+//   curl -X POST -H "Authorization: Bearer $ADMIN_API_SECRET" <host>/api/admin/dm-images
+// Moves base64 images still inside listeners' commentReply JSON into the blob
+// store, then deletes stored images nothing uses any more. Safe to run again.
+export async function POST(req: NextRequest) {
+  const secret = process.env.ADMIN_API_SECRET
+  if (!secret || req.headers.get('authorization') !== `Bearer ${secret}`) {
+    return NextResponse.json({ status: 403, error: 'Forbidden' }, { status: 403 })
+  }
+
+  try {
+    const migrated = await migrateInlineDmImages()
+    const deleted = await sweepUnusedDmImages()
+    return NextResponse.json({ status: 200, migrated, deleted })
+  } catch (error: any) {
+    log.error('DM image maintenance failed', { error: error?.message })
+    return NextResponse.json({ status: 500, error: 'DM image maintenance failed' }, { status: 500 })
+  }
+}
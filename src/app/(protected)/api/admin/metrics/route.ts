@@ -0,0 +1,27 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { getSenderFilterMetrics } from '@/actions/webhook/sender-filter'
+import { getGraphClientMetrics } from '@/lib/graph'
+import { getOpenAIMetrics } from '@/lib/openai'
+
+// Counters live in this process's memory
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+// Per-instance health counters for operators:
+//   curl -H "Authorization: Bearer $ADMIN_API_SECRET" <host>/api/admin/metrics
+export async function GET(req: NextRequest) {
+  const secret = process.env.ADMIN_API_SECRET
+  if (!secret || req.headers.get('authorization') !== `Bearer ${secret}`) {
+    return NextResponse.json({ status: 403, error: 'Forbidden' }, { status: 403 })
+  }
+
+  return NextResponse.json(
+    {
+      status: 200,
+      graph: getGraphClientMetrics(),
+      openai: getOpenAIMetrics(),
+      senderFilter: getSenderFilterMetrics(),
+    },
+    { headers: { 'Cache-Control': 'no-store' } }
+  )
+}
@@ -1,105 +1,189 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { findAutomation } from '@/actions/automations/queries'
+import { DmImage, loadDmImage, saveDmImageUpload } from '@/actions/webhook/dm-images'
+import { onCurrentUser } from '@/actions/user'
+import { isAutomationOwner } from '@/actions/automations/queries'
+import { MAX_DM_IMAGE_BYTES, MAX_DM_IMAGE_LABEL } from '@/constants/dm-image'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('dm-image')
+
+// So Instagram/Facebook can fetch the image
+const CORS_HEADERS = {
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Methods': 'GET, HEAD, POST, OPTIONS',
+  'Access-Control-Allow-Headers': 'Content-Type, Range, If-None-Match',
+}
+
+// URLs without ?v=<hash> (or with an outdated one) can start showing a new image
+const REVALIDATE_MAX_AGE_S = 300
+const UUID_PATTERN = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i
 
 // Handle OPTIONS request for CORS
 export async function OPTIONS() {
-  return new NextResponse(null, {
-    status: 200,
-    headers: {
-      'Access-Control-Allow-Origin': '*',
-      'Access-Control-Allow-Methods': 'GET, OPTIONS',
-      'Access-Control-Allow-Headers': 'Content-Type',
-    },
-  })
+  return new NextResponse(null, { status: 200, headers: CORS_HEADERS })
 }
 
-export async function GET(
-  req: NextRequest,
-  { params }: { params: { id: string } }
-) {
+const etagOf = (image: DmImage) => `"${image.hash}"`
+
+// If-None-Match holds a list of entity tags (or *); weak tags compare equal too
+const matchesEtag = (header: string | null, etag: string) =>
+  !!header && header.split(',').some((tag) => ['*', etag].includes(tag.trim().replace(/^W\//, '')))
+
+// A single "bytes=" range as [start, end] inclusive. undefined: no (usable)
+// Range header - serve everything; null: not satisfiable.
+const parseRange = (header: string | null, size: number): [number, number] | null | undefined => {
+  const match = header?.match(/^bytes=(\d*)-(\d*)$/)
+  if (!match || (!match[1] && !match[2])) return undefined
+
+  if (!match[1]) {
+    // Suffix range: the last N bytes
+    const length = Number(match[2])
+    if (length === 0) return null
+    return [Math.max(0, size - length), size - 1]
+  }
+
+  const start = Number(match[1])
+  const end = match[2] ? Math.min(Number(match[2]), size - 1) : size - 1
+  if (start >= size || start > end) return null
+  return [start, end]
+}
+
+const serve = async (req: NextRequest, automationId: string | undefined, withBody: boolean) => {
+  if (!automationId || automationId.trim() === '') {
+    return NextResponse.json({ error: 'Invalid automation ID' }, { status: 400, headers: CORS_HEADERS })
+  }
+
+  const version = req.nextUrl.searchParams.get('v')
+  const image = await loadDmImage(automationId, version)
+  if (!image) {
+    log.warn('Image not found', { automationId })
+    // Not cacheable: the image may be saved (or the ?v= become current) any moment
+    return NextResponse.json(
+      { error: 'Image not found' },
+      { status: 404, headers: { ...CORS_HEADERS, 'Cache-Control': 'no-store' } }
+    )
+  }
+
+  const etag = etagOf(image)
+  const headers: Record<string, string> = {
+    ...CORS_HEADERS,
+    ETag: etag,
+    'Accept-Ranges': 'bytes',
+    // A URL naming the image's hash always returns these bytes
+    'Cache-Control':
+      version === image.version
+        ? 'public, max-age=31536000, immutable'
+        : `public, max-age=${REVALIDATE_MAX_AGE_S}`,
+  }
+
+  if (matchesEtag(req.headers.get('if-none-match'), etag)) {
+    return new NextResponse(null, { status: 304, headers })
+  }
+
+  const size = image.data.length
+  headers['Content-Type'] = image.contentType
+
+  // If-Range: only honour the range when the client's copy is this image
+  const ifRange = req.headers.get('if-range')
+  const range = !ifRange || ifRange === etag ? parseRange(req.headers.get('range'), size) : undefined
+
+  if (range === null) {
+    headers['Content-Range'] = `bytes */${size}`
+    return new NextResponse(null, { status: 416, headers })
+  }
+
+  if (range) {
+    const [start, end] = range
+    headers['Content-Range'] = `bytes ${start}-${end}/${size}`
+    headers['Content-Length'] = String(end - start + 1)
+    // subarray shares the cached buffer - nothing is copied
+    return new NextResponse(withBody ? (image.data.subarray(start, end + 1) as any) : null, {
+      status: 206,
+      headers,
+    })
+  }
+
+  headers['Content-Length'] = String(size)
+  return new NextResponse(withBody ? (image.data as any) : null, { status: 200, headers })
+}
+
+export async function GET(req: NextRequest, { params }: { params: { id: string } }) {
   try {
-    // Validate params
-    const automationId = params?.id
-    if (!automationId || automationId.trim() === '') {
-      console.log('❌ [dm-image] Missing or invalid automation ID')
-      return NextResponse.json({ error: 'Invalid automation ID' }, { status: 400 })
-    }
+    return await serve(req, params?.id, true)
+  } catch (error: any) {
+    log.error('Failed to serve image', { automationId: params?.id, error: error?.message })
+    return NextResponse.json({ error: 'Failed to serve image' }, { status: 500, headers: CORS_HEADERS })
+  }
+}
+
+export async function HEAD(req: NextRequest, { params }: { params: { id: string } }) {
+  try {
+    return await serve(req, params?.id, false)
+  } catch (error: any) {
+    log.error('Failed to serve image', { automationId: params?.id, error: error?.message })
+    return new NextResponse(null, { status: 500, headers: CORS_HEADERS })
+  }
+}
 
-    console.log('📸 [dm-image] Request received for automation:', automationId)
-    
-    const automation = await findAutomation(automationId)
-    
-    if (!automation || !automation.listener) {
-      console.log('❌ [dm-image] Automation or listener not found')
-      return NextResponse.json({ error: 'Automation not found' }, { status: 404 })
+// Read a request body chunk by chunk, giving up as soon as it passes `limit`
+// bytes (null) - an oversized upload is never held in memory in full
+const readBody = async (req: NextRequest, limit: number) => {
+  if (!req.body) return Buffer.alloc(0)
+  const reader = req.body.getReader()
+  const chunks: Uint8Array[] = []
+  let size = 0
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    size += value.length
+    if (size > limit) {
+      await reader.cancel().catch(() => {})
+      return null
     }
-    
-    // Extract image from commentReply JSON
-    let imageData: string | null = null
-    if (automation.listener.commentReply) {
-      try {
-        const parsed = JSON.parse(automation.listener.commentReply)
-        imageData = parsed.dmImage || null
-        console.log('✅ [dm-image] Image data extracted:', {
-          hasImage: !!imageData,
-          imageType: imageData ? (imageData.startsWith('data:image') ? 'base64' : 'url') : 'none',
-          imageLength: imageData?.length || 0,
-        })
-      } catch (parseError: any) {
-        console.log('⚠️ [dm-image] Failed to parse commentReply:', parseError.message)
-        // Not JSON, ignore
-      }
+    chunks.push(value)
+  }
+  return Buffer.concat(chunks, size)
+}
+
+const tooLarge = () =>
+  NextResponse.json(
+    { status: 413, error: `Image must be ${MAX_DM_IMAGE_LABEL} or smaller` },
+    { status: 413 }
+  )
+
+// Builder upload: the (already compressed) image as the raw request body, with
+// its type as Content-Type. Stores it and returns the URL the next listener
+// save sends back.
+export async function POST(req: NextRequest, { params }: { params: { id: string } }) {
+  const automationId = params?.id
+  try {
+    const user = await onCurrentUser()
+    if (!automationId || !UUID_PATTERN.test(automationId)) {
+      return NextResponse.json({ status: 400, error: 'Invalid automation ID' }, { status: 400 })
     }
-    
-    if (!imageData || !imageData.startsWith('data:image')) {
-      console.log('❌ [dm-image] No valid image data found')
-      return NextResponse.json({ error: 'Image not found' }, { status: 404 })
+    if (!(await isAutomationOwner(automationId, user.id))) {
+      return NextResponse.json({ status: 404, error: 'Automation not found' }, { status: 404 })
     }
-    
-    // Extract base64 data with validation
-    const base64Match = imageData.match(/^data:image\/([^;]+);base64,(.+)$/)
-    if (!base64Match || !base64Match[2]) {
-      console.log('❌ [dm-image] Invalid base64 image format')
-      return NextResponse.json({ error: 'Invalid image format' }, { status: 400 })
+
+    const contentType = (req.headers.get('content-type') || '').split(';')[0].trim().toLowerCase()
+    if (!contentType.startsWith('image/')) {
+      return NextResponse.json({ status: 400, error: 'Expected an image' }, { status: 400 })
     }
 
-    const contentType = base64Match[1] || 'jpeg'
-    const base64Data = base64Match[2]
-
-    // Decode base64 with error handling
-    let imageBuffer: Buffer
-    try {
-      imageBuffer = Buffer.from(base64Data, 'base64')
-      if (imageBuffer.length === 0) {
-        throw new Error('Decoded buffer is empty')
-      }
-    } catch (decodeError: any) {
-      console.error('❌ [dm-image] Failed to decode base64:', decodeError.message)
-      return NextResponse.json({ error: 'Failed to decode image' }, { status: 500 })
+    // Turn oversized uploads away before reading the body when the size is declared
+    if (Number(req.headers.get('content-length') || 0) > MAX_DM_IMAGE_BYTES) return tooLarge()
+
+    const data = await readBody(req, MAX_DM_IMAGE_BYTES)
+    if (!data) return tooLarge()
+    if (data.length === 0) {
+      return NextResponse.json({ status: 400, error: 'Expected an image' }, { status: 400 })
     }
-    
-    console.log('✅ [dm-image] Serving image:', {
-      contentType: `image/${contentType}`,
-      bufferSize: imageBuffer.length,
-      automationId,
-    })
-    
-    return new NextResponse(imageBuffer as any, {
-      headers: {
-        'Content-Type': `image/${contentType}`,
-        'Cache-Control': 'public, max-age=31536000, immutable',
-        // ✅ Add CORS headers so Instagram/Facebook can access the image
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'GET, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type',
-      },
-    })
+
+    const image = await saveDmImageUpload(automationId, data, contentType)
+    return NextResponse.json({ status: 200, hash: image.hash, url: image.url })
   } catch (error: any) {
-    console.error('❌ [dm-image] Unexpected error:', error)
-    return NextResponse.json({ 
-      error: 'Failed to serve image',
-      details: error.message 
-    }, { status: 500 })
+    log.error('Upload failed', { automationId, error: error?.message })
+    return NextResponse.json({ status: 500, error: 'Failed to save image' }, { status: 500 })
   }
 }
-
@@ -2,6 +2,7 @@
 
 import React from 'react'
 import { useQueryAutomation } from '@/hooks/user-queries'
+import { useDmImageUpload } from '@/hooks/use-automations'
 import AlertBox from '../../alert/alert'
 import { Input } from '@/components/ui/input'
 import { Button } from '@/components/ui/button'
@@ -12,6 +13,8 @@ import {
   DialogTitle,
 } from '@/components/ui/dialog'
 import { Camera, Trash2, Smile, Link2, X, Pencil, Paperclip } from 'lucide-react'
+import { MAX_DM_IMAGE_BYTES, MAX_DM_IMAGE_LABEL } from '@/constants/dm-image'
+import { dmImageSrc } from '@/lib/image-compressor'
 
 export type DmLink = {
   title: string
@@ -46,6 +49,7 @@ const DmPanel = ({
   setDmImage,
 }: Props) => {
   const { data } = useQueryAutomation(id)
+  const { uploadImage, progress: uploadProgress, isUploading } = useDmImageUpload(id)
   const [localDmLinks, setLocalDmLinks] = React.useState<DmLink[]>(dmLinks)
   const [localDmImage, setLocalDmImage] = React.useState<string | null>(dmImage)
   const [isLinkModalOpen, setIsLinkModalOpen] = React.useState(false)
@@ -101,29 +105,36 @@ const DmPanel = ({
     }
   }, [data?.data?.listener, setDmPreview, setDmEnabled]) // Removed dmPreview from dependencies
 
-const handleImageSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
+const handleImageSelect = async (e: React.ChangeEvent<HTMLInputElement>) => {
   const file = e.target.files?.[0];
   if (!file) return;
 
-  // ❌ Reject images above 1MB
-  if (file.size > 1024 * 1024) {
-    setAlertMessage("Image must be less than 1 MB. Please upload a smaller file.");
-    setAlertOpen(true);
-
-    // Reset file input
-    if (fileInputRef.current) fileInputRef.current.value = "";
+  // Reset file input
+  if (fileInputRef.current) fileInputRef.current.value = "";
 
+  // ❌ Reject images above the upload limit (the same one the server enforces)
+  if (file.size > MAX_DM_IMAGE_BYTES) {
+    setAlertMessage(`Image must be ${MAX_DM_IMAGE_LABEL} or smaller. Please upload a smaller file.`);
+    setAlertOpen(true);
     return;
   }
 
-  // Convert to base64 for preview
-  const reader = new FileReader();
-  reader.onloadend = () => {
-    const imageData = reader.result as string;
-    setLocalDmImage(imageData);
-    if (setDmImage) setDmImage(imageData);
-  };
-  reader.readAsDataURL(file);
+  // Show the picked file right away; it's compressed in a worker and uploaded
+  // once, and the parent only gets the uploaded image's URL (no base64 in saves)
+  const previousImage = localDmImage;
+  const previewUrl = URL.createObjectURL(file);
+  setLocalDmImage(previewUrl);
+  try {
+    const imageUrl = await uploadImage(file);
+    setLocalDmImage(imageUrl);
+    if (setDmImage) setDmImage(imageUrl);
+  } catch (error: any) {
+    setLocalDmImage(previousImage);
+    setAlertMessage(error?.message || "Could not upload the image. Please try again.");
+    setAlertOpen(true);
+  } finally {
+    URL.revokeObjectURL(previewUrl);
+  }
 };
 
 
@@ -233,10 +244,23 @@ const handleImageSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
             {localDmImage ? (
               <>
                 <img
-                  src={localDmImage}
+                  src={dmImageSrc(localDmImage)}
                   alt="DM media preview"
                   className="w-full h-full object-cover"
                 />
+                {isUploading && (
+                  <div className="absolute inset-0 z-10 flex flex-col items-center justify-center gap-2 bg-black/50">
+                    <div className="w-2/3 h-1.5 rounded-full bg-white/30 overflow-hidden">
+                      <div
+                        className="h-full bg-white transition-all"
+                        style={{ width: `${Math.round((uploadProgress || 0) * 100)}%` }}
+                      />
+                    </div>
+                    <span className="text-white text-xs">
+                      Optimizing image… {Math.round((uploadProgress || 0) * 100)}%
+                    </span>
+                  </div>
+                )}
                 {/* Change and Delete buttons */}
                 <div className="absolute bottom-2 left-2">
                   <input
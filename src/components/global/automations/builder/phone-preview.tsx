@@ -17,6 +17,7 @@ import {
   Info,
   Video,
 } from 'lucide-react'
+import { dmImageSrc } from '@/lib/image-compressor'
 
 type SelectedPost = {
   id: string
@@ -383,7 +384,7 @@ export default function PhonePreview({
                       <div className="self-start max-w-[75%] flex flex-col gap-2">
                         <div className="relative w-full rounded-2xl overflow-hidden bg-white/10 border border-white/10">
                           <img
-                            src={dmImage}
+                            src={dmImageSrc(dmImage)}
                             alt="DM media"
                             className="w-full h-auto object-cover"
                           />
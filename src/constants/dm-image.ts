@@ -0,0 +1,4 @@
+// Instagram rejects image attachments above 8 MB. The builder refuses larger
+// picks and /api/dm-image larger uploads.
+export const MAX_DM_IMAGE_BYTES = 8 * 1024 * 1024
+export const MAX_DM_IMAGE_LABEL = '8 MB'
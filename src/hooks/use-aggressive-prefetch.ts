@@ -5,6 +5,9 @@ import { useEffect } from 'react'
 import { useQueryClient } from '@tanstack/react-query'
 import { getAllAutomations, getProfilePosts } from '@/actions/automations'
 import { onUserInfo } from '@/actions/user'
+import { createLogger } from '@/lib/logger'
+
+const useAggressivePrefetchLog = createLogger('useAggressivePrefetch')
 
 export function useAggressivePrefetch() {
   const queryClient = useQueryClient()
@@ -12,7 +15,7 @@ export function useAggressivePrefetch() {
   useEffect(() => {
     // ✅ Safety check: Only run if QueryClient is available
     if (!queryClient) {
-      console.warn('QueryClient not available yet, skipping prefetch')
+      useAggressivePrefetchLog.warn('QueryClient not available yet, skipping prefetch')
       return
     }
 
@@ -48,7 +51,7 @@ export function useAggressivePrefetch() {
           }).catch(() => {})
         }, 100)
         
-        console.log('🚀 Critical data prefetched successfully!')
+        useAggressivePrefetchLog.debug('Critical data prefetched successfully')
       } catch (error) {
         // Silent fail - prefetching is non-critical
       }
@@ -82,7 +85,7 @@ export function usePrefetchAllAutomations(automationIds: string[]) {
         )
       )
       
-      console.log(`🚀 Prefetched ${Math.min(automationIds.length, 10)} automations`)
+      useAggressivePrefetchLog.debug(`Prefetched ${Math.min(automationIds.length, 10)} automations`)
     }
 
     // Small delay to not block UI
@@ -15,6 +15,7 @@ import useZodForm from './use-zod-form'
 import { AppDispatch, useAppSelector } from '@/redux/store'
 import { useDispatch } from 'react-redux'
 import { TRIGGER } from '@/redux/slices/automation'
+import { compressImage, uploadDmImage } from '@/lib/image-compressor'
 
 export const useCreateAutomation = () => {
   const router = useRouter()
@@ -176,3 +177,23 @@ export const useAutomationPosts = (id: string) => {
   )
   return { posts, onSelectPost, mutate, isPending }
 }
+
+// Compress a picked DM image in a worker and upload it once. Resolves to the
+// image URL the builder keeps (and sends back on save) in place of base64.
+export const useDmImageUpload = (id: string) => {
+  const [progress, setProgress] = useState<number | null>(null)
+
+  const uploadImage = async (file: File) => {
+    setProgress(0)
+    try {
+      // Compression is the first half of the bar, the upload the second
+      const image = await compressImage(file, (p) => setProgress(p / 2))
+      const { url } = await uploadDmImage(id, image, (p) => setProgress(0.5 + p / 2))
+      return url
+    } finally {
+      setProgress(null)
+    }
+  }
+
+  return { uploadImage, progress, isUploading: progress !== null }
+}
@@ -5,16 +5,22 @@ import {
 } from '@/actions/automations'
 import { onUserInfo } from '@/actions/user'
 import { useQuery } from '@tanstack/react-query'
+import { createLogger } from '@/lib/logger'
+
+const useQueryAutomationsLog = createLogger('useQueryAutomations')
+const useQueryAutomationLog = createLogger('useQueryAutomation')
+const useQueryUserLog = createLogger('useQueryUser')
+const useQueryAutomationPostsLog = createLogger('useQueryAutomationPosts')
 
 // ✅ FIXED: Proper caching with real-time updates
 export const useQueryAutomations = () => {
   return useQuery({
     queryKey: ['user-automations'],
     queryFn: async () => {
-      console.log('🔍 [useQueryAutomations] Calling getAllAutomations...')
+      useQueryAutomationsLog.debug('Calling getAllAutomations')
       try {
         const result = await getAllAutomations()
-        console.log('🔍 [useQueryAutomations] Result received:', {
+        useQueryAutomationsLog.debug('Result received', () => ({
           status: result?.status,
           dataLength: result?.data?.length,
           hasResult: !!result,
@@ -28,20 +34,20 @@ export const useQueryAutomations = () => {
             dmCount: result.data[0].listener?.dmCount,
             commentCount: result.data[0].listener?.commentCount,
           } : null,
-        })
+        }))
         
-        console.log('🔍 [useQueryAutomations] Full result object:', JSON.stringify(result, null, 2))
+        useQueryAutomationsLog.debug('Full result object', () => ({ result }))
         
         // ✅ Ensure we return the result properly
         if (!result) {
-          console.error('❌ [useQueryAutomations] No result returned')
+          useQueryAutomationsLog.error('No result returned')
           return { status: 500, data: [] }
         }
         
         // ✅ Validate the result structure
         if (result && typeof result === 'object' && 'status' in result && 'data' in result) {
           if (result.status === 200 && Array.isArray(result.data)) {
-            console.log('✅ [useQueryAutomations] Valid result structure, returning:', {
+            useQueryAutomationsLog.debug('Valid result structure, returning', () => ({
               status: result.status,
               dataLength: result.data.length,
               firstItem: result.data[0] ? { 
@@ -49,18 +55,18 @@ export const useQueryAutomations = () => {
                 name: result.data[0].name,
                 listener: result.data[0].listener,
               } : null,
-            })
+            }))
             // ✅ CRITICAL: Return the result as-is
             return result
           } else {
-            console.warn('⚠️ [useQueryAutomations] Unexpected status or data type:', {
+            useQueryAutomationsLog.warn('Unexpected status or data type', {
               status: result.status,
               dataType: Array.isArray(result.data) ? 'array' : typeof result.data,
               dataLength: Array.isArray(result.data) ? result.data.length : 'N/A',
             })
           }
         } else {
-          console.error('❌ [useQueryAutomations] Invalid result structure:', {
+          useQueryAutomationsLog.error('Invalid result structure', {
             hasResult: !!result,
             resultType: typeof result,
             resultKeys: result ? Object.keys(result) : [],
@@ -71,12 +77,7 @@ export const useQueryAutomations = () => {
         // ✅ Always return something
         return result || { status: 500, data: [] }
       } catch (error: any) {
-        console.error('❌ [useQueryAutomations] Error calling getAllAutomations:', error)
-        console.error('❌ [useQueryAutomations] Error details:', {
-          message: error?.message,
-          stack: error?.stack,
-          name: error?.name,
-        })
+        useQueryAutomationsLog.error('Error calling getAllAutomations', { error })
         return { status: 500, data: [], error: error?.message || 'Unknown error' }
       }
     },
@@ -96,16 +97,16 @@ export const useQueryAutomation = (id: string) => {
   return useQuery({
     queryKey: ['automation-info', id],
     queryFn: async () => {
-      console.log('🔍 [useQueryAutomation] Calling getAutomationInfo for id:', id)
+      useQueryAutomationLog.debug('Calling getAutomationInfo for id', { id })
       try {
         const result = await getAutomationInfo(id)
-        console.log('🔍 [useQueryAutomation] Result received:', {
+        useQueryAutomationLog.debug('Result received', () => ({
           status: result?.status,
           hasData: !!result?.data,
-        })
+        }))
         return result
       } catch (error) {
-        console.error('❌ [useQueryAutomation] Error:', error)
+        useQueryAutomationLog.error('Error', { error })
         throw error
       }
     },
@@ -123,14 +124,14 @@ export const useQueryUser = () => {
   return useQuery({
     queryKey: ['user-profile'],
     queryFn: async () => {
-      console.log('🔍 [useQueryUser] Calling onUserInfo...')
+      useQueryUserLog.debug('Calling onUserInfo')
       try {
         const result = await onUserInfo()
-        console.log('🔍 [useQueryUser] Result received:', {
+        useQueryUserLog.debug('Result received', () => ({
           status: result?.status,
           hasData: !!result?.data,
           hasIntegrations: !!result?.data?.integrations,
-        })
+        }))
         
         // ✅ Handle 404 as valid response
         if (result?.status === 404 || result?.status === 200) {
@@ -138,13 +139,13 @@ export const useQueryUser = () => {
         }
         
         if (result?.status && result.status >= 400) {
-          console.warn('⚠️ [useQueryUser] Error status:', result.status)
+          useQueryUserLog.warn('Error status', { status: result.status })
           return result
         }
         
         return result
       } catch (error: any) {
-        console.error('❌ [useQueryUser] Error:', error)
+        useQueryUserLog.error('Error', { error })
         return { status: 500, data: null, error: error?.message }
       }
     },
@@ -161,17 +162,17 @@ export const useQueryAutomationPosts = () => {
   return useQuery({
     queryKey: ['instagram-media'],
     queryFn: async () => {
-      console.log('🔍 [useQueryAutomationPosts] Calling getProfilePosts...')
+      useQueryAutomationPostsLog.debug('Calling getProfilePosts')
       try {
         const result = await getProfilePosts()
-        console.log('🔍 [useQueryAutomationPosts] Result received:', {
+        useQueryAutomationPostsLog.debug('Result received', () => ({
           status: result?.status,
           hasData: !!result?.data,
           dataLength: result?.data?.data?.length || 0,
-        })
+        }))
         return result
       } catch (error) {
-        console.error('❌ [useQueryAutomationPosts] Error:', error)
+        useQueryAutomationPostsLog.error('Error', { error })
         throw error
       }
     },
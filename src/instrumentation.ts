@@ -0,0 +1,11 @@
+// Runs once when a server instance starts (Next.js instrumentation hook).
+// Starts the queue worker pools right away, so jobs left PENDING by a deploy
+// or restart are picked up without waiting for the next webhook delivery.
+export async function register() {
+  if (process.env.NEXT_RUNTIME !== 'nodejs') return
+
+  const { startWebhookWorkers } = await import('@/actions/webhook/worker')
+  const { startOutboundWorkers } = await import('@/actions/outbound/worker')
+  startWebhookWorkers()
+  startOutboundWorkers()
+}
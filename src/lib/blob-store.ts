@@ -0,0 +1,209 @@
+import { createHash, randomBytes } from 'crypto'
+import { promises as fs } from 'fs'
+import path from 'path'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('blob-store')
+
+// Content-addressed storage: a blob's key is the SHA-256 of its bytes, so the
+// same image uploaded by many automations is stored once and never changes.
+
+export interface BlobBackend {
+  readonly name: string
+  has(hash: string): Promise<boolean>
+  get(hash: string): Promise<Buffer | null>
+  put(hash: string, data: Buffer): Promise<void>
+  delete(hash: string): Promise<void>
+}
+
+const HASH_PATTERN = /^[0-9a-f]{64}$/
+
+export const isBlobHash = (value: unknown): value is string =>
+  typeof value === 'string' && HASH_PATTERN.test(value)
+
+export const hashBlob = (data: Buffer) => createHash('sha256').update(data).digest('hex')
+
+// -----------------------------
+// Filesystem backend
+// -----------------------------
+
+// Blobs live under BLOB_STORE_DIR/ab/cd/<hash>. Writes go to a temp file that is
+// renamed into place, so readers never see a partial blob.
+export class FileSystemBlobBackend implements BlobBackend {
+  readonly name = 'fs'
+
+  constructor(private root: string) {}
+
+  private pathFor(hash: string) {
+    return path.join(this.root, hash.slice(0, 2), hash.slice(2, 4), hash)
+  }
+
+  async has(hash: string) {
+    try {
+      await fs.access(this.pathFor(hash))
+      return true
+    } catch {
+      return false
+    }
+  }
+
+  async get(hash: string) {
+    try {
+      return await fs.readFile(this.pathFor(hash))
+    } catch (error: any) {
+      if (error?.code === 'ENOENT') return null
+      throw error
+    }
+  }
+
+  async put(hash: string, data: Buffer) {
+    const target = this.pathFor(hash)
+    await fs.mkdir(path.dirname(target), { recursive: true })
+    const temp = `${target}.${randomBytes(6).toString('hex')}.tmp`
+    await fs.writeFile(temp, data)
+    await fs.rename(temp, target)
+  }
+
+  async delete(hash: string) {
+    await fs.rm(this.pathFor(hash), { force: true })
+  }
+}
+
+// -----------------------------
+// Object-store backend
+// -----------------------------
+
+// The handful of calls the object-store backend needs. An S3/R2/GCS client is
+// adapted to this and passed to registerObjectStoreClient.
+export interface ObjectStoreClient {
+  headObject(key: string): Promise<boolean>
+  getObject(key: string): Promise<Buffer | null>
+  putObject(key: string, data: Buffer): Promise<void>
+  deleteObject(key: string): Promise<void>
+}
+
+export class ObjectStoreBlobBackend implements BlobBackend {
+  readonly name = 'object'
+
+  constructor(
+    private objects: ObjectStoreClient,
+    private prefix: string = 'blobs/'
+  ) {}
+
+  has(hash: string) {
+    return this.objects.headObject(this.prefix + hash)
+  }
+
+  get(hash: string) {
+    return this.objects.getObject(this.prefix + hash)
+  }
+
+  put(hash: string, data: Buffer) {
+    return this.objects.putObject(this.prefix + hash, data)
+  }
+
+  delete(hash: string) {
+    return this.objects.deleteObject(this.prefix + hash)
+  }
+}
+
+// Local stand-in for a bucket: one file per object key under a directory.
+// Used when BLOB_STORE=object and no real client has been registered.
+export class LocalObjectStore implements ObjectStoreClient {
+  constructor(private root: string) {}
+
+  private pathFor(key: string) {
+    return path.join(this.root, ...key.split('/').filter((part) => part && part !== '..'))
+  }
+
+  async headObject(key: string) {
+    try {
+      await fs.access(this.pathFor(key))
+      return true
+    } catch {
+      return false
+    }
+  }
+
+  async getObject(key: string) {
+    try {
+      return await fs.readFile(this.pathFor(key))
+    } catch (error: any) {
+      if (error?.code === 'ENOENT') return null
+      throw error
+    }
+  }
+
+  async putObject(key: string, data: Buffer) {
+    const target = this.pathFor(key)
+    await fs.mkdir(path.dirname(target), { recursive: true })
+    const temp = `${target}.${randomBytes(6).toString('hex')}.tmp`
+    await fs.writeFile(temp, data)
+    await fs.rename(temp, target)
+  }
+
+  async deleteObject(key: string) {
+    await fs.rm(this.pathFor(key), { force: true })
+  }
+}
+
+// -----------------------------
+// Store
+// -----------------------------
+
+// BLOB_STORE selects the backend: "fs" (default) or "object"
+const BLOB_STORE = process.env.BLOB_STORE || 'fs'
+const BLOB_STORE_DIR = process.env.BLOB_STORE_DIR || path.join(process.cwd(), '.blob-store')
+
+declare global {
+  var blobBackend: BlobBackend | undefined
+}
+
+// Plug in a real object store (call before the first blob is read or written)
+export const registerObjectStoreClient = (objects: ObjectStoreClient, prefix?: string) => {
+  globalThis.blobBackend = new ObjectStoreBlobBackend(objects, prefix)
+}
+
+const getBackend = () => {
+  if (!globalThis.blobBackend) {
+    globalThis.blobBackend =
+      BLOB_STORE === 'object'
+        ? new ObjectStoreBlobBackend(new LocalObjectStore(path.join(BLOB_STORE_DIR, 'objects')))
+        : new FileSystemBlobBackend(BLOB_STORE_DIR)
+    log.info('Using backend', { backend: globalThis.blobBackend.name, dir: BLOB_STORE_DIR })
+  }
+  return globalThis.blobBackend
+}
+
+// Store bytes and return their hash. Bytes that are already stored aren't written again.
+export const putBlob = async (data: Buffer) => {
+  const hash = hashBlob(data)
+  const backend = getBackend()
+  if (!(await backend.has(hash))) {
+    await backend.put(hash, data)
+    log.debug('Stored blob', { hash, bytes: data.length })
+  }
+  return hash
+}
+
+export const getBlob = async (hash: string) => {
+  if (!isBlobHash(hash)) return null
+  return getBackend().get(hash)
+}
+
+export const deleteBlob = async (hash: string) => {
+  if (isBlobHash(hash)) await getBackend().delete(hash)
+}
+
+// -----------------------------
+// Data URLs
+// -----------------------------
+
+// Split a base64 image data URL (what dm-panel uploads) into content type and bytes
+export const decodeImageDataUrl = (dataUrl: string) => {
+  const match = dataUrl.match(/^data:(image\/[a-z0-9.+-]+);base64,(.+)$/i)
+  if (!match) return null
+  const data = Buffer.from(match[2], 'base64')
+  if (data.length === 0) return null
+  return { contentType: match[1].toLowerCase(), data }
+}
@@ -0,0 +1,79 @@
+// Bloom filter over strings: `has` never misses an added item and is wrong about
+// an item that was never added with roughly the configured probability.
+export class BloomFilter {
+  private bits: Uint32Array
+  private bitCount: number
+  private hashCount: number
+  private added = 0
+
+  constructor(
+    private capacity: number,
+    private targetFalsePositiveRate: number = 0.01
+  ) {
+    const n = Math.max(1, capacity)
+    // Optimal sizing: m = -n ln p / (ln 2)^2, k = (m / n) ln 2
+    this.bitCount = Math.max(64, Math.ceil((-n * Math.log(targetFalsePositiveRate)) / Math.LN2 ** 2))
+    this.hashCount = Math.max(1, Math.round((this.bitCount / n) * Math.LN2))
+    this.bits = new Uint32Array(Math.ceil(this.bitCount / 32))
+  }
+
+  // Two 32-bit FNV-1a variants combined by double hashing (h1 + i * h2)
+  private hashes(value: string) {
+    let h1 = 2166136261
+    let h2 = 374761393
+    for (let i = 0; i < value.length; i++) {
+      const c = value.charCodeAt(i)
+      h1 = Math.imul(h1 ^ c, 16777619)
+      h2 = Math.imul(h2 ^ c, 2246822519)
+    }
+    return [h1 >>> 0, (h2 | 1) >>> 0]
+  }
+
+  add(value: string) {
+    const [h1, h2] = this.hashes(value)
+    for (let i = 0; i < this.hashCount; i++) {
+      const bit = (h1 + i * h2) % this.bitCount
+      this.bits[bit >>> 5] |= 1 << (bit & 31)
+    }
+    this.added++
+  }
+
+  has(value: string) {
+    const [h1, h2] = this.hashes(value)
+    for (let i = 0; i < this.hashCount; i++) {
+      const bit = (h1 + i * h2) % this.bitCount
+      if ((this.bits[bit >>> 5] & (1 << (bit & 31))) === 0) return false
+    }
+    return true
+  }
+
+  // False-positive rate expected at the current fill: (1 - e^(-kn/m))^k
+  get estimatedFalsePositiveRate() {
+    return (1 - Math.exp((-this.hashCount * this.added) / this.bitCount)) ** this.hashCount
+  }
+
+  get size() {
+    return this.added
+  }
+
+  get sizeBytes() {
+    return this.bits.byteLength
+  }
+
+  // Filled past the size it was built for (the false-positive rate climbs from here)
+  get saturated() {
+    return this.added > this.capacity
+  }
+
+  get stats() {
+    return {
+      items: this.added,
+      capacity: this.capacity,
+      bits: this.bitCount,
+      hashes: this.hashCount,
+      bytes: this.sizeBytes,
+      targetFalsePositiveRate: this.targetFalsePositiveRate,
+      estimatedFalsePositiveRate: this.estimatedFalsePositiveRate,
+    }
+  }
+}
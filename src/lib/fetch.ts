@@ -1,7 +1,26 @@
-import axios from 'axios'
-
-const GRAPH_API_VERSION = 'v24.0'
-const GRAPH_BASE_URL = `https://graph.facebook.com/${GRAPH_API_VERSION}`
+import { graph, GRAPH_BASE_URL, GraphBatchRequest, isTransientError, sendGraphBatch } from './graph'
+import { scheduleSend } from './send-scheduler'
+import { createLogger } from './logger'
+
+const generateTokensLog = createLogger('generateTokens')
+const refreshTokenLog = createLogger('refreshToken')
+const getPageAccessTokenLog = createLogger('getPageAccessToken')
+const sendDMLog = createLogger('sendDM')
+const sendDMWithImageLog = createLogger('sendDMWithImage')
+const sendPrivateReplyToCommentLog = createLogger('sendPrivateReplyToComment')
+const sendPublicReplyToCommentLog = createLogger('sendPublicReplyToComment')
+const getCommentDetailsLog = createLogger('getCommentDetails')
+
+// A DM link. `text` is the follow-up message already rendered for it (see the
+// automation reply plan); without it the message is rendered on send.
+export type DmLink = { title: string; url: string; text?: string }
+
+// Follow-up message for one link - the URL alone, so Instagram shows a preview card
+export const renderLinkMessage = (link: DmLink) => link.text ?? link.url
+
+// Links appended to a DM's text as "title\nurl" blocks
+export const renderLinksText = (links: readonly DmLink[]) =>
+  links.map((link) => `${link.title}\n${link.url}`).join('\n\n')
 
 // -----------------------------
 // GENERATE TOKENS (Exchange authorization code for access token)
@@ -21,21 +40,21 @@ export const generateTokens = async (code: string) => {
       if (!redirectUri) missing.push('INSTAGRAM_REDIRECT_URI or META_REDIRECT_URI')
       
       const errorMsg = `Missing required environment variables: ${missing.join(', ')}`
-      console.error('❌ [generateTokens]', errorMsg)
+      generateTokensLog.error(errorMsg)
       throw new Error(errorMsg)
     }
 
     // ✅ Validate code parameter
     if (!code || code.trim().length === 0) {
       const errorMsg = 'Authorization code is missing or empty'
-      console.error('❌ [generateTokens]', errorMsg)
+      generateTokensLog.error(errorMsg)
       throw new Error(errorMsg)
     }
 
     // ✅ Clean the code (remove any fragments or extra data)
     const cleanCode = code.split('#')[0].split('?')[0].trim()
     
-    console.log('✅ [generateTokens] Environment variables check:', {
+    generateTokensLog.debug('Environment variables check', () => ({
       hasClientId: !!clientId,
       clientIdLength: clientId?.length || 0,
       clientIdPreview: clientId ? `${clientId.substring(0, 10)}...` : 'MISSING',
@@ -44,7 +63,7 @@ export const generateTokens = async (code: string) => {
       hasRedirectUri: !!redirectUri,
       redirectUri: redirectUri,
       codeLength: cleanCode.length,
-    })
+    }))
 
     // ✅ OLD WORKING VERSION: Use Instagram OAuth endpoint with POST and form data
     const body = new URLSearchParams({
@@ -55,15 +74,15 @@ export const generateTokens = async (code: string) => {
       code: cleanCode,
     })
 
-    console.log('✅ [generateTokens] Making OAuth request to Instagram API:', {
+    generateTokensLog.debug('Making OAuth request to Instagram API', () => ({
       url: 'https://api.instagram.com/oauth/access_token',
       hasClientId: !!clientId,
       hasClientSecret: !!clientSecret,
       redirectUri: redirectUri,
       codeLength: cleanCode.length,
-    })
+    }))
 
-    const response = await axios.post(
+    const response = await graph.post(
       'https://api.instagram.com/oauth/access_token',   // ✅ OLD WORKING ENDPOINT
       body.toString(),                                   // ✅ Form data as string
       {
@@ -73,7 +92,7 @@ export const generateTokens = async (code: string) => {
       }
     )
 
-    console.log('✅ [generateTokens] Token exchange successful:', {
+    generateTokensLog.info('Token exchange successful', {
       hasAccessToken: !!response.data?.access_token,
       hasExpiresIn: !!response.data?.expires_in,
       tokenType: response.data?.token_type,
@@ -92,7 +111,7 @@ export const generateTokens = async (code: string) => {
     const errorMessage = errorData?.error?.message || errorData?.error_message || error.message
     const errorCode = errorData?.error?.code || errorData?.error_code
     
-    console.error('❌ [generateTokens] Token Error:', {
+    generateTokensLog.error('Token Error', {
       message: errorMessage,
       code: errorCode,
       fullError: errorData || error.message,
@@ -113,11 +132,11 @@ export const refreshToken = async (longLivedToken: string) => {
     
     // ✅ Validate URL format
     if (!instagramBaseUrl.startsWith('http://') && !instagramBaseUrl.startsWith('https://')) {
-      console.error('❌ [refreshToken] Invalid INSTAGRAM_BASE_URL format:', instagramBaseUrl)
+      refreshTokenLog.error('Invalid INSTAGRAM_BASE_URL format', { instagramBaseUrl })
       return null
     }
     
-    const response = await axios.get(
+    const response = await graph.get(
       `${instagramBaseUrl}/refresh_access_token`,
       {
         params: {
@@ -129,7 +148,7 @@ export const refreshToken = async (longLivedToken: string) => {
 
     // ✅ Validate response exists
     if (!response || !response.data) {
-      console.error('❌ [refreshToken] Invalid response from Instagram API')
+      refreshTokenLog.error('Invalid response from Instagram API')
       return null
     }
 
@@ -137,7 +156,7 @@ export const refreshToken = async (longLivedToken: string) => {
     return response.data
   } catch (error: any) {
     const errorDetails = error.response?.data || error.message
-    console.error('❌ [refreshToken] Error refreshing IG token:', {
+    refreshTokenLog.error('Error refreshing IG token', {
       error: errorDetails,
       status: error.response?.status,
       errorCode: errorDetails?.error?.code,
@@ -152,10 +171,10 @@ export const refreshToken = async (longLivedToken: string) => {
 // -----------------------------
 export const getPageAccessToken = async (userToken: string, pageId: string) => {
   try {
-    console.log('🔄 [getPageAccessToken] Attempting to get page token from user token...')
+    getPageAccessTokenLog.debug('Attempting to get page token from user token')
     
     // First, get user's pages
-    const pagesResponse = await axios.get(
+    const pagesResponse = await graph.get(
       `${GRAPH_BASE_URL}/me/accounts`,
       {
         params: {
@@ -166,20 +185,20 @@ export const getPageAccessToken = async (userToken: string, pageId: string) => {
     )
 
     const pages = pagesResponse.data?.data || []
-    console.log('📄 [getPageAccessToken] Found pages:', pages.length)
+    getPageAccessTokenLog.debug('Found pages', { count: pages.length })
     
     // Find the page that matches our page ID
     const targetPage = pages.find((page: any) => page.id === pageId)
     
     if (targetPage?.access_token) {
-      console.log('✅ [getPageAccessToken] Found page token for page:', targetPage.name)
+      getPageAccessTokenLog.info('Found page token for page', { pageName: targetPage.name })
       return targetPage.access_token
     }
     
-    console.warn('⚠️ [getPageAccessToken] Page not found or no access token')
+    getPageAccessTokenLog.warn('Page not found or no access token')
     return null
   } catch (error: any) {
-    console.error('❌ [getPageAccessToken] Error:', error.response?.data || error.message)
+    getPageAccessTokenLog.error('Error', { error: error.response?.data || error.message })
     return null
   }
 }
@@ -189,28 +208,30 @@ export const getPageAccessToken = async (userToken: string, pageId: string) => {
 // -----------------------------
 export const sendDM = async (
   pageId: string, recipientId: string, message: string, token: string) => {
-  console.log('🔵 [sendDM] Sending DM to:', recipientId);
+  sendDMLog.debug('Sending DM to', { recipientId });
 
   try {
-    const response = await axios.post(
-      `${GRAPH_BASE_URL}/${pageId}/messages`,
-      {
-        recipient: { id: recipientId },
-        message: { text: message },
-      },
-      {
-        headers: {
-          Authorization: `Bearer ${token}`, // ✅ Use user's token
-          'Content-Type': 'application/json',
+    const response = await scheduleSend(pageId, () =>
+      graph.post(
+        `${GRAPH_BASE_URL}/${pageId}/messages`,
+        {
+          recipient: { id: recipientId },
+          message: { text: message },
         },
-      }
+        {
+          headers: {
+            Authorization: `Bearer ${token}`, // ✅ Use user's token
+            'Content-Type': 'application/json',
+          },
+        }
+      )
     );
 
-    console.log('✅ [sendDM] DM sent successfully');
+    sendDMLog.info('DM sent successfully');
     return response;
 
   } catch (error: any) {
-    console.error('❌ [sendDM] Error:', error.response?.data || error.message);
+    sendDMLog.error('Error', { error: error.response?.data || error.message });
     throw error;
   }
 };
@@ -224,16 +245,16 @@ export const sendDMWithImage = async (
   message: string,
   token: string,
   imageUrl?: string | null,
-  links?: Array<{ title: string; url: string }>
+  links?: readonly DmLink[]
 ) => {
-  console.log('🔵 [sendDMWithImage] Starting:', {
+  sendDMWithImageLog.debug('Starting', () => ({
     recipientId,
     messageLength: message.length,
     hasImage: !!imageUrl,
     imageUrl: imageUrl ? imageUrl.substring(0, 80) + '...' : 'none',
     linksCount: links?.length || 0,
     links: links?.map(l => l.title) || [],
-  })
+  }))
 
   try {
     // Build complete message text (original message + formatted links)
@@ -241,9 +262,7 @@ export const sendDMWithImage = async (
     
     // Add links to the message text if they exist
     if (links && links.length > 0) {
-      const linksText = links
-        .map(link => `${link.title}\n${link.url}`)
-        .join('\n\n')
+      const linksText = renderLinksText(links)
       
       if (completeMessage) {
         completeMessage = `${completeMessage}\n\n${linksText}`
@@ -255,58 +274,62 @@ export const sendDMWithImage = async (
     // ✅ ZORCHA-STYLE: Send TWO separate messages
     // Step 1: Send image (if exists)
     if (imageUrl && (imageUrl.startsWith('http://') || imageUrl.startsWith('https://'))) {
-      console.log('📷 [sendDMWithImage] Step 1: Sending image message...')
+      sendDMWithImageLog.debug('Step 1: Sending image message')
       try {
-        await axios.post(
-          `${GRAPH_BASE_URL}/${pageId}/messages`,
-          {
-            recipient: { id: recipientId },
-            message: {
-              attachment: {
-                type: 'image',
-                payload: {
-                  url: imageUrl,
-                  is_reusable: false,
+        await scheduleSend(pageId, () =>
+          graph.post(
+            `${GRAPH_BASE_URL}/${pageId}/messages`,
+            {
+              recipient: { id: recipientId },
+              message: {
+                attachment: {
+                  type: 'image',
+                  payload: {
+                    url: imageUrl,
+                    is_reusable: false,
+                  },
                 },
               },
             },
-          },
-          {
-            headers: {
-              Authorization: `Bearer ${token}`,
-              'Content-Type': 'application/json',
-            },
-          }
+            {
+              headers: {
+                Authorization: `Bearer ${token}`,
+                'Content-Type': 'application/json',
+              },
+            }
+          )
         )
-        console.log('✅ [sendDMWithImage] Step 1 SUCCESS: Image sent')
+        sendDMWithImageLog.info('Step 1 SUCCESS: Image sent')
       } catch (imageError: any) {
-        console.error('❌ [sendDMWithImage] Step 1 FAILED:', imageError.response?.data || imageError.message)
+        sendDMWithImageLog.error('Step 1 FAILED', { error: imageError.response?.data || imageError.message })
       }
     }
     
     // Step 2: Send text with links
     if (completeMessage) {
-      console.log('💬 [sendDMWithImage] Step 2: Sending text message...')
-      const textResponse = await axios.post(
-        `${GRAPH_BASE_URL}/${pageId}/messages`,
-        {
-          recipient: { id: recipientId },
-          message: { text: completeMessage },
-        },
-        {
-          headers: {
-            Authorization: `Bearer ${token}`,
-            'Content-Type': 'application/json',
+      sendDMWithImageLog.debug('Step 2: Sending text message')
+      const textResponse = await scheduleSend(pageId, () =>
+        graph.post(
+          `${GRAPH_BASE_URL}/${pageId}/messages`,
+          {
+            recipient: { id: recipientId },
+            message: { text: completeMessage },
           },
-        }
+          {
+            headers: {
+              Authorization: `Bearer ${token}`,
+              'Content-Type': 'application/json',
+            },
+          }
+        )
       )
-      console.log('✅ [sendDMWithImage] Step 2 SUCCESS: Text sent')
+      sendDMWithImageLog.info('Step 2 SUCCESS: Text sent')
       return textResponse
     }
     
     return { status: 200, data: 'Messages sent' }
   } catch (error: any) {
-    console.error('❌ [sendDMWithImage] Error:', error.response?.data || error.message)
+    sendDMWithImageLog.error('Error', { error: error.response?.data || error.message })
     throw error
   }
 }
@@ -321,10 +344,10 @@ export const sendPrivateReplyToComment = async (
   message: string, 
   token: string,
   imageUrl?: string | null,
-  links?: Array<{ title: string; url: string }>,
+  links?: readonly DmLink[],
   recipientId?: string // Instagram scoped ID for direct DM (Step 2)
 ) => {
-  console.log('🔵 [sendPrivateReplyToComment] Starting:', {
+  sendPrivateReplyToCommentLog.debug('Starting', () => ({
     commentId,
     messageLength: message.length,
     hasImage: !!imageUrl,
@@ -333,25 +356,36 @@ export const sendPrivateReplyToComment = async (
     links: links?.map(l => l.title) || [],
     hasRecipientId: !!recipientId,
     recipientId: recipientId || '❌ NOT PROVIDED (Step 2 & 3 will be skipped)',
-  })
+  }))
 
   try {
     let imageSent = false
     let textSent = false
     let linksSent = 0
+    // Set when Graph rejects the token (190/463) so the caller can refresh and retry
+    let tokenExpired = false
+    // Set when a send failed on a timeout / 5xx / throttle, so the caller can queue a retry
+    let transient = false
+    // Follow-up DMs (text / link messages to recipientId) that failed transiently
+    // after the image went out - the caller queues just these for a retry
+    const unsent: string[] = []
     
     // ✅ STEP 1: ALWAYS send image first (as private reply to comment)
     if (imageUrl && (imageUrl.startsWith('http://') || imageUrl.startsWith('https://'))) {
       if (imageUrl.startsWith('http://')) {
-        console.warn('⚠️ [sendPrivateReplyToComment] Image URL uses HTTP instead of HTTPS. Instagram may reject this.')
+        sendPrivateReplyToCommentLog.warn('Image URL uses HTTP instead of HTTPS. Instagram may reject this')
       }
       
-      console.log('📷 [sendPrivateReplyToComment] Step 1: Sending image first...')
-      
-      try {
-        const imageResponse = await axios.post(
-          `${GRAPH_BASE_URL}/${pageId}/messages`,
-          {
+      // ✅ Image (private reply to the comment), then text, then each link as a
+      // follow-up direct DM - all in ONE Graph batch request. The follow-ups depend
+      // on the image only: Meta skips them if the image fails, but the text and
+      // each link succeed or fail on their own (reported per item in the summary).
+      const requests: GraphBatchRequest[] = [
+        {
+          name: 'image',
+          method: 'POST',
+          relative_url: `${pageId}/messages`,
+          body: {
             recipient: { comment_id: commentId },
             message: {
               attachment: {
@@ -363,82 +397,78 @@ export const sendPrivateReplyToComment = async (
               },
             },
           },
-          {
-            headers: {
-              Authorization: `Bearer ${token}`,
-              'Content-Type': 'application/json',
-            },
+        },
+      ]
+
+      if (message || (links && links.length > 0)) {
+        if (recipientId) {
+          if (message) {
+            requests.push({
+              name: 'text',
+              method: 'POST',
+              relative_url: `${pageId}/messages`,
+              depends_on: 'image',
+              body: {
+                recipient: { id: recipientId },
+                message: { text: message },
+              },
+            })
           }
-        )
-        
-        console.log('✅ [sendPrivateReplyToComment] Step 1 SUCCESS: Image sent as private reply', {
-          status: imageResponse.status,
-        })
+
+          links?.forEach((link, index) => {
+            requests.push({
+              name: `link${index}`,
+              method: 'POST',
+              relative_url: `${pageId}/messages`,
+              depends_on: 'image',
+              body: {
+                recipient: { id: recipientId },
+                message: { text: renderLinkMessage(link) },
+              },
+            })
+          })
+        } else {
+          sendPrivateReplyToCommentLog.warn('recipientId missing - cannot send text/links as direct DM after image')
+        }
+      }
+
+      sendPrivateReplyToCommentLog.debug(`Sending image + ${requests.length - 1} follow-up message(s) in one batch`)
+
+      try {
+        const results = await scheduleSend(pageId, () => sendGraphBatch(token, requests), requests.length)
+
+        if (!results[0].ok) {
+          // Shape it like an axios error so the fallback below handles both cases
+          throw { response: { status: results[0].code, data: results[0].body } }
+        }
+
+        sendPrivateReplyToCommentLog.info('Step 1 SUCCESS: Image sent as private reply')
         imageSent = true
-        
-        // ✅ STEP 2: Now try to send text + links as a follow-up direct DM
-        if (message || (links && links.length > 0)) {
-          if (recipientId) {
-            console.log('💬 [sendPrivateReplyToComment] Step 2: Attempting to send text + links as follow-up direct DM...')
-            
-            if (message) {
-              try {
-                await axios.post(
-                  `${GRAPH_BASE_URL}/${pageId}/messages`,
-                  {
-                    recipient: { id: recipientId },
-                    message: { text: message },
-                  },
-                  {
-                    headers: {
-                      Authorization: `Bearer ${token}`,
-                      'Content-Type': 'application/json',
-                    },
-                  }
-                )
-                console.log('✅ [sendPrivateReplyToComment] Text sent separately')
-                textSent = true
-              } catch (e: any) {
-                console.error('❌ [sendPrivateReplyToComment] Failed to send text:', e.response?.data || e.message)
-              }
-            }
-            
-            // ✅ STEP 3: Send links separately (if buttons didn't work or we want link previews)
-            if (links && links.length > 0) {
-              console.log('🔗 [sendPrivateReplyToComment] Step 3: Sending link URLs separately for preview cards...')
-              
-              for (const link of links) {
-                try {
-                  await axios.post(
-                    `${GRAPH_BASE_URL}/${pageId}/messages`,
-                    {
-                      recipient: { id: recipientId },
-                      message: { text: link.url }, // URL alone triggers preview card
-                    },
-                    {
-                      headers: {
-                        Authorization: `Bearer ${token}`,
-                        'Content-Type': 'application/json',
-                      },
-                    }
-                  )
-                  console.log('✅ [sendPrivateReplyToComment] Link URL sent:', link.url)
-                  linksSent++
-                  await new Promise(resolve => setTimeout(resolve, 500))
-                } catch (e: any) {
-                  console.error('❌ [sendPrivateReplyToComment] Failed to send link:', e.response?.data || e.message)
-                }
-              }
-            }
-          } else {
-            console.warn('⚠️ [sendPrivateReplyToComment] recipientId missing - cannot send text/links as direct DM after image')
+
+        requests.forEach((request, index) => {
+          if (index === 0) return
+          const result = results[index]
+          if (result.ok) {
+            if (request.name === 'text') textSent = true
+            else linksSent++
+            return
           }
-        }
+
+          // Still throttled (the inline retry was skipped or failed too), 5xx, ...
+          const itemTransient = isTransientError({ response: { status: result.code, data: result.body } })
+          if (itemTransient) unsent.push(request.body!.message.text)
+          sendPrivateReplyToCommentLog.error(`Failed to send ${request.name}`, {
+            error: result.body?.error || 'skipped',
+            willRetry: itemTransient,
+          })
+        })
       } catch (imageError: any) {
         const errorDetails = imageError.response?.data || imageError.message
         const isTokenExpired = errorDetails?.error?.code === 190 || errorDetails?.error?.code === 463
+        if (isTokenExpired) tokenExpired = true
+        if (isTransientError(imageError)) transient = true
         
-        console.error('❌ [sendPrivateReplyToComment] Step 1 FAILED: Image message failed:', {
+        sendPrivateReplyToCommentLog.error('Step 1 FAILED: Image message failed', {
           error: errorDetails,
           status: imageError.response?.status,
           errorCode: errorDetails?.error?.code,
@@ -447,65 +477,75 @@ export const sendPrivateReplyToComment = async (
         })
         
         if (isTokenExpired) {
-          console.error('❌❌❌ [sendPrivateReplyToComment] TOKEN EXPIRED!')
-          console.error('❌❌❌ ACTION REQUIRED: Your META_PAGE_ACCESS_TOKEN has expired!')
-          console.error('❌❌❌ Get a new token from: https://developers.facebook.com/tools/explorer/')
-          console.error('❌❌❌ Or reconnect your Instagram integration in the app')
+          sendPrivateReplyToCommentLog.error('TOKEN EXPIRED', {
+            action: 'Your META_PAGE_ACCESS_TOKEN has expired - get a new token from https://developers.facebook.com/tools/explorer/ or reconnect your Instagram integration in the app',
+          })
         }
         
-        // ✅ FALLBACK: If image fails, try to send text as comment reply
-        if (message) {
-          console.log('🔄 [sendPrivateReplyToComment] Fallback: Attempting to send text as comment reply since image failed...')
+        // ✅ FALLBACK: If image fails, try to send text as comment reply.
+        // Not for transient failures - the caller retries the whole reply later,
+        // and a fallback text now would be sent a second time then.
+        if (message && !transient) {
+          sendPrivateReplyToCommentLog.debug('Fallback: Attempting to send text as comment reply since image failed')
           try {
-            const textResponse = await axios.post(
-              `${GRAPH_BASE_URL}/${pageId}/messages`,
-              {
-                recipient: { comment_id: commentId },
-                message: { text: message },
-              },
-              {
-                headers: {
-                  Authorization: `Bearer ${token}`,
-                  'Content-Type': 'application/json',
+            const textResponse = await scheduleSend(pageId, () =>
+              graph.post(
+                `${GRAPH_BASE_URL}/${pageId}/messages`,
+                {
+                  recipient: { comment_id: commentId },
+                  message: { text: message },
                 },
-              }
+                {
+                  headers: {
+                    Authorization: `Bearer ${token}`,
+                    'Content-Type': 'application/json',
+                  },
+                }
+              )
             )
-            console.log('✅ [sendPrivateReplyToComment] Fallback SUCCESS: Text sent as comment reply')
+            sendPrivateReplyToCommentLog.info('Fallback SUCCESS: Text sent as comment reply')
             textSent = true
           } catch (fallbackError: any) {
-            console.error('❌ [sendPrivateReplyToComment] Fallback also failed:', fallbackError.response?.data || fallbackError.message)
+            const fallbackCode = fallbackError.response?.data?.error?.code
+            if (fallbackCode === 190 || fallbackCode === 463) tokenExpired = true
+            if (isTransientError(fallbackError)) transient = true
+            sendPrivateReplyToCommentLog.error('Fallback also failed', { error: fallbackError.response?.data || fallbackError.message })
           }
         }
       }
     } else if (!imageUrl && message) {
       // No image, just text
       try {
-        const textMessageResponse = await axios.post(
-          `${GRAPH_BASE_URL}/${pageId}/messages`,
-          {
-            recipient: recipientId 
-              ? { id: recipientId }
-              : { comment_id: commentId },
-            message: {
-              text: message,
-            },
-          },
-          {
-            headers: {
-              Authorization: `Bearer ${token}`,
-              'Content-Type': 'application/json',
+        const textMessageResponse = await scheduleSend(pageId, () =>
+          graph.post(
+            `${GRAPH_BASE_URL}/${pageId}/messages`,
+            {
+              recipient: recipientId 
+                ? { id: recipientId }
+                : { comment_id: commentId },
+              message: {
+                text: message,
+              },
             },
-          }
+            {
+              headers: {
+                Authorization: `Bearer ${token}`,
+                'Content-Type': 'application/json',
+              },
+            }
+          )
         )
         
-        console.log('✅ [sendPrivateReplyToComment] SUCCESS: Text message sent!', {
+        sendPrivateReplyToCommentLog.info('SUCCESS: Text message sent', {
           status: textMessageResponse.status,
           responseData: textMessageResponse.data,
         })
         textSent = true
       } catch (textError: any) {
         const errorDetails = textError.response?.data || textError.message
-        console.error('❌ [sendPrivateReplyToComment] Text message failed:', {
+        if (errorDetails?.error?.code === 190 || errorDetails?.error?.code === 463) tokenExpired = true
+        if (isTransientError(textError)) transient = true
+        sendPrivateReplyToCommentLog.error('Text message failed', {
           error: errorDetails?.error?.message || errorDetails,
           errorCode: errorDetails?.error?.code,
         })
@@ -513,14 +553,16 @@ export const sendPrivateReplyToComment = async (
     }
     
     // Return result
-    const summary = { imageSent, textSent, linksSent, totalLinks: links?.length || 0 }
-    console.log('📊 [sendPrivateReplyToComment] Final Summary:', summary)
+    const summary = { imageSent, textSent, linksSent, totalLinks: links?.length || 0, unsent: unsent.length }
+    sendPrivateReplyToCommentLog.debug('Final Summary', { summary })
     
     if (imageSent || textSent || linksSent > 0) {
       return { 
         status: 200, 
         success: true, 
-        data: 'Messages sent successfully',
+        data: unsent.length ? 'Messages partially sent' : 'Messages sent successfully',
+        // Follow-up DM texts to send to recipientId later (transient failures)
+        unsent,
         summary 
       }
     } else {
@@ -528,12 +570,14 @@ export const sendPrivateReplyToComment = async (
         status: 400, 
         success: false, 
         error: 'Failed to send any messages',
+        tokenExpired,
+        transient,
         summary 
       }
     }
   } catch (error: any) {
     const errorDetails = error.response?.data || error.message
-    console.error('❌❌❌ [sendPrivateReplyToComment] UNHANDLED ERROR:', {
+    sendPrivateReplyToCommentLog.error('UNHANDLED ERROR', {
       error: errorDetails,
       status: error.response?.status,
       errorCode: errorDetails?.error?.code,
@@ -541,13 +585,14 @@ export const sendPrivateReplyToComment = async (
       commentId,
       hasImage: !!imageUrl,
       linksCount: links?.length || 0,
-      fullError: JSON.stringify(errorDetails, null, 2),
       stack: error.stack,
     })
     return { 
       status: error.response?.status || 500, 
       success: false, 
       error: errorDetails,
+      tokenExpired: errorDetails?.error?.code === 190 || errorDetails?.error?.code === 463,
+      transient: isTransientError(error),
       message: 'Failed to send private reply'
     }
   }
@@ -556,30 +601,33 @@ export const sendPrivateReplyToComment = async (
 
 
 export const sendPublicReplyToComment = async (
+  pageId: string, // rate-limit bucket the reply is scheduled on
   commentId: string,
   message: string,
   token: string
 ) => {
-  console.log('🔵 [sendPublicReplyToComment] Sending PUBLIC reply to comment:', commentId)
+  sendPublicReplyToCommentLog.debug('Sending PUBLIC reply to comment', { commentId })
 
   try {
-    const response = await axios.post(
-      `${GRAPH_BASE_URL}/${commentId}/replies`,
-      { message },
-      {
-        headers: {
-          Authorization: `Bearer ${token}`, // ✅ Use user's token
-          'Content-Type': 'application/json'
+    const response = await scheduleSend(pageId, () =>
+      graph.post(
+        `${GRAPH_BASE_URL}/${commentId}/replies`,
+        { message },
+        {
+          headers: {
+            Authorization: `Bearer ${token}`, // ✅ Use user's token
+            'Content-Type': 'application/json'
+          }
         }
-      }
+      )
     )
 
-    console.log('✅ [sendPublicReplyToComment] Public reply sent successfully')
+    sendPublicReplyToCommentLog.info('Public reply sent successfully')
     return response
 
   } catch (error: any) {
     const errorDetails = error.response?.data || error.message
-    console.error('❌ [sendPublicReplyToComment] Error:', {
+    sendPublicReplyToCommentLog.error('Error', {
       error: errorDetails,
       status: error.response?.status,
       errorCode: errorDetails?.error?.code,
@@ -601,7 +649,7 @@ export const getCommentDetails = async (
   token: string
 ) => {
   try {
-    const response = await axios.get(
+    const response = await graph.get(
       `${GRAPH_BASE_URL}/${commentId}`,
       {
         params: {
@@ -615,7 +663,7 @@ export const getCommentDetails = async (
 
   } catch (error: any) {
     const errorDetails = error.response?.data || error.message
-    console.error('❌ [getCommentDetails] Error:', {
+    getCommentDetailsLog.error('Error', {
       error: errorDetails,
       status: error.response?.status,
       errorCode: errorDetails?.error?.code,
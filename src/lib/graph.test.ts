@@ -0,0 +1,99 @@
+import { afterEach, describe, expect, it, vi } from 'vitest'
+import {
+  buildRetryBatch,
+  getRetryIndexes,
+  graph,
+  parseBatchItem,
+  resolveOmittedResults,
+  sendGraphBatch,
+  type GraphBatchRequest,
+} from './graph'
+
+const ok = (body: any = { message_id: 'm' }) => ({ code: 200, headers: [], body: JSON.stringify(body) })
+const throttled = () => ({
+  code: 400,
+  headers: [],
+  body: JSON.stringify({ error: { code: 613, message: 'Calls to this api have exceeded the rate limit' } }),
+})
+
+const chain: GraphBatchRequest[] = [
+  { name: 'image', method: 'POST', relative_url: 'page/messages' },
+  { name: 'text', method: 'POST', relative_url: 'page/messages', depends_on: 'image' },
+  { name: 'link0', method: 'POST', relative_url: 'page/messages', depends_on: 'text' },
+]
+
+describe('parseBatchItem', () => {
+  it('parses the JSON body and flags throttling', () => {
+    const result = parseBatchItem(throttled())
+    expect(result.ok).toBe(false)
+    expect(result.throttled).toBe(true)
+    expect(result.body.error.code).toBe(613)
+  })
+
+  it('marks a null item as skipped', () => {
+    expect(parseBatchItem(null)).toMatchObject({ ok: false, code: null, skipped: true })
+  })
+})
+
+describe('resolveOmittedResults', () => {
+  it('treats an omitted parent response as success when its dependent ran', () => {
+    const results = resolveOmittedResults(chain, [null, ok(), ok()].map(parseBatchItem))
+    expect(results.map((r) => r.ok)).toEqual([true, true, true])
+  })
+
+  it('leaves a skipped item alone when nothing after it succeeded', () => {
+    const results = resolveOmittedResults(chain, [ok(), throttled(), null].map(parseBatchItem))
+    expect(results[2]).toMatchObject({ ok: false, skipped: true })
+  })
+})
+
+describe('getRetryIndexes / buildRetryBatch', () => {
+  it('retries throttled items and what was skipped because of them', () => {
+    const results = [ok(), throttled(), null].map(parseBatchItem)
+    const retryIndexes = getRetryIndexes(chain, results)
+    expect(retryIndexes).toEqual([1, 2])
+
+    // text no longer waits on the image (already sent); link0 still waits on text
+    const batch = buildRetryBatch(chain, retryIndexes)
+    expect(batch[0].depends_on).toBeUndefined()
+    expect(batch[1].depends_on).toBe('text')
+  })
+
+  it('does not retry items that failed for other reasons', () => {
+    const invalid = { code: 400, headers: [], body: JSON.stringify({ error: { code: 100 } }) }
+    const results = [ok(), invalid, null].map(parseBatchItem)
+    expect(getRetryIndexes(chain, results)).toEqual([])
+  })
+})
+
+// The batch is posted as a form-encoded `batch` field
+const sentBatch = (body: unknown) => JSON.parse(new URLSearchParams(body as string).get('batch')!)
+
+describe('sendGraphBatch', () => {
+  afterEach(() => {
+    vi.restoreAllMocks()
+    vi.useRealTimers()
+  })
+
+  it('asks Meta for named request responses and retries only throttled items', async () => {
+    vi.useFakeTimers()
+    const post = vi
+      .spyOn(graph, 'post')
+      .mockResolvedValueOnce({ data: [ok(), throttled(), null] } as any)
+      .mockResolvedValueOnce({ data: [ok(), ok()] } as any)
+
+    const pending = sendGraphBatch('token', chain)
+    await vi.runAllTimersAsync()
+    const results = await pending
+
+    expect(results.map((r) => r.ok)).toEqual([true, true, true])
+    expect(post).toHaveBeenCalledTimes(2)
+
+    const firstBatch = sentBatch(post.mock.calls[0][1])
+    expect(firstBatch.every((item: any) => item.omit_response_on_success === false)).toBe(true)
+
+    const retryBatch = sentBatch(post.mock.calls[1][1])
+    expect(retryBatch.map((item: any) => item.name)).toEqual(['text', 'link0'])
+    expect(retryBatch[0].depends_on).toBeUndefined()
+  })
+})
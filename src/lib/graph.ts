@@ -0,0 +1,359 @@
+import axios from 'axios'
+import http from 'http'
+import https from 'https'
+import { createLogger } from './logger'
+
+const log = createLogger('sendGraphBatch')
+
+export const GRAPH_API_VERSION = 'v24.0'
+export const GRAPH_BASE_URL = `https://graph.facebook.com/${GRAPH_API_VERSION}`
+
+// Default per-request timeout for Graph / Instagram API calls
+const GRAPH_TIMEOUT_MS = Number(process.env.GRAPH_TIMEOUT_MS) || 10_000
+// Max concurrent sockets per host (graph.facebook.com, graph.instagram.com, ...)
+const GRAPH_MAX_SOCKETS = Number(process.env.GRAPH_MAX_SOCKETS) || 50
+
+// Keep-alive agents so consecutive sends reuse the TLS connection instead of
+// paying a new handshake to graph.facebook.com for every message.
+// (axios 1.x only speaks HTTP/1.1, so pooling is done at the socket level.)
+const agentOptions = {
+  keepAlive: true,
+  keepAliveMsecs: 30_000,
+  maxSockets: GRAPH_MAX_SOCKETS,
+  maxFreeSockets: 10,
+  scheduling: 'lifo' as const,
+}
+
+type GraphClientState = {
+  httpsAgent: https.Agent
+  httpAgent: http.Agent
+  requests: number
+  inFlight: number
+  errors: number
+  timeouts: number
+  reusedSockets: number
+  totalLatencyMs: number
+}
+
+declare global {
+  var graphClientState: GraphClientState | undefined
+}
+
+// One pool per process, shared by the webhook route and server actions
+const state: GraphClientState = globalThis.graphClientState || {
+  httpsAgent: new https.Agent(agentOptions),
+  httpAgent: new http.Agent(agentOptions),
+  requests: 0,
+  inFlight: 0,
+  errors: 0,
+  timeouts: 0,
+  reusedSockets: 0,
+  totalLatencyMs: 0,
+}
+globalThis.graphClientState = state
+
+// Shared client for every Graph API call in lib/fetch.ts
+export const graph = axios.create({
+  baseURL: GRAPH_BASE_URL,
+  timeout: GRAPH_TIMEOUT_MS,
+  httpsAgent: state.httpsAgent,
+  httpAgent: state.httpAgent,
+})
+
+graph.interceptors.request.use((config) => {
+  state.requests++
+  state.inFlight++
+  ;(config as any).metadata = { startedAt: Date.now() }
+  return config
+})
+
+const settle = (config: any, request: any) => {
+  state.inFlight = Math.max(0, state.inFlight - 1)
+  const startedAt = config?.metadata?.startedAt
+  if (startedAt) state.totalLatencyMs += Date.now() - startedAt
+  if (request?.reusedSocket) state.reusedSockets++
+}
+
+graph.interceptors.response.use(
+  (response) => {
+    settle(response.config, response.request)
+    return response
+  },
+  (error) => {
+    settle(error.config, error.request)
+    state.errors++
+    if (error.code === 'ECONNABORTED' || error.code === 'ETIMEDOUT') state.timeouts++
+    return Promise.reject(error)
+  }
+)
+
+const countSockets = (sockets: NodeJS.ReadOnlyDict<unknown[]>) =>
+  Object.values(sockets).reduce((sum, list) => sum + (list?.length || 0), 0)
+
+// Pool usage and request counters, e.g. for a health/metrics endpoint
+export const getGraphClientMetrics = () => ({
+  requests: state.requests,
+  inFlight: state.inFlight,
+  errors: state.errors,
+  timeouts: state.timeouts,
+  reusedSockets: state.reusedSockets,
+  avgLatencyMs: state.requests ? Math.round(state.totalLatencyMs / state.requests) : 0,
+  pool: {
+    activeSockets: countSockets(state.httpsAgent.sockets) + countSockets(state.httpAgent.sockets),
+    freeSockets: countSockets(state.httpsAgent.freeSockets) + countSockets(state.httpAgent.freeSockets),
+    queuedRequests: countSockets(state.httpsAgent.requests) + countSockets(state.httpAgent.requests),
+    maxSockets: GRAPH_MAX_SOCKETS,
+  },
+})
+
+// -----------------------------
+// RATE LIMIT FEEDBACK
+// -----------------------------
+// Graph error codes for app / page / business-use-case throttling
+export const THROTTLE_ERROR_CODES = [4, 17, 32, 613]
+
+export const isThrottleError = (error: any) =>
+  THROTTLE_ERROR_CODES.includes(error?.response?.data?.error?.code ?? error?.error?.code)
+
+// Network-level failures where the request may never have reached Graph
+const TRANSIENT_NETWORK_CODES = ['ECONNABORTED', 'ETIMEDOUT', 'ECONNRESET', 'ECONNREFUSED', 'EAI_AGAIN', 'EPIPE']
+// Graph "unknown error" / "service temporarily unavailable"
+const TRANSIENT_GRAPH_CODES = [1, 2]
+
+// Failures worth retrying later: timeouts and dropped connections, 5xx,
+// throttling and errors Graph itself flags as transient. 4xx errors such as
+// an invalid recipient or an expired token are not.
+export const isTransientError = (error: any) => {
+  if (!error) return false
+  if (error.transient === true) return true
+  if (TRANSIENT_NETWORK_CODES.includes(error.code)) return true
+
+  const status = error.response?.status
+  const graphError = error.response?.data?.error ?? error.error
+  if (graphError?.is_transient === true) return true
+  if (TRANSIENT_GRAPH_CODES.includes(graphError?.code)) return true
+  if (isThrottleError(error)) return true
+  if (typeof status === 'number') return status >= 500
+
+  // No response at all (request never completed)
+  return !!error.request && !error.response
+}
+
+const parseHeaderJson = (value: unknown) => {
+  if (typeof value !== 'string' || !value) return null
+  try {
+    return JSON.parse(value)
+  } catch {
+    return null
+  }
+}
+
+// Read Meta's X-Business-Use-Case-Usage / X-App-Usage headers.
+// usagePercent is the highest of call_count / total_cputime / total_time,
+// regainAccessMs is how long Meta says we're blocked for (0 when not throttled).
+export const parseGraphUsage = (headers: Record<string, any> | undefined) => {
+  const lower: Record<string, any> = {}
+  for (const [key, value] of Object.entries(headers || {})) lower[key.toLowerCase()] = value
+
+  let usagePercent = 0
+  let regainAccessMs = 0
+
+  const appUsage = parseHeaderJson(lower['x-app-usage'])
+  if (appUsage) {
+    usagePercent = Math.max(
+      usagePercent,
+      appUsage.call_count || 0,
+      appUsage.total_cputime || 0,
+      appUsage.total_time || 0
+    )
+  }
+
+  const businessUsage = parseHeaderJson(lower['x-business-use-case-usage'])
+  if (businessUsage) {
+    for (const entries of Object.values(businessUsage) as any[]) {
+      for (const entry of entries || []) {
+        usagePercent = Math.max(
+          usagePercent,
+          entry.call_count || 0,
+          entry.total_cputime || 0,
+          entry.total_time || 0
+        )
+        regainAccessMs = Math.max(regainAccessMs, (entry.estimated_time_to_regain_access || 0) * 60_000)
+      }
+    }
+  }
+
+  return { usagePercent, regainAccessMs }
+}
+
+// -----------------------------
+// BATCH REQUESTS
+// -----------------------------
+// Meta caps a batch at 50 operations
+const MAX_BATCH_SIZE = 50
+// Longest we'll wait inline before retrying throttled batch items
+const MAX_INLINE_RETRY_DELAY_MS = 5_000
+
+export type GraphBatchRequest = {
+  name?: string
+  method: 'GET' | 'POST' | 'DELETE'
+  relative_url: string
+  body?: Record<string, any>
+  // Name of an earlier request this one must run after (skipped if that one fails)
+  depends_on?: string
+}
+
+export type GraphBatchResult = {
+  ok: boolean
+  // null when Meta returned no result for the request (see `skipped`)
+  code: number | null
+  body: any
+  headers: Record<string, string>
+  throttled: boolean
+  // Meta returned null for the request: it was skipped because a request it
+  // depends on failed (named requests are sent with omit_response_on_success
+  // false, so a null never stands for a success we asked to see)
+  skipped: boolean
+}
+
+const encodeBatchBody = (body?: Record<string, any>) => {
+  if (!body) return undefined
+  const params = new URLSearchParams()
+  for (const [key, value] of Object.entries(body)) {
+    params.append(key, typeof value === 'string' ? value : JSON.stringify(value))
+  }
+  return params.toString()
+}
+
+export const parseBatchItem = (item: any): GraphBatchResult => {
+  if (!item) {
+    return { ok: false, code: null, body: null, headers: {}, throttled: false, skipped: true }
+  }
+
+  let body = item.body
+  try {
+    body = typeof item.body === 'string' ? JSON.parse(item.body) : item.body
+  } catch {
+    // leave body as the raw string
+  }
+
+  const headers: Record<string, string> = {}
+  for (const header of item.headers || []) headers[header.name] = header.value
+
+  return {
+    ok: item.code >= 200 && item.code < 300,
+    code: item.code,
+    body,
+    headers,
+    throttled: THROTTLE_ERROR_CODES.includes(body?.error?.code),
+    skipped: false,
+  }
+}
+
+// A null result for a request that a later, successful request depends on can
+// only be an omitted success response (Meta omits them for named requests by
+// default) - the dependent wouldn't have run otherwise. Mark those as sent.
+export const resolveOmittedResults = (requests: GraphBatchRequest[], results: GraphBatchResult[]) => {
+  const indexByName = new Map<string, number>()
+  requests.forEach((request, index) => {
+    if (request.name) indexByName.set(request.name, index)
+  })
+
+  for (let i = requests.length - 1; i >= 0; i--) {
+    const parent = requests[i].depends_on
+    if (!parent || !results[i].ok) continue
+    const parentIndex = indexByName.get(parent)
+    if (parentIndex === undefined || !results[parentIndex].skipped) continue
+    results[parentIndex] = { ...results[parentIndex], ok: true, code: 200, skipped: false }
+  }
+  return results
+}
+
+// Items worth sending again: throttled ones, and ones Meta skipped because a
+// request they depend on was throttled (directly or further up the chain)
+export const getRetryIndexes = (requests: GraphBatchRequest[], results: GraphBatchResult[]) => {
+  const retryNames = new Set<string>()
+  const retryIndexes: number[] = []
+
+  requests.forEach((request, index) => {
+    const result = results[index]
+    const retry =
+      result.throttled || (result.skipped && !!request.depends_on && retryNames.has(request.depends_on))
+    if (!retry) return
+    retryIndexes.push(index)
+    if (request.name) retryNames.add(request.name)
+  })
+  return retryIndexes
+}
+
+// The retry batch: dependencies on requests that are retried too are kept;
+// dependencies on requests that already went through are dropped
+export const buildRetryBatch = (requests: GraphBatchRequest[], retryIndexes: number[]) => {
+  const retriedNames = new Set(retryIndexes.map((i) => requests[i].name).filter(Boolean))
+  return retryIndexes.map((i) => {
+    const request = { ...requests[i] }
+    if (request.depends_on && !retriedNames.has(request.depends_on)) delete request.depends_on
+    return request
+  })
+}
+
+const postBatch = async (token: string, requests: GraphBatchRequest[]) => {
+  const response = await graph.post(
+    '/',
+    new URLSearchParams({
+      access_token: token,
+      include_headers: 'true',
+      batch: JSON.stringify(
+        requests.map(({ body, ...request }) => ({
+          ...request,
+          // Meta returns null for successful named requests unless told otherwise
+          ...(request.name && { omit_response_on_success: false }),
+          ...(body && { body: encodeBatchBody(body) }),
+        }))
+      ),
+    }).toString(),
+    {
+      headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+    }
+  )
+
+  return resolveOmittedResults(requests, (response.data as any[]).map(parseBatchItem))
+}
+
+// Send up to 50 Graph operations in one HTTP round trip. Results are returned
+// in request order. If Meta throttles part of the batch, the throttled items
+// (and anything skipped because it depended on them) are retried once after the
+// delay Meta reports in its usage headers, when that delay is short enough.
+export const sendGraphBatch = async (
+  token: string,
+  requests: GraphBatchRequest[]
+): Promise<GraphBatchResult[]> => {
+  if (requests.length > MAX_BATCH_SIZE) {
+    throw new Error(`Graph batch supports at most ${MAX_BATCH_SIZE} requests, got ${requests.length}`)
+  }
+
+  const results = await postBatch(token, requests)
+
+  const retryIndexes = getRetryIndexes(requests, results)
+  if (retryIndexes.length === 0) {
+    return results
+  }
+
+  const delay = Math.max(
+    1000,
+    ...results.map((r) => parseGraphUsage(r.headers).regainAccessMs)
+  )
+  if (delay > MAX_INLINE_RETRY_DELAY_MS) {
+    return results
+  }
+
+  log.warn('Batch items throttled - retrying', { items: retryIndexes.length, retryInMs: delay })
+  await new Promise((resolve) => setTimeout(resolve, delay))
+
+  const retried = await postBatch(token, buildRetryBatch(requests, retryIndexes))
+
+  retryIndexes.forEach((index, i) => {
+    results[index] = retried[i]
+  })
+  return results
+}
@@ -0,0 +1,99 @@
+import type { CompressMessage, CompressRequest } from './image-compressor.worker'
+
+// Instagram shows DM images at most this many pixels on the long side
+const MAX_DIMENSION = 1080
+const QUALITY = 0.82
+const OUTPUT_TYPE = 'image/jpeg'
+
+// Browsers that can decode and encode in a worker (OffscreenCanvas + createImageBitmap)
+const canCompressInWorker = () =>
+  typeof Worker !== 'undefined' &&
+  typeof OffscreenCanvas !== 'undefined' &&
+  typeof createImageBitmap !== 'undefined'
+
+// Downsize and re-encode an image in a Web Worker, reporting progress (0..1).
+// Falls back to the original file when the browser can't, for animated GIFs,
+// and when compression fails - the server normalizes images again anyway.
+export const compressImage = (file: File, onProgress?: (progress: number) => void) => {
+  if (!canCompressInWorker() || file.type === 'image/gif') {
+    onProgress?.(1)
+    return Promise.resolve<Blob>(file)
+  }
+
+  return new Promise<Blob>((resolve) => {
+    const worker = new Worker(new URL('./image-compressor.worker.ts', import.meta.url))
+    const done = (blob: Blob) => {
+      worker.terminate()
+      onProgress?.(1)
+      resolve(blob)
+    }
+
+    worker.onmessage = (event: MessageEvent<CompressMessage>) => {
+      const message = event.data
+      if ('progress' in message) onProgress?.(message.progress)
+      else if ('blob' in message) done(message.blob)
+      else done(file)
+    }
+    worker.onerror = () => done(file)
+
+    const request: CompressRequest = {
+      file,
+      maxDimension: MAX_DIMENSION,
+      quality: QUALITY,
+      type: OUTPUT_TYPE,
+    }
+    worker.postMessage(request)
+  })
+}
+
+// The server only serves an uploaded image under its URL once a listener save
+// points at it, so until then (and after - the bytes are the same) the builder
+// shows the local copy. dm-image URL -> object URL of the uploaded blob.
+const localPreviews = new Map<string, string>()
+// Object URLs kept alive; the oldest is released beyond this
+const MAX_LOCAL_PREVIEWS = 8
+
+const rememberLocalPreview = (url: string, image: Blob) => {
+  const previous = localPreviews.get(url)
+  if (previous) URL.revokeObjectURL(previous)
+  localPreviews.delete(url)
+  localPreviews.set(url, URL.createObjectURL(image))
+
+  while (localPreviews.size > MAX_LOCAL_PREVIEWS) {
+    const [oldestUrl, oldest] = localPreviews.entries().next().value as [string, string]
+    URL.revokeObjectURL(oldest)
+    localPreviews.delete(oldestUrl)
+  }
+}
+
+// What an <img> should load for a DM image URL: the local copy of an image
+// uploaded in this session, otherwise the URL itself
+export const dmImageSrc = (url: string) => localPreviews.get(url) ?? url
+
+// Upload an image to /api/dm-image/<automationId> as the raw request body, so
+// the server can read it as a stream. XHR rather than fetch, for upload progress (0..1).
+export const uploadDmImage = (
+  automationId: string,
+  image: Blob,
+  onProgress?: (progress: number) => void
+) => {
+  return new Promise<{ hash: string; url: string }>((resolve, reject) => {
+    const request = new XMLHttpRequest()
+    request.open('POST', `/api/dm-image/${automationId}`)
+    request.setRequestHeader('Content-Type', image.type || 'application/octet-stream')
+    request.responseType = 'json'
+    request.upload.onprogress = (event) => {
+      if (event.lengthComputable) onProgress?.(event.loaded / event.total)
+    }
+    request.onload = () => {
+      const body = request.response
+      if (request.status === 200 && body?.url) {
+        rememberLocalPreview(body.url, image)
+        resolve({ hash: body.hash, url: body.url })
+      }
+      else reject(new Error(body?.error || 'Upload failed'))
+    }
+    request.onerror = () => reject(new Error('Upload failed'))
+    request.send(image)
+  })
+}
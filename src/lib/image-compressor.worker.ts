@@ -0,0 +1,52 @@
+// Web Worker: downsizes and re-encodes a DM image off the UI thread
+// (see compressImage in ./image-compressor.ts)
+
+export type CompressRequest = {
+  file: Blob
+  maxDimension: number
+  quality: number
+  type: string
+}
+
+export type CompressMessage =
+  | { progress: number }
+  | { blob: Blob; width: number; height: number }
+  | { error: string }
+
+// The project compiles against the DOM lib; the worker scope only needs these two
+const worker = self as unknown as Worker
+
+worker.onmessage = async (event: MessageEvent<CompressRequest>) => {
+  const { file, maxDimension, quality, type } = event.data
+  const post = (message: CompressMessage) => worker.postMessage(message)
+
+  try {
+    post({ progress: 0.1 })
+    // Decoding applies the EXIF orientation (imageOrientation defaults to "from-image")
+    const bitmap = await createImageBitmap(file)
+    post({ progress: 0.4 })
+
+    const scale = Math.min(1, maxDimension / Math.max(bitmap.width, bitmap.height))
+    const width = Math.round(bitmap.width * scale)
+    const height = Math.round(bitmap.height * scale)
+    const canvas = new OffscreenCanvas(width, height)
+    const context = canvas.getContext('2d')
+    if (!context) throw new Error('2D canvas unavailable')
+
+    // JPEG has no alpha - transparent areas would turn black
+    context.fillStyle = '#ffffff'
+    context.fillRect(0, 0, width, height)
+    context.drawImage(bitmap, 0, 0, width, height)
+    bitmap.close()
+    post({ progress: 0.7 })
+
+    const blob = await canvas.convertToBlob({ type, quality })
+    post({ progress: 1 })
+
+    // Keep the original when re-encoding didn't make it smaller
+    if (scale === 1 && blob.size >= file.size) post({ blob: file, width, height })
+    else post({ blob, width, height })
+  } catch (error: any) {
+    post({ error: error?.message || 'Could not compress image' })
+  }
+}
@@ -0,0 +1,165 @@
+import { Worker } from 'worker_threads'
+import { createLogger } from '@/lib/logger'
+
+const log = createLogger('image-normalizer')
+
+// Instagram shows DM images at most this many pixels on the long side
+const IMAGE_MAX_DIMENSION = Number(process.env.IMAGE_MAX_DIMENSION) || 1080
+const IMAGE_QUALITY = Number(process.env.IMAGE_QUALITY) || 80
+// "jpeg" (default, what every Instagram client renders) or "webp"
+const IMAGE_FORMAT = process.env.IMAGE_FORMAT === 'webp' ? 'webp' : 'jpeg'
+const NORMALIZE_TIMEOUT_MS = Number(process.env.IMAGE_NORMALIZE_TIMEOUT_MS) || 10_000
+
+export type NormalizedImage = {
+  data: Buffer
+  contentType: string
+  width: number
+  height: number
+}
+
+// Runs in the worker thread. sharp is an optional dependency: it's required
+// here at runtime (so bundling never depends on it) and when it's missing the
+// worker answers `unavailable` and images are stored as uploaded.
+const WORKER_SOURCE = `
+const { parentPort } = require('worker_threads')
+let sharp = null
+try {
+  sharp = require('sharp')
+} catch {}
+
+parentPort.on('message', async ({ id, data, maxDimension, quality, format }) => {
+  if (!sharp) return parentPort.postMessage({ id, unavailable: true })
+  try {
+    const input = Buffer.from(data)
+    const meta = await sharp(input, { failOn: 'none' }).metadata()
+    // Animated images would lose their frames
+    if ((meta.pages || 1) > 1) return parentPort.postMessage({ id, skipped: 'animated' })
+
+    // rotate() applies the EXIF orientation; metadata (EXIF, GPS, ICC) isn't copied to the output
+    const pipeline = sharp(input, { failOn: 'none' })
+      .rotate()
+      .resize({ width: maxDimension, height: maxDimension, fit: 'inside', withoutEnlargement: true })
+    if (format === 'webp') pipeline.webp({ quality })
+    else pipeline.flatten({ background: '#ffffff' }).jpeg({ quality, mozjpeg: true })
+
+    const { data: output, info } = await pipeline.toBuffer({ resolveWithObject: true })
+    parentPort.postMessage({
+      id,
+      data: output,
+      width: info.width,
+      height: info.height,
+      resized: info.width < (meta.width || 0) || info.height < (meta.height || 0),
+    })
+  } catch (error) {
+    parentPort.postMessage({ id, error: error && error.message })
+  }
+})
+`
+
+type Job = {
+  resolve: (result: any) => void
+  timer: NodeJS.Timeout
+}
+
+type NormalizerState = {
+  worker: Worker | null
+  jobs: Map<number, Job>
+  nextId: number
+  // sharp isn't installed - don't start the worker again
+  unavailable: boolean
+}
+
+declare global {
+  var imageNormalizer: NormalizerState | undefined
+}
+
+const state: NormalizerState = globalThis.imageNormalizer || {
+  worker: null,
+  jobs: new Map(),
+  nextId: 1,
+  unavailable: false,
+}
+globalThis.imageNormalizer = state
+
+const failPending = (reason: string) => {
+  state.jobs.forEach((job) => {
+    clearTimeout(job.timer)
+    job.resolve({ error: reason })
+  })
+  state.jobs.clear()
+}
+
+const getWorker = () => {
+  if (state.worker) return state.worker
+
+  const worker = new Worker(WORKER_SOURCE, { eval: true })
+  worker.unref()
+  worker.on('message', (result) => {
+    const job = state.jobs.get(result.id)
+    if (!job) return
+    state.jobs.delete(result.id)
+    clearTimeout(job.timer)
+    job.resolve(result)
+  })
+  worker.on('error', (error) => {
+    log.error('Worker failed', { error: error?.message })
+  })
+  worker.on('exit', (code) => {
+    if (state.worker === worker) state.worker = null
+    failPending(`Worker exited with code ${code}`)
+  })
+  state.worker = worker
+  return worker
+}
+
+// Decode, apply EXIF orientation, drop metadata, fit within Instagram's DM
+// display bounds and re-encode - off the main thread. Null when the result
+// wouldn't be an improvement or normalization isn't possible; callers keep
+// the original then.
+export const normalizeImage = async (data: Buffer): Promise<NormalizedImage | null> => {
+  if (state.unavailable) return null
+
+  const id = state.nextId++
+  const result = await new Promise<any>((resolve) => {
+    const timer = setTimeout(() => {
+      state.jobs.delete(id)
+      resolve({ error: 'Timed out' })
+    }, NORMALIZE_TIMEOUT_MS)
+    state.jobs.set(id, { resolve, timer })
+    getWorker().postMessage({
+      id,
+      data,
+      maxDimension: IMAGE_MAX_DIMENSION,
+      quality: IMAGE_QUALITY,
+      format: IMAGE_FORMAT,
+    })
+  })
+
+  if (result.unavailable) {
+    state.unavailable = true
+    log.warn('sharp is not installed - DM images are stored as uploaded')
+    await state.worker?.terminate()
+    return null
+  }
+  if (result.error || result.skipped) {
+    log.debug('Image not normalized', { reason: result.error || result.skipped })
+    return null
+  }
+
+  const output = Buffer.from(result.data)
+  // Nothing gained: same size bounds and no smaller
+  if (!result.resized && output.length >= data.length) return null
+
+  log.debug('Normalized image', () => ({
+    bytesIn: data.length,
+    bytesOut: output.length,
+    width: result.width,
+    height: result.height,
+  }))
+  return {
+    data: output,
+    contentType: `image/${IMAGE_FORMAT}`,
+    width: result.width,
+    height: result.height,
+  }
+}
@@ -0,0 +1,136 @@
+// Aho–Corasick keyword automaton used by the webhook to match comments / DMs
+// against every active automation's keywords in a single pass over the text.
+
+export type KeywordMatchMode = 'exact' | 'token' | 'substring'
+
+export type KeywordHit = {
+  automationId: string
+  word: string
+}
+
+type Pattern = KeywordHit & { normalized: string; length: number }
+
+type Node = {
+  next: Map<string, number>
+  fail: number
+  // Indexes into `patterns` of every keyword ending at this node (including via fail links)
+  output: number[]
+}
+
+// Normalize text so "Hello", "ＨＥＬＬＯ", "hello️" and " hello  " all compare equal:
+// NFKC folds full-width / compatibility forms, variation selectors and zero-width
+// spaces are dropped, case is folded and whitespace collapsed.
+export const normalizeKeywordText = (text: string) =>
+  text
+    .normalize('NFKC')
+    .replace(/[\uFE0E\uFE0F\u200B\u200C\u2060\uFEFF]/g, '')
+    .toLowerCase()
+    .replace(/\s+/g, ' ')
+    .trim()
+
+const isWordChar = (char: string | undefined) =>
+  !!char && /[\p{L}\p{N}\p{M}_]/u.test(char)
+
+export class KeywordMatcher {
+  private nodes: Node[] = []
+  private patterns: Pattern[] = []
+
+  constructor(keywords: KeywordHit[]) {
+    this.nodes.push({ next: new Map(), fail: 0, output: [] })
+
+    for (const keyword of keywords) {
+      const normalized = normalizeKeywordText(keyword.word)
+      if (!normalized) continue
+      this.insert({ ...keyword, normalized, length: Array.from(normalized).length })
+    }
+
+    this.buildFailLinks()
+  }
+
+  get size() {
+    return this.patterns.length
+  }
+
+  private insert(pattern: Pattern) {
+    const index = this.patterns.push(pattern) - 1
+    let state = 0
+
+    // Iterate by code point so surrogate-pair emoji are a single transition
+    for (const char of Array.from(pattern.normalized)) {
+      let nextState = this.nodes[state].next.get(char)
+      if (nextState === undefined) {
+        nextState = this.nodes.push({ next: new Map(), fail: 0, output: [] }) - 1
+        this.nodes[state].next.set(char, nextState)
+      }
+      state = nextState
+    }
+
+    this.nodes[state].output.push(index)
+  }
+
+  private buildFailLinks() {
+    const queue: number[] = []
+
+    this.nodes[0].next.forEach((child) => {
+      this.nodes[child].fail = 0
+      queue.push(child)
+    })
+
+    while (queue.length > 0) {
+      const state = queue.shift()!
+      this.nodes[state].next.forEach((child, char) => {
+        let fail = this.nodes[state].fail
+        while (fail !== 0 && !this.nodes[fail].next.has(char)) {
+          fail = this.nodes[fail].fail
+        }
+        const target = this.nodes[fail].next.get(char)
+        this.nodes[child].fail = target !== undefined && target !== child ? target : 0
+        this.nodes[child].output.push(...this.nodes[this.nodes[child].fail].output)
+        queue.push(child)
+      })
+    }
+  }
+
+  // Return every keyword found in `text` under the given match mode.
+  // exact: the whole (normalized) text is the keyword
+  // token: the keyword appears on word boundaries
+  // substring: the keyword appears anywhere
+  match(text: string, mode: KeywordMatchMode = 'exact'): KeywordHit[] {
+    if (this.patterns.length === 0) return []
+
+    const chars = Array.from(normalizeKeywordText(text))
+    const hits: KeywordHit[] = []
+    const seen = new Set<number>()
+    let state = 0
+
+    for (let i = 0; i < chars.length; i++) {
+      const char = chars[i]
+      while (state !== 0 && !this.nodes[state].next.has(char)) {
+        state = this.nodes[state].fail
+      }
+      state = this.nodes[state].next.get(char) ?? 0
+
+      for (const index of this.nodes[state].output) {
+        if (seen.has(index)) continue
+
+        const start = i - this.patterns[index].length + 1
+        const end = i + 1
+
+        const accepted =
+          mode === 'substring' ||
+          (mode === 'exact' && start === 0 && end === chars.length) ||
+          (mode === 'token' && !isWordChar(chars[start - 1]) && !isWordChar(chars[end]))
+
+        if (accepted) {
+          seen.add(index)
+          hits.push({
+            automationId: this.patterns[index].automationId,
+            word: this.patterns[index].word,
+          })
+        }
+      }
+    }
+
+    return hits
+  }
+}
@@ -0,0 +1,207 @@
+// Structured logger used instead of console.log on the webhook / Graph / action paths.
+//
+//   const log = createLogger('sendDM')
+//   log.info('DM sent', { recipientId })
+//   log.debug('Payload', () => ({ payload }))   // fields only built if debug is on
+//   const eventLog = log.forEvent(commentId)      // debug/info kept for a sample of events
+//
+// Level checks happen before anything is serialized, so a disabled debug line
+// costs one comparison. Server output is buffered and written asynchronously as
+// one JSON line per entry; the browser logs to the console.
+
+export type LogLevel = 'debug' | 'info' | 'warn' | 'error'
+type Fields = Record<string, unknown>
+type LazyFields = Fields | (() => Fields)
+
+const LEVELS: Record<LogLevel | 'silent', number> = {
+  debug: 10,
+  info: 20,
+  warn: 30,
+  error: 40,
+  silent: 100,
+}
+
+const isServer = typeof window === 'undefined'
+const isProduction = process.env.NODE_ENV === 'production'
+
+const configuredLevel = (isServer ? process.env.LOG_LEVEL : process.env.NEXT_PUBLIC_LOG_LEVEL) as
+  | keyof typeof LEVELS
+  | undefined
+const MIN_LEVEL = LEVELS[configuredLevel || (isProduction ? 'info' : 'debug')] ?? LEVELS.info
+// Share of events whose debug/info lines are kept when logging via forEvent() (warn/error always are)
+const rawSampleRate = parseFloat(process.env.LOG_SAMPLE_RATE || '')
+const SAMPLE_RATE = Number.isFinite(rawSampleRate) ? Math.min(1, Math.max(0, rawSampleRate)) : 1
+// json = one JSON object per line (log shippers); pretty = human readable for local dev
+const FORMAT = process.env.LOG_FORMAT || (isProduction ? 'json' : 'pretty')
+
+const BUFFER_MAX_LINES = 200
+const MAX_STRING_LENGTH = 1_000
+const MAX_DEPTH = 6
+
+// -----------------------------
+// REDACTION
+// -----------------------------
+const SECRET_KEY = /token|secret|password|authorization|api[_-]?key|cookie/i
+// Meta page/user tokens (EAA...), Instagram tokens (IG...), OpenAI / Stripe keys, bearer headers
+const SECRET_VALUE = /\b(EAA[A-Za-z0-9]{20,}|IG[A-Za-z0-9_-]{30,}|sk_(live|test)_[A-Za-z0-9]{10,}|sk-[A-Za-z0-9_-]{20,})\b|Bearer\s+\S+/g
+
+const redactString = (value: string) => {
+  const redacted = value.replace(SECRET_VALUE, '[REDACTED]')
+  return redacted.length > MAX_STRING_LENGTH
+    ? `${redacted.substring(0, MAX_STRING_LENGTH)}…(${redacted.length} chars)`
+    : redacted
+}
+
+const serializeError = (error: any) => ({
+  name: error.name,
+  message: error.message,
+  code: error.code,
+  status: error.response?.status,
+  data: error.response?.data,
+  stack: error.stack,
+})
+
+// Copy `value` with secrets masked, long strings (base64 images...) truncated
+// and depth / cycles bounded, so it is safe and cheap to stringify.
+export const redact = (value: unknown, depth = 0, seen = new WeakSet<object>()): unknown => {
+  if (typeof value === 'string') return redactString(value)
+  if (value === null || typeof value !== 'object') {
+    return typeof value === 'bigint' ? value.toString() : value
+  }
+  if (seen.has(value)) return '[Circular]'
+  if (depth >= MAX_DEPTH) return Array.isArray(value) ? `[Array(${value.length})]` : '[Object]'
+  seen.add(value)
+
+  if (value instanceof Error) return redact(serializeError(value), depth + 1, seen)
+  if (value instanceof Date) return value.toISOString()
+  if (Array.isArray(value)) return value.map((item) => redact(item, depth + 1, seen))
+
+  const out: Fields = {}
+  for (const [key, item] of Object.entries(value)) {
+    out[key] = SECRET_KEY.test(key) && typeof item === 'string' && item ? '[REDACTED]' : redact(item, depth + 1, seen)
+  }
+  return out
+}
+
+// -----------------------------
+// OUTPUT
+// -----------------------------
+type LogBuffer = {
+  lines: string[]
+  scheduled: boolean
+  exitHooked: boolean
+}
+
+declare global {
+  var logBuffer: LogBuffer | undefined
+}
+
+const buffer: LogBuffer = globalThis.logBuffer || { lines: [], scheduled: false, exitHooked: false }
+globalThis.logBuffer = buffer
+
+export const flushLogs = () => {
+  buffer.scheduled = false
+  if (buffer.lines.length === 0) return
+  const chunk = buffer.lines.join('\n') + '\n'
+  buffer.lines = []
+  process.stdout.write(chunk)
+}
+
+// Edge runtime has no process.stdout / setImmediate - log synchronously there
+const canBuffer = isServer && typeof process.stdout?.write === 'function' && typeof setImmediate === 'function'
+
+const writeServer = (line: string, level: LogLevel) => {
+  if (!canBuffer) {
+    console.log(line)
+    return
+  }
+  if (!buffer.exitHooked) {
+    buffer.exitHooked = true
+    process.once('exit', flushLogs)
+  }
+
+  buffer.lines.push(line)
+  // Errors go out right away (with everything queued before them) in case the process is about to die
+  if (level === 'error' || buffer.lines.length >= BUFFER_MAX_LINES) {
+    flushLogs()
+  } else if (!buffer.scheduled) {
+    buffer.scheduled = true
+    setImmediate(flushLogs)
+  }
+}
+
+const PRETTY_ICONS: Record<LogLevel, string> = {
+  debug: '🔍',
+  info: '✅',
+  warn: '⚠️',
+  error: '❌',
+}
+
+const emit = (level: LogLevel, scope: string, msg: string, fields: Fields | undefined) => {
+  const safe = fields && (redact(fields) as Fields)
+
+  if (!isServer) {
+    const method = level === 'debug' ? 'log' : level
+    console[method](`${PRETTY_ICONS[level]} [${scope}] ${msg}`, ...(safe ? [safe] : []))
+    return
+  }
+
+  let line: string
+  if (FORMAT === 'json') {
+    const entry: Fields = { time: new Date().toISOString(), level, scope, msg }
+    // A field called e.g. `msg` or `level` must not overwrite the entry's own
+    for (const key in safe) if (!(key in entry)) entry[key] = safe[key]
+    line = JSON.stringify(entry)
+  } else {
+    line = `${PRETTY_ICONS[level]} [${scope}] ${msg}${safe ? ' ' + JSON.stringify(safe) : ''}`
+  }
+
+  writeServer(line, level)
+}
+
+// -----------------------------
+// LOGGER
+// -----------------------------
+// Stable per-key sampling, so every line of a sampled event is kept together
+const isSampled = (key: string, rate: number) => {
+  if (rate >= 1) return true
+  if (rate <= 0) return false
+  let hash = 2166136261
+  for (let i = 0; i < key.length; i++) {
+    hash ^= key.charCodeAt(i)
+    hash = Math.imul(hash, 16777619)
+  }
+  return (hash >>> 0) / 4294967296 < rate
+}
+
+export type Logger = {
+  debug: (msg: string, fields?: LazyFields) => void
+  info: (msg: string, fields?: LazyFields) => void
+  warn: (msg: string, fields?: LazyFields) => void
+  error: (msg: string, fields?: LazyFields) => void
+  isEnabled: (level: LogLevel) => boolean
+  child: (scope: string, fields?: Fields) => Logger
+  forEvent: (eventKey: string | null | undefined, rate?: number) => Logger
+}
+
+const makeLogger = (scope: string, base: Fields | undefined, sampled: boolean): Logger => {
+  const write = (level: LogLevel) => (msg: string, fields?: LazyFields) => {
+    if (LEVELS[level] < MIN_LEVEL) return
+    if (!sampled && LEVELS[level] < LEVELS.warn) return
+    const resolved = typeof fields === 'function' ? fields() : fields
+    emit(level, scope, msg, base || resolved ? { ...base, ...resolved } : undefined)
+  }
+
+  return {
+    debug: write('debug'),
+    info: write('info'),
+    warn: write('warn'),
+    error: write('error'),
+    isEnabled: (level) => LEVELS[level] >= MIN_LEVEL,
+    child: (childScope, fields) => makeLogger(childScope, { ...base, ...fields }, sampled),
+    forEvent: (eventKey, rate = SAMPLE_RATE) =>
+      makeLogger(scope, { ...base, ...(eventKey && { event: eventKey }) }, sampled && (!eventKey || isSampled(eventKey, rate))),
+  }
+}
+
+export const createLogger = (scope: string, fields?: Fields): Logger => makeLogger(scope, fields, true)
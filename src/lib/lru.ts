@@ -0,0 +1,71 @@
+// Small in-process LRU cache with optional per-entry TTL and an optional total
+// size bound (e.g. bytes, with sizeOf returning a buffer's length).
+// Map iteration order is insertion order, so the first key is always the least recently used.
+export class LRUCache<K, V> {
+  private entries = new Map<K, { value: V; expiresAt: number; size: number }>()
+  private usedSize = 0
+
+  constructor(
+    private maxEntries: number,
+    private ttlMs: number = Infinity,
+    private bounds: { maxSize: number; sizeOf: (value: V) => number } | null = null
+  ) {}
+
+  get(key: K): V | undefined {
+    const entry = this.entries.get(key)
+    if (!entry) return undefined
+
+    if (entry.expiresAt <= Date.now()) {
+      this.delete(key)
+      return undefined
+    }
+
+    // Refresh recency
+    this.entries.delete(key)
+    this.entries.set(key, entry)
+    return entry.value
+  }
+
+  has(key: K): boolean {
+    return this.get(key) !== undefined
+  }
+
+  set(key: K, value: V, ttlMs: number = this.ttlMs) {
+    this.delete(key)
+    const size = this.bounds ? this.bounds.sizeOf(value) : 0
+    // Larger than the whole cache - not worth evicting everything for
+    if (this.bounds && size > this.bounds.maxSize) return
+
+    this.entries.set(key, { value, expiresAt: Date.now() + ttlMs, size })
+    this.usedSize += size
+
+    while (
+      this.entries.size > this.maxEntries ||
+      (this.bounds && this.usedSize > this.bounds.maxSize)
+    ) {
+      const oldest = this.entries.keys().next().value as K
+      this.delete(oldest)
+    }
+  }
+
+  delete(key: K) {
+    const entry = this.entries.get(key)
+    if (!entry) return false
+    this.usedSize -= entry.size
+    return this.entries.delete(key)
+  }
+
+  clear() {
+    this.entries.clear()
+    this.usedSize = 0
+  }
+
+  // Sum of sizeOf over the cached values (0 without a size bound)
+  get totalSize() {
+    return this.usedSize
+  }
+
+  get size() {
+    return this.entries.size
+  }
+}
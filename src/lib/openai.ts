@@ -1,5 +1,233 @@
 import OpenAi from 'openai'
+import { Semaphore } from './semaphore'
+import { createLogger } from './logger'
 
 export const openai = new OpenAi({
   apiKey: process.env.OPEN_AI_KEY,
 })
+
+const log = createLogger('openai')
+
+// Completions in flight per instance, and per user (so one busy account can't take every slot)
+const MAX_CONCURRENCY = Number(process.env.OPENAI_MAX_CONCURRENCY) || 8
+const MAX_CONCURRENCY_PER_USER = Number(process.env.OPENAI_MAX_CONCURRENCY_PER_USER) || 2
+// Budget for one reply, queue wait included. Past it the call is aborted.
+const DEADLINE_MS = Number(process.env.OPENAI_DEADLINE_MS) || 15_000
+// Hard cap on generated tokens; the sentence cut-off normally stops well before it
+const MAX_COMPLETION_TOKENS = 200
+
+export type ChatMessage = OpenAi.Chat.ChatCompletionMessageParam
+
+type ReplyOptions = {
+  messages: ChatMessage[]
+  model?: string
+  // Concurrency is limited per user on top of the global limit
+  userId?: string | null
+  // Stop streaming once this many sentences are complete
+  maxSentences?: number
+  deadlineMs?: number
+}
+
+type OpenAIMetrics = {
+  calls: number
+  failures: number
+  timeouts: number
+  cutOff: number
+  queueWaitMsTotal: number
+  queueWaitMsMax: number
+  promptTokens: number
+  completionTokens: number
+}
+
+type Limiter = {
+  global: Semaphore
+  perUser: Map<string, Semaphore>
+  metrics: OpenAIMetrics
+}
+
+declare global {
+  var openaiLimiter: Limiter | undefined
+}
+
+const limiter: Limiter = globalThis.openaiLimiter || {
+  global: new Semaphore(MAX_CONCURRENCY),
+  perUser: new Map(),
+  metrics: {
+    calls: 0,
+    failures: 0,
+    timeouts: 0,
+    cutOff: 0,
+    queueWaitMsTotal: 0,
+    queueWaitMsMax: 0,
+    promptTokens: 0,
+    completionTokens: 0,
+  },
+}
+globalThis.openaiLimiter = limiter
+
+// Counters since process start (queue wait and token usage included)
+export const getOpenAIMetrics = () => ({
+  ...limiter.metrics,
+  inFlight: limiter.global.inUse,
+  queued: limiter.global.pending,
+})
+
+// Sentence ends only count once followed by whitespace, so "3.5" or a
+// half-streamed "Dr." doesn't end a sentence early
+const SENTENCE_END = /[.!?…]+["')\]]*\s/g
+
+const cutAtSentences = (text: string, maxSentences: number) => {
+  let count = 0
+  for (const match of text.matchAll(SENTENCE_END)) {
+    if (++count === maxSentences) return text.substring(0, match.index! + match[0].length).trim()
+  }
+  return null
+}
+
+// Text up to the last finished sentence ('' while none has finished)
+const completeSentences = (text: string) => {
+  const trimmed = text.trimEnd()
+  if (/[.!?…]["')\]]*$/.test(trimmed)) return trimmed
+  let end = 0
+  for (const match of text.matchAll(SENTENCE_END)) end = match.index! + match[0].length
+  return text.substring(0, end).trim()
+}
+
+// Rough token count for usage metrics when the stream is cut before the usage chunk
+const estimateTokens = (text: string) => Math.ceil(text.length / 4)
+
+const acquireSlots = async (userId: string | null | undefined, timeoutMs: number) => {
+  const startedAt = Date.now()
+  let userSlot: Semaphore | undefined
+  let releaseUser: (() => void) | undefined
+
+  if (userId) {
+    userSlot = limiter.perUser.get(userId)
+    if (!userSlot) {
+      userSlot = new Semaphore(MAX_CONCURRENCY_PER_USER)
+      limiter.perUser.set(userId, userSlot)
+    }
+    releaseUser = await userSlot.acquire(timeoutMs)
+  }
+
+  try {
+    const releaseGlobal = await limiter.global.acquire(timeoutMs - (Date.now() - startedAt))
+    return () => {
+      releaseGlobal()
+      releaseUser?.()
+      if (userId && userSlot?.idle) limiter.perUser.delete(userId)
+    }
+  } catch (error) {
+    releaseUser?.()
+    if (userId && userSlot?.idle) limiter.perUser.delete(userId)
+    throw error
+  }
+}
+
+// Generate one reply under the concurrency limits and a deadline. The reply is
+// streamed and cut off as soon as `maxSentences` sentences are complete.
+// Throws an error with `transient: true` when the queue wait or the deadline runs out.
+export const createChatReply = async ({
+  messages,
+  model = 'gpt-4o',
+  userId,
+  maxSentences,
+  deadlineMs = DEADLINE_MS,
+}: ReplyOptions): Promise<string | null> => {
+  const metrics = limiter.metrics
+  const startedAt = Date.now()
+  metrics.calls++
+
+  let release: () => void
+  try {
+    release = await acquireSlots(userId, deadlineMs)
+  } catch (error) {
+    metrics.failures++
+    metrics.timeouts++
+    log.warn('No free completion slot before the deadline', { userId, deadlineMs })
+    throw error
+  }
+
+  const queueWaitMs = Date.now() - startedAt
+  metrics.queueWaitMsTotal += queueWaitMs
+  metrics.queueWaitMsMax = Math.max(metrics.queueWaitMsMax, queueWaitMs)
+
+  const controller = new AbortController()
+  const timer = setTimeout(() => controller.abort(), Math.max(0, deadlineMs - queueWaitMs))
+  let text = ''
+  let firstTokenMs: number | undefined
+  let usage: OpenAi.CompletionUsage | undefined
+  let cutOff = false
+
+  try {
+    const stream = await openai.chat.completions.create(
+      {
+        model,
+        messages,
+        max_tokens: MAX_COMPLETION_TOKENS,
+        stream: true,
+        stream_options: { include_usage: true },
+      },
+      { signal: controller.signal }
+    )
+
+    for await (const chunk of stream) {
+      if (chunk.usage) usage = chunk.usage
+      const delta = chunk.choices[0]?.delta?.content
+      if (!delta) continue
+
+      firstTokenMs ??= Date.now() - startedAt
+      text += delta
+
+      const cut = maxSentences ? cutAtSentences(text, maxSentences) : null
+      if (cut) {
+        text = cut
+        cutOff = true
+        stream.controller.abort()
+        break
+      }
+    }
+  } catch (error: any) {
+    if (!controller.signal.aborted) {
+      metrics.failures++
+      throw error
+    }
+
+    // Deadline hit mid-stream: keep whatever complete sentences arrived
+    metrics.timeouts++
+    const partial = completeSentences(text)
+    if (!partial) {
+      metrics.failures++
+      const timeout: any = new Error(`OpenAI reply not ready within ${deadlineMs}ms`)
+      timeout.transient = true
+      throw timeout
+    }
+    text = partial
+    cutOff = true
+  } finally {
+    clearTimeout(timer)
+    release()
+  }
+
+  const promptTokens =
+    usage?.prompt_tokens ??
+    estimateTokens(messages.map((m) => (typeof m.content === 'string' ? m.content : '')).join(''))
+  const completionTokens = usage?.completion_tokens ?? estimateTokens(text)
+  metrics.promptTokens += promptTokens
+  metrics.completionTokens += completionTokens
+  if (cutOff) metrics.cutOff++
+
+  log.info('Completion', {
+    model,
+    userId,
+    queueWaitMs,
+    firstTokenMs,
+    durationMs: Date.now() - startedAt,
+    promptTokens,
+    completionTokens,
+    estimatedUsage: !usage,
+    cutOff,
+  })
+
+  return text.trim() || null
+}
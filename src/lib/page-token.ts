@@ -0,0 +1,121 @@
+import { getPageAccessToken } from './fetch'
+import { createLogger } from './logger'
+
+const log = createLogger('page-token')
+
+// How long a token that just worked is trusted before we log a fresh confirmation
+const VALIDITY_TTL_MS = Number(process.env.PAGE_TOKEN_VALIDITY_TTL_MS) || 60 * 60 * 1000
+// After a failed refresh, don't hit /me/accounts again for this long
+const REFRESH_BACKOFF_MS = 60 * 1000
+
+type PageTokenState = {
+  // Token derived from the user integration after the env token expired
+  refreshedToken: string | null
+  validUntil: number
+  refreshFailedAt: number
+  refreshing: Promise<string | null> | null
+}
+
+declare global {
+  var pageTokenState: PageTokenState | undefined
+}
+
+const state: PageTokenState = globalThis.pageTokenState || {
+  refreshedToken: null,
+  validUntil: 0,
+  refreshFailedAt: 0,
+  refreshing: null,
+}
+globalThis.pageTokenState = state
+
+// Graph API error codes for an expired / invalidated access token
+export const isTokenExpiredError = (error: any) => {
+  const code = error?.response?.data?.error?.code ?? error?.error?.code
+  return code === 190 || code === 463
+}
+
+// Current page token: the refreshed one if the env token has expired, otherwise
+// META_PAGE_ACCESS_TOKEN. No preflight request is made.
+export const getPageToken = (): string | null =>
+  state.refreshedToken || process.env.META_PAGE_ACCESS_TOKEN || null
+
+export const isPageTokenValid = () => Date.now() < state.validUntil
+
+const markValid = () => {
+  if (!isPageTokenValid()) {
+    log.info('Page token confirmed valid')
+  }
+  state.validUntil = Date.now() + VALIDITY_TTL_MS
+}
+
+// Exchange the user's integration token for a fresh page token. Concurrent
+// callers share one in-flight request.
+export const refreshPageToken = async (pageId: string, userToken?: string | null) => {
+  state.validUntil = 0
+
+  if (!userToken) {
+    log.error('Page token expired and no user token available for refresh')
+    return null
+  }
+
+  if (Date.now() - state.refreshFailedAt < REFRESH_BACKOFF_MS) {
+    return null
+  }
+
+  if (!state.refreshing) {
+    log.info('Page token expired - refreshing from user integration')
+    state.refreshing = getPageAccessToken(userToken, pageId)
+      .then((token: string | null) => {
+        if (token) {
+          state.refreshedToken = token
+          state.refreshFailedAt = 0
+          log.info('Got fresh page token from user integration')
+        } else {
+          state.refreshFailedAt = Date.now()
+          log.error('Failed to get page token - get a fresh token from https://developers.facebook.com/tools/explorer/')
+        }
+        return token
+      })
+      .finally(() => {
+        state.refreshing = null
+      })
+  }
+
+  return await state.refreshing
+}
+
+// Run a Graph send with the current page token. If the send reports an
+// expired token (thrown error or `tokenExpired` in its result), refresh once
+// and retry with the new token.
+export const withPageToken = async <T>(
+  pageId: string,
+  userToken: string | null | undefined,
+  send: (token: string) => Promise<T>
+): Promise<T> => {
+  const token = getPageToken()
+  if (!token) {
+    throw new Error('No page access token configured (META_PAGE_ACCESS_TOKEN)')
+  }
+
+  let result: T
+  try {
+    result = await send(token)
+  } catch (error) {
+    if (!isTokenExpiredError(error)) throw error
+    const fresh = await refreshPageToken(pageId, userToken)
+    if (!fresh || fresh === token) throw error
+    result = await send(fresh)
+    markValid()
+    return result
+  }
+
+  if ((result as any)?.tokenExpired) {
+    const fresh = await refreshPageToken(pageId, userToken)
+    if (fresh && fresh !== token) {
+      result = await send(fresh)
+    }
+  }
+
+  if (!(result as any)?.tokenExpired) markValid()
+  return result
+}
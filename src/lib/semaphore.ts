@@ -0,0 +1,67 @@
+// Counting semaphore with a FIFO wait queue.
+//
+//   const release = await semaphore.acquire(5_000)
+//   try { ... } finally { release() }
+export class Semaphore {
+  private active = 0
+  private waiters: Array<{ grant: () => void; timer?: ReturnType<typeof setTimeout> }> = []
+
+  constructor(private limit: number) {}
+
+  // Resolves with a release function once a slot is free. Rejects with a
+  // `transient` error if no slot frees up within `timeoutMs`.
+  acquire(timeoutMs: number = Infinity): Promise<() => void> {
+    if (this.active < this.limit) {
+      this.active++
+      return Promise.resolve(this.releaser())
+    }
+
+    return new Promise((resolve, reject) => {
+      const waiter: { grant: () => void; timer?: ReturnType<typeof setTimeout> } = {
+        grant: () => {
+          clearTimeout(waiter.timer)
+          resolve(this.releaser())
+        },
+      }
+
+      if (Number.isFinite(timeoutMs)) {
+        waiter.timer = setTimeout(() => {
+          this.waiters = this.waiters.filter((w) => w !== waiter)
+          const error: any = new Error(`Timed out after ${timeoutMs}ms waiting for a free slot`)
+          error.transient = true
+          reject(error)
+        }, Math.max(0, timeoutMs))
+      }
+
+      this.waiters.push(waiter)
+    })
+  }
+
+  private releaser() {
+    let released = false
+    return () => {
+      if (released) return
+      released = true
+
+      // Hand the slot straight to the next waiter, otherwise free it
+      const next = this.waiters.shift()
+      if (next) {
+        next.grant()
+      } else {
+        this.active--
+      }
+    }
+  }
+
+  get inUse() {
+    return this.active
+  }
+
+  get pending() {
+    return this.waiters.length
+  }
+
+  get idle() {
+    return this.active === 0 && this.waiters.length === 0
+  }
+}
@@ -0,0 +1,81 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest'
+
+vi.mock('./prisma', () => ({ client: {} }))
+
+const PAGE = 'page-1'
+
+// Fresh module (and buckets) per test, on the in-memory store with a 1s
+// queue limit: 5 sends/s, bursts of 20
+const loadScheduler = async () => {
+  vi.resetModules()
+  globalThis.sendBuckets = undefined
+  vi.stubEnv('SEND_RATE_STORE', 'memory')
+  vi.stubEnv('SEND_RATE_PER_SEC', '5')
+  vi.stubEnv('SEND_RATE_BURST', '20')
+  vi.stubEnv('SEND_MAX_QUEUE_WAIT_MS', '1000')
+  return import('./send-scheduler')
+}
+
+const bucket = () => globalThis.sendBuckets!.get(PAGE)!
+
+const throttleError = (headers: Record<string, string> = {}) => ({
+  response: { status: 400, data: { error: { code: 613 } }, headers },
+})
+
+describe('scheduleSend', () => {
+  beforeEach(() => {
+    vi.useFakeTimers()
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+    vi.unstubAllEnvs()
+  })
+
+  it('refunds the reservation of a send rejected for waiting too long', async () => {
+    const { scheduleSend } = await loadScheduler()
+    const send = vi.fn(async () => 'sent')
+
+    await scheduleSend(PAGE, send, 20)
+    // 10 more tokens at 5/s is a 2s wait, over the 1s limit
+    await expect(scheduleSend(PAGE, send, 10)).rejects.toMatchObject({ transient: true })
+
+    expect(send).toHaveBeenCalledTimes(1)
+    expect(bucket().tokens).toBe(0)
+  })
+
+  it('slows down on usage reported in batch item headers', async () => {
+    const { scheduleSend } = await loadScheduler()
+    const usage = { 'x-app-usage': JSON.stringify({ call_count: 95 }) }
+
+    await scheduleSend(PAGE, async () => [{ headers: {} }, { headers: usage }], 2)
+
+    expect(bucket().ratePerSec).toBe(2.5)
+  })
+
+  it('re-queues a throttled send within the queue limit', async () => {
+    const { scheduleSend } = await loadScheduler()
+    const send = vi.fn().mockRejectedValueOnce(throttleError()).mockResolvedValueOnce('sent')
+
+    const pending = scheduleSend(PAGE, send)
+    await vi.runAllTimersAsync()
+
+    await expect(pending).resolves.toBe('sent')
+    expect(send).toHaveBeenCalledTimes(2)
+  })
+
+  it('hands a long throttle block back to the caller instead of waiting', async () => {
+    const { scheduleSend } = await loadScheduler()
+    const headers = {
+      'x-business-use-case-usage': JSON.stringify({
+        [PAGE]: [{ call_count: 100, estimated_time_to_regain_access: 5 }],
+      }),
+    }
+    const send = vi.fn().mockRejectedValue(throttleError(headers))
+
+    await expect(scheduleSend(PAGE, send)).rejects.toMatchObject({ response: { status: 400 } })
+
+    expect(send).toHaveBeenCalledTimes(1)
+    expect(bucket().blockedUntil!.getTime()).toBeGreaterThanOrEqual(Date.now() + 5 * 60_000)
+  })
+})
@@ -0,0 +1,232 @@
+import { client } from './prisma'
+import { isThrottleError, parseGraphUsage } from './graph'
+import { createLogger } from './logger'
+
+const log = createLogger('send-scheduler')
+
+// Steady-state sends per second per page, and the burst a page may use at once
+const DEFAULT_RATE_PER_SEC = Number(process.env.SEND_RATE_PER_SEC) || 5
+const BURST_CAPACITY = Number(process.env.SEND_RATE_BURST) || 20
+const MIN_RATE_PER_SEC = 0.2
+// postgres = one bucket per page shared by every instance, memory = per-process stand-in
+const STORE = process.env.SEND_RATE_STORE === 'memory' ? 'memory' : 'postgres'
+// Sends that would wait longer than this fail fast instead (the outbound retry queue picks them up)
+const MAX_QUEUE_WAIT_MS = Number(process.env.SEND_MAX_QUEUE_WAIT_MS) || 30_000
+// How often a throttled send is re-queued before giving up
+const MAX_THROTTLE_RETRIES = 2
+// Fallback block when Meta throttles us without saying for how long. Kept within
+// MAX_QUEUE_WAIT_MS so the re-queued send can still wait it out inline.
+const DEFAULT_BLOCK_MS = Math.min(60_000, MAX_QUEUE_WAIT_MS)
+// Deepest debt a bucket can hold: the longest admissible queue plus one burst.
+// Rejected reservations are refunded, so this only guards against drift.
+const MIN_TOKENS = -BURST_CAPACITY - (MAX_QUEUE_WAIT_MS / 1000) * DEFAULT_RATE_PER_SEC
+
+type Reservation = {
+  // Negative when earlier callers have already reserved future tokens
+  tokens: number
+  ratePerSec: number
+  blockedUntil: Date | null
+}
+
+type BucketStore = {
+  take: (pageId: string, cost: number) => Promise<Reservation>
+  // Give back tokens of a reservation that was rejected
+  refund: (pageId: string, cost: number) => Promise<void>
+  scaleRate: (pageId: string, factor: number) => Promise<void>
+  block: (pageId: string, ms: number) => Promise<void>
+}
+
+// -----------------------------
+// POSTGRES STORE (shared across instances)
+// -----------------------------
+const postgresStore: BucketStore = {
+  take: async (pageId, cost) => {
+    const rows = await client.$queryRaw<Reservation[]>`
+      INSERT INTO "SendBucket" ("pageId", "tokens", "ratePerSec", "updatedAt")
+      VALUES (${pageId}, ${BURST_CAPACITY}::float8 - ${cost}::float8, ${DEFAULT_RATE_PER_SEC}::float8, NOW())
+      ON CONFLICT ("pageId") DO UPDATE SET
+        "tokens" = GREATEST(
+          ${MIN_TOKENS}::float8,
+          LEAST(
+            ${BURST_CAPACITY}::float8,
+            "SendBucket"."tokens"
+              + EXTRACT(EPOCH FROM (NOW() - "SendBucket"."updatedAt"))::float8 * "SendBucket"."ratePerSec"
+          ) - ${cost}::float8
+        ),
+        "updatedAt" = NOW()
+      RETURNING "tokens", "ratePerSec", "blockedUntil"
+    `
+    return rows[0]
+  },
+  refund: async (pageId, cost) => {
+    await client.$executeRaw`
+      UPDATE "SendBucket"
+      SET "tokens" = LEAST(${BURST_CAPACITY}::float8, "tokens" + ${cost}::float8)
+      WHERE "pageId" = ${pageId}
+    `
+  },
+  scaleRate: async (pageId, factor) => {
+    // The WHERE skips no-op writes, e.g. speeding up a page already at full rate
+    await client.$executeRaw`
+      UPDATE "SendBucket"
+      SET "ratePerSec" = GREATEST(${MIN_RATE_PER_SEC}::float8, LEAST(${DEFAULT_RATE_PER_SEC}::float8, "ratePerSec" * ${factor}::float8))
+      WHERE "pageId" = ${pageId}
+        AND GREATEST(${MIN_RATE_PER_SEC}::float8, LEAST(${DEFAULT_RATE_PER_SEC}::float8, "ratePerSec" * ${factor}::float8)) <> "ratePerSec"
+    `
+  },
+  block: async (pageId, ms) => {
+    await client.$executeRaw`
+      UPDATE "SendBucket"
+      SET "blockedUntil" = GREATEST(COALESCE("blockedUntil", NOW()), NOW() + (${ms}::int * INTERVAL '1 millisecond'))
+      WHERE "pageId" = ${pageId}
+    `
+  },
+}
+
+// -----------------------------
+// MEMORY STORE (single instance / local dev)
+// -----------------------------
+type MemoryBucket = Reservation & { updatedAt: number }
+
+declare global {
+  var sendBuckets: Map<string, MemoryBucket> | undefined
+}
+
+const buckets: Map<string, MemoryBucket> = globalThis.sendBuckets || new Map()
+globalThis.sendBuckets = buckets
+
+const memoryBucket = (pageId: string) => {
+  let bucket = buckets.get(pageId)
+  if (!bucket) {
+    bucket = {
+      tokens: BURST_CAPACITY,
+      ratePerSec: DEFAULT_RATE_PER_SEC,
+      blockedUntil: null,
+      updatedAt: Date.now(),
+    }
+    buckets.set(pageId, bucket)
+  }
+  return bucket
+}
+
+const memoryStore: BucketStore = {
+  take: async (pageId, cost) => {
+    const bucket = memoryBucket(pageId)
+    const now = Date.now()
+    bucket.tokens = Math.max(
+      MIN_TOKENS,
+      Math.min(BURST_CAPACITY, bucket.tokens + ((now - bucket.updatedAt) / 1000) * bucket.ratePerSec) - cost
+    )
+    bucket.updatedAt = now
+    return { ...bucket }
+  },
+  refund: async (pageId, cost) => {
+    const bucket = memoryBucket(pageId)
+    bucket.tokens = Math.min(BURST_CAPACITY, bucket.tokens + cost)
+  },
+  scaleRate: async (pageId, factor) => {
+    const bucket = memoryBucket(pageId)
+    bucket.ratePerSec = Math.max(MIN_RATE_PER_SEC, Math.min(DEFAULT_RATE_PER_SEC, bucket.ratePerSec * factor))
+  },
+  block: async (pageId, ms) => {
+    const bucket = memoryBucket(pageId)
+    const until = Date.now() + ms
+    if (!bucket.blockedUntil || bucket.blockedUntil.getTime() < until) {
+      bucket.blockedUntil = new Date(until)
+    }
+  },
+}
+
+const store = STORE === 'memory' ? memoryStore : postgresStore
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms))
+
+// Reserve `cost` tokens and wait until they're due. Returns the reservation,
+// whose ratePerSec is the page's current rate.
+const waitForTurn = async (pageId: string, cost: number) => {
+  const reservation = await store.take(pageId, cost)
+
+  const deficitMs = reservation.tokens < 0 ? (-reservation.tokens / reservation.ratePerSec) * 1000 : 0
+  const blockedMs = reservation.blockedUntil ? reservation.blockedUntil.getTime() - Date.now() : 0
+  const waitMs = Math.max(deficitMs, blockedMs, 0)
+
+  if (waitMs > MAX_QUEUE_WAIT_MS) {
+    // The send won't happen now - don't leave its tokens reserved
+    await store.refund(pageId, cost)
+    const error: any = new Error(`Send rate limit for page ${pageId}: next slot in ${Math.round(waitMs / 1000)}s`)
+    // Nothing was sent, so the send can safely be retried later
+    error.transient = true
+    throw error
+  }
+  if (waitMs > 0) {
+    log.debug('Send queued', { pageId, waitMs: Math.round(waitMs) })
+    await sleep(waitMs)
+  }
+  return reservation
+}
+
+// Usage headers of a send's response: the axios response headers, or each
+// item's headers for a Graph batch (an array of results)
+const responseHeaders = (response: any): (Record<string, any> | undefined)[] =>
+  Array.isArray(response) ? response.map((item) => item?.headers) : [response?.headers]
+
+// Slow down as Meta's usage headers approach 100%, speed back up when there's headroom.
+// `ratePerSec` is the page's rate when the send was scheduled.
+const adjustRate = async (
+  pageId: string,
+  headersList: (Record<string, any> | undefined)[],
+  ratePerSec: number
+) => {
+  let usagePercent = 0
+  let regainAccessMs = 0
+  for (const headers of headersList) {
+    const usage = parseGraphUsage(headers)
+    usagePercent = Math.max(usagePercent, usage.usagePercent)
+    regainAccessMs = Math.max(regainAccessMs, usage.regainAccessMs)
+  }
+
+  if (regainAccessMs > 0) {
+    await store.block(pageId, regainAccessMs)
+  }
+  if (usagePercent >= 90) {
+    await store.scaleRate(pageId, 0.5)
+  } else if (usagePercent >= 75) {
+    await store.scaleRate(pageId, 0.8)
+  } else if (usagePercent > 0 && usagePercent < 50 && ratePerSec < DEFAULT_RATE_PER_SEC) {
+    await store.scaleRate(pageId, 1.25)
+  }
+}
+
+// Run a Graph send for `pageId` once the page's token bucket allows it.
+// `cost` is the number of Graph calls the send makes (e.g. batch size).
+// Throttled sends (codes 4/17/32/613) block the bucket for as long as Meta asks
+// and are re-queued instead of failing, unless that block is longer than
+// MAX_QUEUE_WAIT_MS - then the throttle error is thrown for the caller to defer.
+export const scheduleSend = async <T>(
+  pageId: string,
+  send: () => Promise<T>,
+  cost: number = 1
+): Promise<T> => {
+  for (let attempt = 0; ; attempt++) {
+    const { ratePerSec } = await waitForTurn(pageId, cost)
+
+    try {
+      const response = await send()
+      await adjustRate(pageId, responseHeaders(response), ratePerSec).catch(() => {})
+      return response
+    } catch (error: any) {
+      const headers = error?.response?.headers
+      await adjustRate(pageId, [headers], ratePerSec).catch(() => {})
+
+      if (!isThrottleError(error) || attempt >= MAX_THROTTLE_RETRIES) throw error
+
+      const blockMs = parseGraphUsage(headers).regainAccessMs || DEFAULT_BLOCK_MS
+      await store.block(pageId, blockMs)
+      await store.scaleRate(pageId, 0.5)
+      // Too long to wait inline - let the caller's retry queue take it
+      if (blockMs > MAX_QUEUE_WAIT_MS) throw error
+
+      log.warn('Throttled by Meta - re-queueing send', { pageId, attempt: attempt + 1 })
+    }
+  }
+}
@@ -7,6 +7,9 @@ const isPublicRoute = createRouteMatcher([
   '/api/webhook(.*)', // Webhooks must be public for Meta/Instagram to access
 ])
 
+/** ✅ DM images are fetched by Meta without auth, but only signed-in users upload them */
+const isDmImageRoute = createRouteMatcher(['/api/dm-image(.*)'])
+
 /** ✅ Protected routes (your original ones) */
 const isProtectedRoute = createRouteMatcher([
   '/dashboard(.*)',
@@ -20,7 +23,7 @@ export default clerkMiddleware(async (auth, req) => {
   if (isPublicRoute(req)) return
 
   // 2. If protected → lock it
-  if (isProtectedRoute(req)) {
+  if (isProtectedRoute(req) || (isDmImageRoute(req) && req.method === 'POST')) {
     await auth.protect()
   }
 